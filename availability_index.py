@@ -0,0 +1,93 @@
+# availability_index.py
+"""
+Jármű elérhetőségi ablakok indexe (rendezett kezdőpontok).
+
+Az időpontozás (scoring.time_scores) 0 pontot ad, ha a cargo kezdő dátuma
+TIME_POINTS["in_time"] / TIME_POINTS["late_penalty"] (= 4) vagy több nappal esik
+az [available_from, available_until] ablakon kívül, illetve ha nincs available_from.
+Az index ezt a kérdést válaszolja meg: "mely járművek érhetők el D ± s napon belül".
+
+- lezárt ablakok: (available_from, vehicle_id) rendezve + az ablakhosszak rendezett listája
+  (a legutolsó a leghosszabb, törlésnél is pontos marad), így a jelöltek egy bisect-tel leszűkíthetők [D - s - max_hossz, D + s] kezdőpontra
+- nyitott ablakok (nincs available_until): (available_from, vehicle_id) rendezve,
+  minden elem találat, aminek a kezdete <= D + s
+"""
+import bisect
+import threading
+
+from scoring import TIME_POINTS, NO_DATE, date_ordinal
+
+# ennyi napon túl az időpont már 0 (40 / 10 = 4 nap)
+ZERO_TIME_DAYS = -(-TIME_POINTS["in_time"] // TIME_POINTS["late_penalty"])
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._bounded = []     # [(available_from, vehicle_id)] rendezve, available_until ismert
+        self._open = []        # [(available_from, vehicle_id)] rendezve, nincs available_until
+        self._windows = {}     # vehicle_id -> (available_from, available_until) ordinal
+        self._lengths = []     # lezárt ablakok hossza (nap) rendezve, multiset; a leghosszabb a végén
+
+    def __len__(self):
+        return len(self._windows)
+
+    def clear(self):
+        with self._lock:
+            self._bounded.clear()
+            self._open.clear()
+            self._windows.clear()
+            self._lengths.clear()
+
+    def upsert(self, vehicle_id, available_from, available_until):
+        with self._lock:
+            self.remove(vehicle_id)
+            start, end = date_ordinal(available_from), date_ordinal(available_until)
+            if start == NO_DATE:
+                return  # available_from nélkül az időpont mindig 0, nem indexeljük
+
+            self._windows[vehicle_id] = (start, end)
+            if end == NO_DATE:
+                bisect.insort(self._open, (start, vehicle_id))
+            else:
+                bisect.insort(self._bounded, (start, vehicle_id))
+                bisect.insort(self._lengths, end - start)
+
+    def remove(self, vehicle_id):
+        with self._lock:
+            window = self._windows.pop(vehicle_id, None)
+            if window is None:
+                return
+            bucket = self._open if window[1] == NO_DATE else self._bounded
+            i = bisect.bisect_left(bucket, (window[0], vehicle_id))
+            if i < len(bucket) and bucket[i] == (window[0], vehicle_id):
+                del bucket[i]
+            if window[1] != NO_DATE:
+                length = window[1] - window[0]
+                i = bisect.bisect_left(self._lengths, length)
+                if i < len(self._lengths) and self._lengths[i] == length:
+                    del self._lengths[i]
+
+    @property
+    def _max_length(self):
+        return self._lengths[-1] if self._lengths else 0
+
+    def available_near(self, day, slack_days=ZERO_TIME_DAYS - 1):
+        """
+        Járművek, amelyek ablaka [day - slack_days, day + slack_days] intervallumot metszi.
+        Az alapértelmezett slack mellett ez pontosan azok köre, akik > 0 időpontot kaphatnak.
+        day: date vagy ordinal
+        """
+        day = date_ordinal(day) if hasattr(day, "toordinal") else int(day or NO_DATE)
+        if day == NO_DATE:
+            return set()
+        lo, hi = day - slack_days, day + slack_days
+
+        with self._lock:
+            result = {vid for _, vid in self._open[:bisect.bisect_right(self._open, (hi, float("inf")))]}
+            first = bisect.bisect_left(self._bounded, (lo - self._max_length,))
+            last = bisect.bisect_right(self._bounded, (hi, float("inf")))
+            for _, vid in self._bounded[first:last]:
+                if self._windows[vid][1] >= lo:
+                    result.add(vid)
+        return result
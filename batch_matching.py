@@ -0,0 +1,279 @@
+# batch_matching.py
+"""
+Éjszakai batch matching: az összes nyitott rakomány találatainak újraszámolása.
+
+1. egyszeri snapshot: járműadatok (VehicleColumns) + útvonal/szomszéd index, folyosó rács és
+   távolságok tömbösítve
+2. a nyitott rakományok (cargo_index) szétosztása egy ProcessPoolExecutor workerei között;
+   a workerek csak NumPy tömbökkel dolgoznak, nincs ORM és nincs DB kapcsolat
+3. az eredmények tömeges írása a cargo_vehicle_match táblába, shardonként egy tranzakcióban
+
+Futtatás:
+    python batch_matching.py --workers 4 --chunk-size 500
+
+Éjszakánként cronból, a projekt mappájából, a webes folyamaton kívül
+(a web worker nem épít indexet és nem forkol workereket):
+    30 2 * * * python batch_matching.py
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+from sqlalchemy import insert
+
+from extensions import db
+from models import CargoVehicleMatch
+from route_index import route_index, HIT_EXACT, HIT_NEARBY_ORIGIN, HIT_NEARBY_DESTINATION
+from cargo_index import cargo_index
+from corridor_index import CorridorArrays
+from distance_cache import distance_cache, DistanceArrays
+from scoring import (NO_DATE, MAX_POSITION, stop_codes, side_codes, location_passed, score_components,
+                     any_destination_codes, corridor_codes, detour_scores, features_compatible)
+
+CHUNK_SIZE = 500     # ennyi rakomány egy worker feladat
+INSERT_BATCH = 5000  # ennyi sor egy INSERT-ben
+
+_EMPTY_HITS = (np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.int8), np.empty(0, np.float64))
+
+
+class MatchSnapshot:
+    """
+    A matchinghez szükséges összes járműadat tömbökben (pickle-elhető, és match_service-ben
+    .npy fájlokból mmap-pel megosztható). Egyszer épül a fő folyamatban, a workerek az
+    initializerben kapják meg.
+    """
+    def __init__(self, postings, columns, corridor, distances):
+        self.postings = postings    # (country, city) -> (vehicle_id, position, kind, radius_km)
+        self.columns = columns      # VehicleColumns.compact() + origin_ref / destination_ref, vehicle_id szerint
+        self.corridor = corridor    # CorridorArrays (útvonal polyline-ok rács indexe)
+        self.distances = distances  # DistanceArrays; a végpont oszlopok a distances.keys indexei (-1: nincs)
+        # "bármely ország" járművek (rendezett), a lerakó országát a bitset dönti el
+        self.any_vehicle_ids = columns["vehicle_id"][columns["destination_countries"].any(axis=1)]
+        self.countries = {}       # city -> [country], ország nélküli kereséshez
+        for country, city in postings:
+            self.countries.setdefault(city, []).append(country)
+
+    @classmethod
+    def from_indexes(cls, today=None):
+        """Snapshot a route_index-ből; a lejárt járművek (available_until < ma) kimaradnak."""
+        today = (today or date.today()).toordinal()
+        columns = route_index.columns.compact()
+        until = columns["available_until"]
+        keep = (until == NO_DATE) | (until >= today)
+        columns = {name: values[keep] for name, values in columns.items()}
+        endpoints = [route_index.endpoints(vid) for vid in columns["vehicle_id"].tolist()]
+        keys, arrays = distance_cache.compact(key for pair in endpoints for key in pair)
+        distances = DistanceArrays(keys, arrays)
+        for i, side in enumerate(("origin_ref", "destination_ref")):
+            columns[side] = np.array([distances.ref(pair[i]) for pair in endpoints], dtype=np.int32)
+        return cls(route_index.compact_postings(), columns, CorridorArrays(route_index.corridor.compact()),
+                   distances)
+
+    def lookup(self, key):
+        """Ugyanaz, mint RouteIndex.lookup: ország nélkül az összes azonos nevű település."""
+        country, city = key
+        if not city:
+            return _EMPTY_HITS
+        if country:
+            return self.postings.get(key, _EMPTY_HITS)
+        parts = [self.postings[(c, city)] for c in self.countries.get(city, ())]
+        if not parts:
+            return _EMPTY_HITS
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    @staticmethod
+    def hit_masks(hits, candidates, nearby_kind, diffs):
+        """route_index.hit_masks tömbösítve: pontos és diff-en belüli szomszéd (radius_cache) pozíció bitmaszkok jelöltenként"""
+        vids, positions, kind, radius = hits
+        idx = np.searchsorted(candidates, vids)
+        known = idx < len(candidates)
+        known[known] = candidates[idx[known]] == vids[known]
+        bits = np.left_shift(np.uint64(1), np.minimum(positions, MAX_POSITION).astype(np.uint64))
+
+        exact_mask = np.zeros(len(candidates), dtype=np.uint64)
+        exact = known & (kind == HIT_EXACT)
+        np.bitwise_or.at(exact_mask, idx[exact], bits[exact])
+
+        diff = np.zeros(len(vids), dtype=np.float64)
+        diff[known] = diffs[idx[known]]
+        nearby_mask = np.zeros(len(candidates), dtype=np.uint64)
+        nearby = known & (kind == nearby_kind) & (diff != 0) & (radius <= diff)
+        np.bitwise_or.at(nearby_mask, idx[nearby], bits[nearby])
+        return exact_mask, nearby_mask
+
+    def stop_arrays(self, hits_per_stop, candidates, nearby_kind, diffs):
+        codes, masks = zip(*(stop_codes(*self.hit_masks(hits, candidates, nearby_kind, diffs))
+                             for hits in hits_per_stop))
+        return np.vstack(codes), np.vstack(masks)
+
+    @staticmethod
+    def _common(hits_per_stop):
+        ids = np.unique(hits_per_stop[0][0])
+        for hits in hits_per_stop[1:]:
+            ids = np.intersect1d(ids, hits[0])
+        return ids
+
+    def score_entry(self, entry):
+        """
+        Egy rakomány (CargoEntry) pontozása, ugyanazokkal a szabályokkal, mint matching.score_cargo
+        (az összes megálló, monoton sorrendben).
+        Visszaadja: (vehicle_id, location, time, capacity, detour) tömbök
+        """
+        pickup_hits = [self.lookup(key) for key in entry.pickup_keys]
+        dropoff_hits = [self.lookup(key) for key in entry.dropoff_keys]
+        corridor = np.array(sorted(self.corridor.ordered_points(entry.stop_coords)), dtype=np.int64)
+        candidates = np.union1d(
+            np.intersect1d(self._common(pickup_hits), np.union1d(self._common(dropoff_hits), self.any_vehicle_ids)),
+            corridor
+        )
+        rows = np.searchsorted(self.columns["vehicle_id"], candidates)
+        known = rows < len(self.columns["vehicle_id"])
+        known[known] = self.columns["vehicle_id"][rows[known]] == candidates[known]
+        candidates, rows = candidates[known], rows[known]
+        compatible = features_compatible(self.columns["features"][rows], entry.features)
+        candidates, rows = candidates[compatible], rows[compatible]
+        if not len(candidates):
+            return None
+
+        pickup_codes, pickup_masks = self.stop_arrays(pickup_hits, candidates, HIT_NEARBY_ORIGIN,
+                                                      self.columns["origin_diff"][rows])
+        dropoff_codes, dropoff_masks = self.stop_arrays(dropoff_hits, candidates, HIT_NEARBY_DESTINATION,
+                                                        self.columns["destination_diff"][rows])
+        dropoff_codes, dropoff_masks = any_destination_codes(self.columns["destination_countries"][rows],
+                                                             dropoff_codes, dropoff_masks,
+                                                             [key[0] for key in entry.dropoff_keys])
+        if len(corridor):
+            in_corridor = np.isin(candidates, corridor)
+            pickup_codes = corridor_codes(pickup_codes, in_corridor)
+            dropoff_codes = corridor_codes(dropoff_codes, in_corridor)
+
+        passed = location_passed(pickup_codes, dropoff_codes, pickup_masks, dropoff_masks)
+        if not passed.any():
+            return None
+
+        rows = rows[passed]
+        location, time_points, capacity = score_components(
+            self.columns["available_from"][rows], self.columns["available_until"][rows],
+            self.columns["capacity_t"][rows], side_codes(pickup_codes[:, passed]),
+            side_codes(dropoff_codes[:, passed]), np.asarray(entry.start_date), entry.weight
+        )
+        return candidates[passed], location, time_points, capacity, detour_scores(self.detour_km(rows, entry))
+
+    def vehicle_column(self, name, vehicle_ids, missing=NO_DATE):
+        """Egy oszlop értékei a megadott járművekre; a snapshotban nem szereplőké `missing`"""
+        vehicle_ids = np.asarray(vehicle_ids, dtype=np.int64)
+        all_ids = self.columns["vehicle_id"]
+        rows = np.minimum(np.searchsorted(all_ids, vehicle_ids), max(len(all_ids) - 1, 0))
+        if not len(all_ids):
+            return np.full(len(vehicle_ids), missing)
+        return np.where(all_ids[rows] == vehicle_ids, self.columns[name][rows], missing)
+
+    def available_near(self, vehicle_ids, day, slack_days):
+        """route_index.available_near tömbösítve: maszk, kinek az ablaka day ± slack_days napon belül van"""
+        if day == NO_DATE:
+            return np.zeros(len(vehicle_ids), dtype=bool)
+        start = self.vehicle_column("available_from", vehicle_ids)
+        end = self.vehicle_column("available_until", vehicle_ids)
+        return (start != NO_DATE) & (start <= day + slack_days) & ((end == NO_DATE) | (end >= day - slack_days))
+
+    def detour_km(self, rows, entry):
+        """Kitérő km a columns sorainak járműveire (a végpontok a distances kulcsai), NaN ha nem ismert"""
+        keys = self.distances.keys
+        result = np.full(len(rows), np.nan)
+        refs = zip(self.columns["origin_ref"][rows].tolist(), self.columns["destination_ref"][rows].tolist())
+        for i, (origin, destination) in enumerate(refs):
+            if origin < 0:
+                continue
+            km = self.distances.detour(keys[origin], entry.pickup_key, entry.dropoff_key,
+                                       keys[destination] if destination >= 0 else None)
+            if km is not None:
+                result[i] = km
+        return result
+
+
+# ----------------------------------------------------------------------
+# Worker oldal
+# ----------------------------------------------------------------------
+_snapshot = None
+
+
+def _init_worker(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _score_shard(entries):
+    """Egy shard rakományainak pontozása; visszaadja a cargo_id-kat és a sorokat tömbökben"""
+    cargo_ids, parts = [], []
+    for entry in entries:
+        cargo_ids.append(entry.cargo_id)
+        scored = _snapshot.score_entry(entry)
+        if scored is not None:
+            vehicle_ids, location, time_points, capacity, detour = scored
+            parts.append((np.full(len(vehicle_ids), entry.cargo_id, dtype=np.int64),
+                          vehicle_ids, location, time_points, capacity, detour))
+    if not parts:
+        return cargo_ids, None
+    return cargo_ids, tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+# ----------------------------------------------------------------------
+# Írás
+# ----------------------------------------------------------------------
+def _write_shard(cargo_ids, rows):
+    """A shard rakományainak régi sorai törlődnek, az újak tömegesen kerülnek be (egy tranzakció)."""
+    CargoVehicleMatch.query.filter(CargoVehicleMatch.cargo_id.in_(cargo_ids)).delete(synchronize_session=False)
+    written = 0
+    if rows is not None:
+        cargo_col, vehicle_col, location, time_points, capacity, detour = (a.tolist() for a in rows)
+        mappings = [
+            {"cargo_id": c, "vehicle_id": v, "score": l + t + k + d,
+             "breakdown": {"location": l, "time": t, "capacity": k, "detour": d}}
+            for c, v, l, t, k, d in zip(cargo_col, vehicle_col, location, time_points, capacity, detour)
+        ]
+        for start in range(0, len(mappings), INSERT_BATCH):
+            db.session.execute(insert(CargoVehicleMatch), mappings[start:start + INSERT_BATCH])
+        written = len(mappings)
+    db.session.commit()
+    return written
+
+
+def run_batch_matching(workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Az összes nyitott rakomány újrapontozása. App contexten belül kell hívni.
+    Visszaadja: {"cargos": .., "matches": .., "seconds": .., "cargos_per_sec": ..}
+    """
+    started = time.perf_counter()
+    route_index.build()
+    cargo_index.build()
+    snapshot = MatchSnapshot.from_indexes()
+    entries = cargo_index.open_entries()
+    shards = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    print(f"[BATCH] Snapshot kész: {len(snapshot.columns['vehicle_id'])} jármű, "
+          f"{len(snapshot.postings)} település kulcs, {len(entries)} nyitott rakomány, {len(shards)} shard")
+
+    cargos = matches = 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as pool:
+        for cargo_ids, rows in pool.map(_score_shard, shards):
+            matches += _write_shard(cargo_ids, rows)
+            cargos += len(cargo_ids)
+
+    elapsed = time.perf_counter() - started
+    rate = cargos / elapsed if elapsed else 0.0
+    print(f"[BATCH] Kész: {cargos} rakomány, {matches} találat, {elapsed:.1f} s ({rate:.1f} cargo/s, {workers} worker)")
+    return {"cargos": cargos, "matches": matches, "seconds": elapsed, "cargos_per_sec": rate}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch matching az összes nyitott rakományra")
+    parser.add_argument("--workers", type=int, default=None, help="worker folyamatok száma (alap: CPU-k száma)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rakomány / worker feladat")
+    args = parser.parse_args()
+
+    from main import app
+    with app.app_context():
+        run_batch_matching(workers=args.workers, chunk_size=args.chunk_size)
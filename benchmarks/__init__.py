@@ -0,0 +1,9 @@
+# benchmarks
+"""
+Matching benchmark: szintetikus flotta + rakomány adatok és mérés.
+
+    python -m benchmarks.bench_matching --scale 10k --db sqlite:///bench_10k.db
+
+FIGYELEM: a megadott adatbázis tábláit a benchmark eldobja és újra létrehozza,
+éles DATABASE_URL-re soha ne futtasd.
+"""
@@ -0,0 +1,102 @@
+# benchmarks/bench_geo.py
+"""
+Mikro-benchmark: skalár haversine Python ciklusban vs. geo modul (NumPy).
+
+A mért eset a korábbi cities_near_route / save_vehicle belső ciklusa:
+települések x útvonal pontok, településenként a legközelebbi pont és a távolsága.
+- loop:            utils.haversine képlete, két egymásba ágyazott Python ciklus
+- distance_matrix: geo.distance_matrix (haversine), darabokban + argmin
+- nearest:         geo.nearest (a teljes mátrix nélkül)
+- equirectangular: geo.distance_matrix(approx=True), a közelítés max relatív hibájával
+
+Futtatás (DB nem kell):
+    python -m benchmarks.bench_geo --cities 2000 --points 200
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from geo import distance_matrix, nearest
+
+
+def _scalar_haversine(lat1, lon1, lat2, lon2):
+    # ugyanaz a képlet, mint utils.haversine (a utils import Flask-ot / DB-t húzna be)
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run_benchmark(n_cities, n_points, repeat=3, seed=42):
+    rng = np.random.default_rng(seed)
+    # Budapest -> Bécs jellegű útvonal, körülötte települések
+    t = np.linspace(0, 1, n_points)
+    route_lats, route_lons = 47.50 + t * (48.21 - 47.50), 19.04 + t * (16.37 - 19.04)
+    city_lats = rng.uniform(47.3, 48.4, n_cities)
+    city_lons = rng.uniform(16.2, 19.2, n_cities)
+
+    def loop():
+        route = list(zip(route_lats.tolist(), route_lons.tolist()))
+        result = []
+        for lat2, lon2 in zip(city_lats.tolist(), city_lons.tolist()):
+            best, best_idx = float("inf"), -1
+            for idx, (lat1, lon1) in enumerate(route):
+                dist = _scalar_haversine(lat1, lon1, lat2, lon2)
+                if dist < best:
+                    best, best_idx = dist, idx
+            result.append((best_idx, best))
+        return result
+
+    def matrix():
+        dist = distance_matrix(route_lats, route_lons, city_lats, city_lons)
+        return dist.argmin(axis=0), dist.min(axis=0)
+
+    def matrix_approx():
+        return distance_matrix(route_lats, route_lons, city_lats, city_lons, approx=True)
+
+    results = {}
+    loop_s, loop_result = _timed(loop, 1)
+    results["loop"] = loop_s
+    results["distance_matrix"], (m_idx, m_dist) = _timed(matrix, repeat)
+    results["nearest"], (n_idx, n_dist) = _timed(lambda: nearest(route_lats, route_lons, city_lats, city_lons), repeat)
+    results["equirectangular"], approx = _timed(matrix_approx, repeat)
+
+    loop_dist = np.array([d for _, d in loop_result])
+    exact = distance_matrix(route_lats, route_lons, city_lats, city_lons)
+    checks = {
+        "max_abs_diff_km": float(np.max(np.abs(loop_dist - n_dist))),
+        "same_nearest_point": bool(np.array_equal(m_idx, n_idx)),
+        "equirectangular_max_rel_error": float(np.max(np.abs(approx - exact) / np.maximum(exact, 1e-9))),
+    }
+    return results, checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="geo modul mikro-benchmark")
+    parser.add_argument("--cities", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results, checks = run_benchmark(args.cities, args.points, args.repeat)
+    print(f"{args.cities} település x {args.points} útvonal pont ({args.cities * args.points} pár)")
+    for name, seconds in results.items():
+        print(f"  {name:<16} {seconds * 1000:10.2f} ms   {results['loop'] / seconds:8.1f}x")
+    for name, value in checks.items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
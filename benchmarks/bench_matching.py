@@ -0,0 +1,167 @@
+# benchmarks/bench_matching.py
+"""
+Matching benchmark.
+
+Mér:
+- index felépítés (route_index + cargo_index) ideje és SQL lekérdezés száma
+- find_matches_for_cargo (teljes, limit=10 és csak > 0 időpontú járművek) és find_matches_for_vehicle hívásonként:
+  p50 / p99 / átlag késleltetés (ms), SQL lekérdezések száma, találatok száma
+- csúcs memória (tracemalloc) és max RSS
+
+Futtatás:
+    python -m benchmarks.bench_matching --scale 10k --db sqlite:///bench_10k.db
+    python -m benchmarks.bench_matching --scale 1k --db postgresql://.../gvm_bench --samples 500
+
+Az eredmény JSON fájlba kerül (alapból benchmarks/results/<scale>-<commit>.json),
+így a commitok között összehasonlítható.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class QueryCounter:
+    """SQL lekérdezések számlálása az engine before_cursor_execute eseményén"""
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _summary(latencies, queries, matches):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+        "mean_ms": round(float(latencies.mean()), 3) if len(latencies) else None,
+        "queries_mean": round(float(np.mean(queries)), 2) if queries else None,
+        "queries_max": int(max(queries)) if queries else None,
+        "matches_mean": round(float(np.mean(matches)), 2) if matches else None,
+    }
+
+
+def _measure(ids, load, call, counter):
+    """Hívásonkénti mérés; a bemenet betöltése (load) nem számít bele."""
+    from extensions import db
+    latencies, queries, matches = [], [], []
+    for item_id in ids:
+        item = load(item_id)
+        before = counter.count
+        started = time.perf_counter()
+        result = call(item)
+        latencies.append(time.perf_counter() - started)
+        queries.append(counter.count - before)
+        matches.append(len(result))
+        db.session.expunge_all()
+    return _summary(latencies, queries, matches)
+
+
+def run_benchmark(scale, samples=200, seed=42, n_cargos=None):
+    """A benchmark futtatása; app contexten belül kell hívni. Visszaadja az eredmény dict-et."""
+    from sqlalchemy.orm import selectinload
+    from extensions import db
+    from models import Cargo, Vehicle
+    from route_index import route_index
+    from cargo_index import cargo_index
+    from matching import find_matches_for_cargo, find_matches_for_vehicle
+    from availability_index import ZERO_TIME_DAYS
+    from benchmarks.synthetic import SyntheticData, SCALES
+
+    n_vehicles = SCALES[scale]
+    n_cargos = n_cargos or max(1000, n_vehicles // 10)
+    data = SyntheticData(n_vehicles, n_cargos, seed=seed)
+    counts = data.load()
+
+    counter = QueryCounter(db.engine)
+    rng = np.random.default_rng(seed)
+    cargo_ids = sorted(int(i) for i in rng.choice(np.arange(1, n_cargos + 1), min(samples, n_cargos), replace=False))
+    vehicle_ids = sorted(int(i) for i in rng.choice(np.arange(1, n_vehicles + 1), min(samples, n_vehicles), replace=False))
+
+    def load_cargo(cargo_id):
+        return Cargo.query.options(selectinload(Cargo.locations)).get(cargo_id)
+
+    def load_vehicle(vehicle_id):
+        return db.session.get(Vehicle, vehicle_id)
+
+    tracemalloc.start()
+    results = {}
+
+    # --- index felépítés (hidegindítás) ---
+    before = counter.count
+    started = time.perf_counter()
+    route_index.build()
+    cargo_index.build()
+    results["index_build"] = {"seconds": round(time.perf_counter() - started, 3), "queries": counter.count - before}
+
+    # --- matching ---
+    results["find_matches_for_cargo"] = _measure(cargo_ids, load_cargo, find_matches_for_cargo, counter)
+    results["find_matches_for_cargo_top10"] = _measure(
+        cargo_ids, load_cargo, lambda cargo: find_matches_for_cargo(cargo, limit=10), counter
+    )
+    results["find_matches_for_cargo_in_time"] = _measure(
+        cargo_ids, load_cargo, lambda cargo: find_matches_for_cargo(cargo, within_days=ZERO_TIME_DAYS - 1), counter
+    )
+    results["find_matches_for_vehicle"] = _measure(vehicle_ids, load_vehicle, find_matches_for_vehicle, counter)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale,
+        "database": db.engine.url.render_as_string(hide_password=True),
+        "samples": samples,
+        "seed": seed,
+        "counts": counts,
+        "results": results,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Matching benchmark szintetikus adatokkal")
+    parser.add_argument("--scale", choices=["1k", "10k", "100k"], default="1k", help="járművek száma")
+    parser.add_argument("--db", required=True,
+                        help="benchmark adatbázis URI (a táblákat eldobja!), pl. sqlite:///bench.db")
+    parser.add_argument("--samples", type=int, default=200, help="mért hívások száma mérésenként")
+    parser.add_argument("--cargos", type=int, default=None, help="rakományok száma (alap: járművek / 10, min. 1000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="eredmény JSON fájl")
+    args = parser.parse_args()
+
+    # a main.py a DATABASE_URL-ből konfigurál, ezért az importálás előtt állítjuk be
+    os.environ["DATABASE_URL"] = args.db
+    from main import app
+
+    with app.app_context():
+        report = run_benchmark(args.scale, samples=args.samples, seed=args.seed, n_cargos=args.cargos)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.scale}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps(report["results"], indent=2))
+    print(f"[BENCH] Eredmény mentve: {out}")
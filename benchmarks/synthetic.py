@@ -0,0 +1,186 @@
+# benchmarks/synthetic.py
+"""
+Szintetikus adatok a matching benchmarkhoz: települések (City sorok), járművek (útvonallal),
+rakományok (pickup/dropoff helyszínnel).
+
+Az eloszlások a valós adatokat közelítik:
+- a települések népszerűsége Zipf-szerű (néhány nagy csomópont, sok kis település)
+- a rakományok fele egy létező jármű útvonalára esik, így van valódi találat is
+- a települések City sorként kerülnek be, így a referencia szomszédokat ugyanúgy
+  a radius_cache számolja (city_index-ből), mint éles adatokon
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from extensions import db
+from models import Company, Country, City, Vehicle, VehicleRoute, Cargo, CargoLocation
+from polyline import encode_polyline
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+# (lat_min, lat_max, lon_min, lon_max) durván
+COUNTRIES = {
+    "HU": (45.7, 48.6, 16.1, 22.9),
+    "AT": (46.4, 49.0, 9.5, 17.2),
+    "SK": (47.7, 49.6, 16.8, 22.6),
+    "CZ": (48.5, 51.1, 12.1, 18.9),
+    "DE": (47.3, 55.0, 5.9, 15.0),
+    "PL": (49.0, 54.8, 14.1, 24.1),
+    "RO": (43.6, 48.3, 20.3, 29.7),
+}
+
+DIFF_CHOICES = ([0, 25, 50, 100], [0.4, 0.2, 0.3, 0.1])
+CAPACITY_CHOICES = [3.5, 7.5, 12.0, 24.0]
+VEHICLE_TYPES = ["kamion", "furgon", "nyerges"]
+INSERT_BATCH = 5000
+
+SyntheticCity = namedtuple("SyntheticCity", ["country", "postcode", "name", "lat", "lon"])
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(insert(model), rows[start:start + INSERT_BATCH])
+    db.session.commit()
+
+
+class SyntheticData:
+    def __init__(self, n_vehicles, n_cargos, seed=42):
+        self.n_vehicles = n_vehicles
+        self.n_cargos = n_cargos
+        self.rng = np.random.default_rng(seed)
+        self.today = date.today()
+        self.cities = self._make_cities(min(5000, max(500, n_vehicles // 20)))
+        # Zipf-szerű népszerűség
+        weights = 1.0 / np.arange(1, len(self.cities) + 1) ** 0.8
+        self.city_weights = weights / weights.sum()
+        self.vehicle_routes = []  # [(full_route city indexek)] a rakományok generálásához
+
+    def _make_cities(self, n):
+        codes = list(COUNTRIES)
+        cities = []
+        for i in range(n):
+            country = codes[i % len(codes)]
+            lat_min, lat_max, lon_min, lon_max = COUNTRIES[country]
+            cities.append(SyntheticCity(
+                country=country,
+                postcode=str(1000 + i),
+                name=f"{country}-Település-{i:05d}",
+                lat=float(self.rng.uniform(lat_min, lat_max)),
+                lon=float(self.rng.uniform(lon_min, lon_max)),
+            ))
+        return cities
+
+    def _random_city(self, size=None):
+        return self.rng.choice(len(self.cities), size=size, p=self.city_weights)
+
+    def _random_date(self, low, high):
+        return self.today + timedelta(days=int(self.rng.integers(low, high)))
+
+    # ------------------------------------------------------------------
+    # Járművek
+    # ------------------------------------------------------------------
+    def vehicle_rows(self):
+        vehicles, stops = [], []
+        for vid in range(1, self.n_vehicles + 1):
+            origin, destination = (int(c) for c in self._random_city(2))
+            route = [origin] + [int(c) for c in self._random_city(int(self.rng.integers(0, 4)))] + [destination]
+            self.vehicle_routes.append(route)
+
+            o, d = self.cities[origin], self.cities[destination]
+            origin_diff = int(self.rng.choice(DIFF_CHOICES[0], p=DIFF_CHOICES[1]))
+            destination_diff = int(self.rng.choice(DIFF_CHOICES[0], p=DIFF_CHOICES[1]))
+            available_from = self._random_date(-3, 14)
+            available_until = (available_from + timedelta(days=int(self.rng.integers(0, 7)))
+                               if self.rng.random() < 0.8 else None)
+
+            vehicles.append({
+                "vehicle_id": vid,
+                "company_id": 1 + vid % 10,
+                "license_plate": f"BEN{vid:07d}",
+                "vehicle_type": str(self.rng.choice(VEHICLE_TYPES)),
+                "capacity_t": float(self.rng.choice(CAPACITY_CHOICES)),
+                "available_from": available_from,
+                "available_until": available_until,
+                "origin_country": o.country, "origin_postcode": o.postcode, "origin_city": o.name,
+                "origin_diff": origin_diff,
+                "destination_country": d.country, "destination_postcode": d.postcode, "destination_city": d.name,
+                "destination_diff": destination_diff,
+                # egyenes szakaszok a stopok között (OSRM helyett)
+                "route_polyline": encode_polyline([[self.cities[c].lat, self.cities[c].lon] for c in route]),
+            })
+            for stop_number, city in enumerate(route[1:-1], start=1):
+                c = self.cities[city]
+                stops.append({"vehicle_id": vid, "stop_number": stop_number,
+                              "country": c.country, "postcode": c.postcode, "city": c.name})
+        return vehicles, stops
+
+    def city_rows(self):
+        """Country és City sorok (a radius_cache / city_index ezekből dolgozik)"""
+        countries = [{"name": code, "code": code, "capital": code, "region": "EU", "currency_code": "EUR",
+                      "language_code": code.lower(), "flag_url": "", "dialling_code": "", "iso_code": code}
+                     for code in COUNTRIES]
+        cities = [{
+            "id": i + 1, "city_name": c.name, "ascii_name": c.name, "zipcode": c.postcode,
+            "country_code": c.country, "latitude": c.lat, "longitude": c.lon, "population": 0,
+        } for i, c in enumerate(self.cities)]
+        return countries, cities
+
+    # ------------------------------------------------------------------
+    # Rakományok
+    # ------------------------------------------------------------------
+    def cargo_rows(self):
+        cargos, locations = [], []
+        for cid in range(1, self.n_cargos + 1):
+            if self.vehicle_routes and self.rng.random() < 0.5:
+                # egy létező útvonal két pontja, helyes sorrendben
+                route = self.vehicle_routes[int(self.rng.integers(len(self.vehicle_routes)))]
+                i, j = sorted(int(x) for x in self.rng.choice(len(route), 2, replace=False))
+                pickup, dropoff = route[i], route[j]
+            else:
+                pickup, dropoff = (int(c) for c in self._random_city(2))
+
+            start_date = self._random_date(-2, 14)
+            end_date = start_date + timedelta(days=int(self.rng.integers(0, 3)))
+            cargos.append({
+                "cargo_id": cid,
+                "company_id": 1 + cid % 10,
+                "weight": float(self.rng.choice([1.0, 5.0, 10.0, 20.0, 23.5, 26.0])),
+                "vehicle_type": str(self.rng.choice(VEHICLE_TYPES)),
+                "is_template": False,
+            })
+            for loc_type, city, d in (("pickup", pickup, start_date), ("dropoff", dropoff, end_date)):
+                c = self.cities[city]
+                locations.append({
+                    "cargo_id": cid, "type": loc_type,
+                    "country": c.country, "postcode": c.postcode, "city": c.name,
+                    "latitude": c.lat, "longitude": c.lon,
+                    "start_date": d, "end_date": d,
+                })
+        return cargos, locations
+
+    # ------------------------------------------------------------------
+    # Betöltés
+    # ------------------------------------------------------------------
+    def load(self):
+        """A benchmark adatbázis újralétrehozása és feltöltése. App contexten belül kell hívni."""
+        db.drop_all()
+        db.create_all()
+
+        _bulk_insert(Company, [{"company_id": i, "name": f"Bench Company {i}"} for i in range(1, 11)])
+        countries, cities = self.city_rows()
+        _bulk_insert(Country, countries)
+        _bulk_insert(City, cities)
+        vehicles, stops = self.vehicle_rows()
+        _bulk_insert(Vehicle, vehicles)
+        _bulk_insert(VehicleRoute, stops)
+        cargos, locations = self.cargo_rows()
+        _bulk_insert(Cargo, cargos)
+        _bulk_insert(CargoLocation, locations)
+
+        counts = {"vehicles": len(vehicles), "vehicle_routes": len(stops),
+                  "cargos": len(cargos), "cargo_locations": len(locations), "cities": len(self.cities)}
+        print(f"[BENCH] Szintetikus adatok betöltve: {counts}")
+        return counts
@@ -0,0 +1,226 @@
+# cargo_index.py
+"""
+Nyitott rakományok indexe a fordított (jármű -> rakomány) matchinghez.
+
+Kulcs: (országkód, település) -> [(dátum ordinal, cargo_id), ...] dátum szerint rendezve,
+külön a felrakókra és a lerakókra. Rakományonként az első pickup és az utolsó dropoff
+kerül az indexbe (jelölt kereséshez ez elég, mert minden megállónak egyeznie kell);
+az összes megálló sorrendben a CargoEntry-ben van, a pontozás ezeket nézi.
+"""
+import bisect
+import threading
+from collections import defaultdict, namedtuple
+from datetime import date
+from itertools import groupby
+
+from sqlalchemy import or_
+
+from extensions import db
+from models.cargo import Cargo, CargoLocation
+from route_index import city_key
+from corridor_index import grid_cell
+from distance_cache import distance_cache
+from scoring import date_ordinal, feature_masks, NO_DATE
+
+# start_date / dropoff_date / last_end_date: date ordinal (NO_DATE, ha nincs)
+# pickup_coords / dropoff_coords: (lat, lon) vagy None (folyosó matchinghez)
+# pickup_key / dropoff_key: az első felrakó és az utolsó lerakó;
+# pickup_keys / dropoff_keys / stop_coords: az összes megálló sorrendben (felrakók, majd lerakók)
+# features: a jármű igények bitmaszkjai (scoring.FEATURE_FIELDS sorrendben)
+CargoEntry = namedtuple("CargoEntry", [
+    "cargo_id", "pickup_key", "dropoff_key", "start_date", "dropoff_date", "weight", "last_end_date",
+    "pickup_coords", "dropoff_coords", "pickup_keys", "dropoff_keys", "stop_coords", "features"
+])
+
+
+def _location_query():
+    return (
+        db.session.query(
+            CargoLocation.cargo_id, CargoLocation.type, CargoLocation.country, CargoLocation.city,
+            CargoLocation.start_date, CargoLocation.end_date, CargoLocation.latitude, CargoLocation.longitude,
+            Cargo.weight, Cargo.vehicle_type_mask, Cargo.structure_mask, Cargo.equipment_mask,
+            Cargo.cargo_securement_mask
+        )
+        .join(Cargo, Cargo.cargo_id == CargoLocation.cargo_id)
+        .filter(or_(Cargo.is_template == False, Cargo.is_template == None))
+        .order_by(CargoLocation.cargo_id, CargoLocation.id)
+    )
+
+
+def _coords(row):
+    if row.latitude is None or row.longitude is None:
+        return None
+    return row.latitude, row.longitude
+
+
+def _entry_from_rows(cargo_id, rows, cargo=None):
+    pickups = [r for r in rows if r.type == "pickup"]
+    dropoffs = [r for r in rows if r.type == "dropoff"]
+    if not pickups or not dropoffs:
+        return None  # nincs pickup/dropoff -> nem értelmezhető
+    pickup, dropoff = pickups[0], dropoffs[-1]
+
+    end_dates = [r.end_date for r in rows if r.end_date]
+    return CargoEntry(
+        cargo_id=cargo_id,
+        pickup_key=city_key(pickup.country, pickup.city),
+        dropoff_key=city_key(dropoff.country, dropoff.city),
+        start_date=date_ordinal(pickup.start_date),
+        dropoff_date=date_ordinal(dropoff.start_date),
+        weight=(cargo or rows[0]).weight or 0.0,
+        last_end_date=date_ordinal(max(end_dates)) if end_dates else NO_DATE,
+        pickup_coords=_coords(pickup),
+        dropoff_coords=_coords(dropoff),
+        pickup_keys=tuple(city_key(r.country, r.city) for r in pickups),
+        dropoff_keys=tuple(city_key(r.country, r.city) for r in dropoffs),
+        stop_coords=tuple(_coords(r) for r in pickups + dropoffs),
+        features=feature_masks(cargo or rows[0]),
+    )
+
+
+def cargo_entry(cargo):
+    """CargoEntry egy betöltött Cargo objektumból (index nélkül, pl. a megosztott snapshot pontozásához)"""
+    locations = sorted(cargo.locations, key=lambda loc: loc.id or 0)
+    return _entry_from_rows(cargo.cargo_id, locations, cargo=cargo)
+
+
+class CargoIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}                  # cargo_id -> CargoEntry
+        self._pickups = defaultdict(list)   # (country, city) -> [(start_date, cargo_id)] rendezve
+        self._dropoffs = defaultdict(list)  # (country, city) -> [(dropoff_date, cargo_id)] rendezve
+        self._pickup_cells = defaultdict(set)  # rács cella (corridor_index.grid_cell) -> {cargo_id}
+        self._built = False
+
+    def build(self):
+        rows = _location_query().all()
+        today = date.today().toordinal()
+
+        with self._lock:
+            self._entries.clear()
+            self._pickups.clear()
+            self._dropoffs.clear()
+            self._pickup_cells.clear()
+            for cargo_id, group in groupby(rows, key=lambda r: r.cargo_id):
+                entry = _entry_from_rows(cargo_id, list(group))
+                if entry and self._is_open(entry, today):
+                    self._add(entry)
+            self._built = True
+
+        print(f"[LOG] CargoIndex felépítve: {len(self._entries)} nyitott rakomány")
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    @staticmethod
+    def _is_open(entry, today):
+        # ugyanaz a szabály, mint find_expired_items-ben: lejárt, ha a legkésőbbi záró dátum < ma
+        return entry.last_end_date == NO_DATE or entry.last_end_date >= today
+
+    # ------------------------------------------------------------------
+    # Karbantartás
+    # ------------------------------------------------------------------
+    def refresh_cargo(self, cargo_id):
+        if not self._built:
+            self.ensure_built()
+            return
+
+        rows = _location_query().filter(CargoLocation.cargo_id == cargo_id).all()
+        entry = _entry_from_rows(cargo_id, rows) if rows else None
+        with self._lock:
+            self.remove_cargo(cargo_id)
+            if entry and self._is_open(entry, date.today().toordinal()):
+                self._add(entry)
+
+    def remove_cargo(self, cargo_id):
+        with self._lock:
+            entry = self._entries.pop(cargo_id, None)
+            if entry is None:
+                return
+            self._discard(self._pickups, entry.pickup_key, (entry.start_date, cargo_id))
+            self._discard(self._dropoffs, entry.dropoff_key, (entry.dropoff_date, cargo_id))
+            if entry.pickup_coords:
+                cell = grid_cell(*entry.pickup_coords)
+                self._pickup_cells[cell].discard(cargo_id)
+                if not self._pickup_cells[cell]:
+                    del self._pickup_cells[cell]
+
+    def _add(self, entry):
+        self._entries[entry.cargo_id] = entry
+        bisect.insort(self._pickups[entry.pickup_key], (entry.start_date, entry.cargo_id))
+        bisect.insort(self._dropoffs[entry.dropoff_key], (entry.dropoff_date, entry.cargo_id))
+        if entry.pickup_coords:
+            self._pickup_cells[grid_cell(*entry.pickup_coords)].add(entry.cargo_id)
+        distance_cache.set_coords(entry.pickup_key, entry.pickup_coords)
+        distance_cache.set_coords(entry.dropoff_key, entry.dropoff_coords)
+
+    @staticmethod
+    def _discard(postings, key, item):
+        bucket = postings.get(key)
+        if not bucket:
+            return
+        i = bisect.bisect_left(bucket, item)
+        if i < len(bucket) and bucket[i] == item:
+            del bucket[i]
+        if not bucket:
+            del postings[key]
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def get(self, cargo_id):
+        return self._entries.get(cargo_id)
+
+    def open_entries(self):
+        """Az összes nyitott rakomány bejegyzése cargo_id szerint (batch feldolgozáshoz)."""
+        self.ensure_built()
+        today = date.today().toordinal()
+        with self._lock:
+            return [e for _, e in sorted(self._entries.items()) if self._is_open(e, today)]
+
+    def pickups_at(self, key, date_from=None, date_to=None):
+        return self._lookup(self._pickups, key, date_from, date_to)
+
+    def dropoffs_at(self, key, date_from=None, date_to=None):
+        return self._lookup(self._dropoffs, key, date_from, date_to)
+
+    def pickups_in_cells(self, cells):
+        """Nyitott rakományok, amelyek felrakója a megadott rács cellákban van (folyosó matchinghez)"""
+        self.ensure_built()
+        today = date.today().toordinal()
+        with self._lock:
+            return [
+                cargo_id
+                for cell in cells
+                for cargo_id in self._pickup_cells.get(cell, ())
+                if self._is_open(self._entries[cargo_id], today)
+            ]
+
+    def _lookup(self, postings, key, date_from, date_to):
+        """
+        cargo_id-k az adott településen, opcionálisan [date_from, date_to] dátumablakra szűrve.
+        Az ország nélkül rögzített helyszínek (("", város) kulcs) is találatnak számítanak.
+        """
+        self.ensure_built()
+        today = date.today().toordinal()
+        lo = (date_ordinal(date_from),) if date_from else (NO_DATE,)
+        hi = (date_ordinal(date_to), float("inf")) if date_to else (float("inf"),)
+
+        result = []
+        with self._lock:
+            for k in {key, ("", key[1])}:
+                bucket = postings.get(k)
+                if not bucket:
+                    continue
+                for _, cargo_id in bucket[bisect.bisect_left(bucket, lo):bisect.bisect_right(bucket, hi)]:
+                    if self._is_open(self._entries[cargo_id], today):
+                        result.append(cargo_id)
+        return result
+
+
+# process-szintű példány
+cargo_index = CargoIndex()
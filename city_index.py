@@ -0,0 +1,214 @@
+# city_index.py
+"""
+Folyamaton belüli térbeli index a City táblára (NumPy tömbök, egyenletes rács).
+
+A települések (id, lat, lon, ország, népesség, név, irányítószám) egyszer töltődnek be
+(lustán, az első lekérdezéskor), utána a közeli települések keresése nem megy a DB-hez:
+- a pontok GRID_DEG fokos cellák szerint rendezve vannak, cella kulcs = sor * WIDTH + oszlop,
+  így egy rácssor cellái egy összefüggő szeletet adnak (két searchsorted soronként)
+- a jelöltek pontos távolsága vektorizált haversine, útvonalnál pont - szakasz távolság
+
+API:
+    city_index.radius_query(lat, lon, km)         -> (city id-k, km), távolság szerint
+    city_index.k_nearest(lat, lon, k)             -> (city id-k, km), a k legközelebbi
+    city_index.near_route(points, km)             -> (city id-k, útvonal menti km), útvonal sorrendben
+    city_index.cities(ids)                        -> [CityPoint]
+    city_index.find(country, zipcode, city_name)  -> CityPoint vagy None (pontos egyezés)
+"""
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from extensions import db
+from models import City
+from geo import haversine, bounding_box
+from corridor_index import RouteCorridor, GRID_DEG as CORRIDOR_GRID_DEG
+
+GRID_DEG = 0.25            # cellaméret fokban (~28 km szélességben)
+_WIDTH = 4096              # cella kulcs: (sor + _OFFSET) * _WIDTH + (oszlop + _OFFSET)
+_OFFSET = 2048
+K_NEAREST_START_KM = 25.0  # k_nearest kezdő keresési sugara, találat hiányában duplázódik
+K_NEAREST_MAX_KM = 2500.0
+
+CityPoint = namedtuple("CityPoint", [
+    "id", "city_name", "zipcode", "country_code", "latitude", "longitude", "population"
+])
+
+
+def _cell(lat, lon):
+    return int(math.floor(lat / GRID_DEG)), int(math.floor(lon / GRID_DEG))
+
+
+class CityIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._clear()
+
+    def _clear(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lats = np.empty(0, dtype=np.float64)
+        self.lons = np.empty(0, dtype=np.float64)
+        self.countries = np.empty(0, dtype="<U2")
+        self.population = np.empty(0, dtype=np.int64)
+        self.names = np.empty(0, dtype=object)
+        self.zipcodes = np.empty(0, dtype=object)
+        self._cell_keys = np.empty(0, dtype=np.int64)  # pontonként, növekvő sorrendben
+        self._rows = {}                                # city id -> sor
+        self._keys = {}                                # (ország, irányítószám, név) -> sor
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Betöltés
+    # ------------------------------------------------------------------
+    def build(self):
+        rows = db.session.query(
+            City.id, City.latitude, City.longitude, City.country_code, City.population, City.city_name, City.zipcode
+        ).filter(City.latitude != None, City.longitude != None).all()
+        self.load(rows)
+        print(f"[LOG] CityIndex felépítve: {len(rows)} település")
+
+    def load(self, rows):
+        """rows: (id, lat, lon, country_code, population, city_name, zipcode) sorok"""
+        n = len(rows)
+        ids, lats, lons, countries, population, names, zipcodes = (list(col) for col in zip(*rows)) if n else ([],) * 7
+        lats = np.array(lats, dtype=np.float64)
+        lons = np.array(lons, dtype=np.float64)
+        cell_i = np.floor(lats / GRID_DEG).astype(np.int64) + _OFFSET
+        cell_j = np.floor(lons / GRID_DEG).astype(np.int64) + _OFFSET
+        keys = cell_i * _WIDTH + cell_j
+        order = np.argsort(keys, kind="stable")
+
+        with self._lock:
+            self.ids = np.array(ids, dtype=np.int64)[order]
+            self.lats, self.lons = lats[order], lons[order]
+            self.countries = np.array([(c or "").upper() for c in countries], dtype="<U2")[order]
+            self.population = np.array([p or 0 for p in population], dtype=np.int64)[order]
+            self.names = np.array(names, dtype=object)[order]
+            self.zipcodes = np.array(zipcodes, dtype=object)[order]
+            self._cell_keys = keys[order]
+            self._rows = {cid: row for row, cid in enumerate(self.ids.tolist())}
+            self._keys = {}
+            for row, key in enumerate(zip(self.countries.tolist(), self.zipcodes.tolist(), self.names.tolist())):
+                self._keys.setdefault(key, row)
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def _candidate_rows(self, lat, lon, km):
+        """A (lat, lon) körüli km sugarú kört befoglaló cellák pontjainak sorai"""
+        lat_min, lat_max, lon_min, lon_max = bounding_box(lat, lon, km)
+        (i0, j0), (i1, j1) = _cell(lat_min, lon_min), _cell(lat_max, lon_max)
+        i = np.arange(i0, i1 + 1, dtype=np.int64) + _OFFSET
+        lo = np.searchsorted(self._cell_keys, i * _WIDTH + j0 + _OFFSET, side="left")
+        hi = np.searchsorted(self._cell_keys, i * _WIDTH + j1 + _OFFSET, side="right")
+        if not (hi > lo).any():
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(a, b) for a, b in zip(lo.tolist(), hi.tolist()) if b > a])
+
+    def _radius_rows(self, lat, lon, km, country=None, min_population=0):
+        rows = self._candidate_rows(lat, lon, km)
+        if country:
+            rows = rows[self.countries[rows] == country.upper()]
+        if min_population:
+            rows = rows[self.population[rows] >= min_population]
+        dist = haversine(lat, lon, self.lats[rows], self.lons[rows])
+        keep = dist <= km
+        rows, dist = rows[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return rows[order], dist[order]
+
+    def radius_query(self, lat, lon, km, country=None, min_population=0):
+        """km sugáron belüli települések: (city id-k, km) távolság szerint növekvő sorrendben"""
+        self.ensure_built()
+        with self._lock:
+            rows, dist = self._radius_rows(lat, lon, km, country, min_population)
+            return self.ids[rows], dist
+
+    def k_nearest(self, lat, lon, k=1, country=None, min_population=0, max_km=K_NEAREST_MAX_KM):
+        """
+        A k legközelebbi település: (city id-k, km). A keresési sugár addig duplázódik,
+        amíg legalább k találat van benne (a körön belül minden pont megvan, így a k legkisebb pontos).
+        """
+        self.ensure_built()
+        km = K_NEAREST_START_KM
+        with self._lock:
+            while True:
+                rows, dist = self._radius_rows(lat, lon, km, country, min_population)
+                if len(rows) >= k or km >= max_km:
+                    return self.ids[rows[:k]], dist[:k]
+                km = min(km * 2, max_km)
+
+    def _corridor_rows(self, corridor, km):
+        """
+        Az útvonal cellái körüli km sávot befoglaló (saját rácsbeli) cellák pontjainak sorai.
+        A folyosó cellákat egy cellányi ráhagyással bővítjük (a mintavétel átugorhat egy sarok cellát).
+        """
+        g = CORRIDOR_GRID_DEG
+        keys = set()
+        for i, j in corridor.cells:
+            edge_lat = max(abs(i - 1), abs(i + 2)) * g
+            lat, _, _, dlon = bounding_box(edge_lat, 0.0, km)
+            dlat = edge_lat - lat
+            (i0, j0), (i1, j1) = _cell((i - 1) * g - dlat, (j - 1) * g - dlon), _cell((i + 2) * g + dlat, (j + 2) * g + dlon)
+            keys.update((ci + _OFFSET) * _WIDTH + cj + _OFFSET for ci in range(i0, i1 + 1) for cj in range(j0, j1 + 1))
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        keys = np.array(sorted(keys), dtype=np.int64)
+        lo = np.searchsorted(self._cell_keys, keys, side="left")
+        hi = np.searchsorted(self._cell_keys, keys, side="right")
+        keep = hi > lo
+        if not keep.any():
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(a, b) for a, b in zip(lo[keep].tolist(), hi[keep].tolist())])
+
+    def near_route(self, points, km):
+        """
+        Az útvonaltól (a teljes polyline szakaszaitól, nem csak a pontjaitól) km-en belüli települések,
+        az útvonal menti vetületük szerint sorrendben (corridor_index.RouteCorridor).
+        Visszaadja: (city id-k, útvonal menti pozíció km-ben)
+        """
+        self.ensure_built()
+        if not len(points):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        corridor = RouteCorridor(points)
+        with self._lock:
+            rows = self._corridor_rows(corridor, km)
+            dist, along = corridor.locate(self.lats[rows], self.lons[rows], km)
+            keep = dist <= km
+            rows, along = rows[keep], along[keep]
+            order = np.argsort(along, kind="stable")
+            return self.ids[rows[order]], along[order]
+
+    def cities(self, ids):
+        """CityPoint-ok a megadott id-kra (az ismeretlen id-k kimaradnak), a megadott sorrendben"""
+        self.ensure_built()
+        with self._lock:
+            rows = [self._rows[cid] for cid in np.asarray(ids).tolist() if cid in self._rows]
+            return [
+                CityPoint(int(self.ids[r]), self.names[r], self.zipcodes[r], str(self.countries[r]),
+                          float(self.lats[r]), float(self.lons[r]), int(self.population[r]))
+                for r in rows
+            ]
+
+    def find(self, country, zipcode, city_name):
+        """Település pontos (ország, irányítószám, név) egyezéssel, mint City.query.filter_by(...).first()"""
+        self.ensure_built()
+        with self._lock:
+            row = self._keys.get(((country or "").upper(), zipcode, city_name))
+            return None if row is None else self.cities([self.ids[row]])[0]
+
+
+# process-szintű példány
+city_index = CityIndex()
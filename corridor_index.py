@@ -0,0 +1,415 @@
+# corridor_index.py
+"""
+Geometriai (folyosó) matching a járművek tárolt útvonal polyline-jai alapján.
+
+A település-név egyezés nem talál meg egy rakományt, ami pár km-re van az útvonaltól,
+de a településlistában nem szerepel. Itt a CargoLocation koordinátáit a jármű teljes
+útvonalához mérjük (pont - szakasz távolság), és megnézzük, hogy a felrakó az útvonal
+mentén a lerakó előtt van-e.
+
+Rács index: GRID_DEG fokos cellák -> {vehicle_id: (első szakasz, utolsó szakasz)}.
+Egy cellába egy jármű csak egyszer kerül be, a szakasz tartománnyal, így a tárolás
+a bejárt cellák számával arányos, nem a pontok számával.
+
+A lekérdezések (CorridorLookup) két tároláson futnak: a módosítható CorridorIndex-en
+(route_index), és a snapshotba írt, csak olvasható CorridorArrays tömbökön (compact()).
+"""
+import math
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from polyline import decode_polyline
+from geo import KM_PER_DEG_LAT, KM_PER_DEG_LON
+
+GRID_DEG = 0.1      # cellaméret fokban (~11 km szélességben)
+CORRIDOR_KM = 5.0   # alapértelmezett folyosó szélesség (km) a matchingnél
+
+
+def grid_cell(lat, lon):
+    return int(math.floor(lat / GRID_DEG)), int(math.floor(lon / GRID_DEG))
+
+
+def cells_around(lat, lon, km):
+    """A (lat, lon) körüli km sugarú kör által érintett cellák (+1 cella ráhagyással)"""
+    lat_cells = int(math.ceil(km / (KM_PER_DEG_LAT * GRID_DEG))) + 1
+    lon_cells = int(math.ceil(km / (KM_PER_DEG_LON * max(math.cos(math.radians(lat)), 0.01) * GRID_DEG))) + 1
+    ci, cj = grid_cell(lat, lon)
+    return [(i, j) for i in range(ci - lat_cells, ci + lat_cells + 1) for j in range(cj - lon_cells, cj + lon_cells + 1)]
+
+
+def point_segment_distances(lat, lon, lats, lons):
+    """
+    Egy pont távolsága (km) egy polyline minden szakaszától, lokális equirectangular vetületben
+    (néhány tíz km-en belül az eltérés elhanyagolható), és a vetület helye a szakaszon (0..1).
+    lats, lons: a polyline pontjai (n), eredmény: (n - 1) hosszú tömbök
+    """
+    kx = KM_PER_DEG_LON * math.cos(math.radians(lat))
+    x, y = (lons - lon) * kx, (lats - lat) * KM_PER_DEG_LAT
+    x0, y0, dx, dy = x[:-1], y[:-1], np.diff(x), np.diff(y)
+    length2 = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(length2 > 0, -(x0 * dx + y0 * dy) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    px, py = x0 + t * dx, y0 + t * dy
+    return np.hypot(px, py), t
+
+
+_CELL_WIDTH = 8192   # tömör cella kulcs: (sor + _CELL_OFFSET) * _CELL_WIDTH + (oszlop + _CELL_OFFSET)
+_CELL_OFFSET = 4096
+
+
+def segment_cells(lats, lons):
+    """
+    A polyline szakaszai által érintett cellák: (cellák [(i, j)], szakasz index tömbök) párhuzamos listák.
+    A szakaszokat cellánál rövidebb lépésekben mintavételezzük; az átlósan átugrott sarok cellákat
+    a lekérdezés (cells_around) +1 cellás ráhagyása fedi le.
+    """
+    dlat, dlon = np.diff(lats), np.diff(lons)
+    steps = (np.maximum(np.abs(dlat), np.abs(dlon)) / GRID_DEG).astype(np.int64) + 1
+    seg = np.repeat(np.arange(len(steps)), steps + 1)
+    k = np.arange(len(seg)) - np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1)
+    t = k / steps[seg]
+    cell_i = np.floor((lats[seg] + t * dlat[seg]) / GRID_DEG).astype(np.int64) + _CELL_OFFSET
+    cell_j = np.floor((lons[seg] + t * dlon[seg]) / GRID_DEG).astype(np.int64) + _CELL_OFFSET
+    pairs = np.unique((cell_i * _CELL_WIDTH + cell_j) * len(steps) + seg)   # cella, azon belül szakasz szerint
+    keys, seg = pairs // len(steps), pairs % len(steps)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    cells = [(int(key // _CELL_WIDTH) - _CELL_OFFSET, int(key % _CELL_WIDTH) - _CELL_OFFSET) for key in keys[starts]]
+    return cells, np.split(seg, starts[1:])
+
+
+def _cumulative_km(lats, lons):
+    kx = KM_PER_DEG_LON * np.cos(np.radians((lats[:-1] + lats[1:]) / 2))
+    seg = np.hypot(np.diff(lons) * kx, np.diff(lats) * KM_PER_DEG_LAT)
+    return np.concatenate(([0.0], np.cumsum(seg)))
+
+
+def _next_position(positions, reached):
+    """A legkisebb útvonal menti pozíció, ami >= reached (positions növekvő), vagy None"""
+    i = int(np.searchsorted(positions, reached, side="left"))
+    return float(positions[i]) if i < len(positions) else None
+
+
+class CorridorLookup:
+    """
+    A folyosó lekérdezések közös része; a tárolást az alosztály adja:
+    - CorridorIndex: módosítható dict-ek (route_index, upsert / remove)
+    - CorridorArrays: csak olvasható tömbök (MatchSnapshot, a workerek között mmap-pel megosztva)
+    """
+    def _line(self, vehicle_id):
+        """(lats, lons, kumulált km) vagy None"""
+        raise NotImplementedError
+
+    def _cell_entries(self, cell):
+        """[(vehicle_id, első szakasz, utolsó szakasz)] a cellát érintő járművekre"""
+        raise NotImplementedError
+
+    def _line_cells(self, vehicle_id):
+        """A jármű polyline-ja által érintett cellák"""
+        raise NotImplementedError
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def _locate(self, vehicle_id, lat, lon, km, lo=0, hi=None):
+        """
+        A pont km-en belüli helyei a jármű útvonalán: (legkisebb távolság, útvonal menti pozíciók
+        km-ben, növekvő tömb) vagy None. Ha az útvonal többször is elhalad a pont mellett, minden
+        áthaladás pozíciója benne van. lo..hi: a vizsgált szakaszok tartománya.
+        """
+        lats, lons, cum = self._line(vehicle_id)
+        hi = len(lats) - 2 if hi is None else hi
+        dist, t = point_segment_distances(lat, lon, lats[lo:hi + 2], lons[lo:hi + 2])
+        inside = dist <= km
+        if not inside.any():
+            return None
+        along = cum[lo:hi + 1] + t * np.diff(cum[lo:hi + 2])   # szakasz sorrendben nem csökkenő
+        return float(dist[inside].min()), along[inside]
+
+    def near(self, lat, lon, km=CORRIDOR_KM):
+        """{vehicle_id: (távolság km, útvonal menti pozíciók km-ben)} a km-en belül elhaladó járművekre"""
+        ranges = {}
+        with self._lock:
+            for cell in cells_around(lat, lon, km):
+                for vid, lo, hi in self._cell_entries(cell):
+                    old = ranges.get(vid)
+                    ranges[vid] = (min(old[0], lo), max(old[1], hi)) if old else (lo, hi)
+            result = {}
+            for vid, (lo, hi) in ranges.items():
+                hit = self._locate(vid, lat, lon, km, lo, hi)
+                if hit:
+                    result[vid] = hit
+        return result
+
+    def ordered_pairs(self, pickup, dropoff, km=CORRIDOR_KM):
+        """
+        Járművek, amelyek útvonala a felrakó és a lerakó mellett is km-en belül halad el,
+        és a felrakó az útvonal mentén a lerakó előtt van.
+        pickup, dropoff: (lat, lon)
+        """
+        return self.ordered_points([pickup, dropoff], km)
+
+    def ordered_points(self, points, km=CORRIDOR_KM):
+        """
+        Többmegállós változat: minden pont km-en belül, és az útvonal menti pozícióik
+        ebben a sorrendben követik egymást. A koordináta nélküli közbülső pontok kimaradnak,
+        az első és az utolsó pont viszont kötelező.
+        """
+        if len(points) < 2 or not points[0] or not points[-1]:
+            return set()
+        reached = None  # vehicle_id -> a legkorábbi útvonal pozíció, ahol az eddigi pontok sorban elérhetők
+        for point in (p for p in points if p):
+            hits = self.near(point[0], point[1], km)
+            if reached is None:
+                reached = {vid: float(positions[0]) for vid, (_, positions) in hits.items()}
+            else:
+                advanced = {}
+                for vid, pos in reached.items():
+                    step = _next_position(hits[vid][1], pos) if vid in hits else None
+                    if step is not None:
+                        advanced[vid] = step
+                reached = advanced
+            if not reached:
+                return set()
+        return set(reached)
+
+    def endpoints(self, vehicle_id):
+        """Az útvonal első és utolsó pontja ((lat, lon), (lat, lon)) vagy None"""
+        line = self._line(vehicle_id)
+        if line is None:
+            return None
+        lats, lons, _ = line
+        return (float(lats[0]), float(lons[0])), (float(lats[-1]), float(lons[-1]))
+
+    def vehicle_cells(self, vehicle_id, km=CORRIDOR_KM):
+        """A jármű útvonala körüli km sávot lefedő cellák (fordított matchinghez)"""
+        with self._lock:
+            cells = self._line_cells(vehicle_id)
+            ring_lat = int(math.ceil(km / (KM_PER_DEG_LAT * GRID_DEG))) + 1
+            result = set()
+            for i, j in cells:
+                ring_lon = int(math.ceil(km / (KM_PER_DEG_LON * max(math.cos(math.radians(i * GRID_DEG)), 0.01)
+                                               * GRID_DEG))) + 1
+                for di in range(-ring_lat, ring_lat + 1):
+                    for dj in range(-ring_lon, ring_lon + 1):
+                        result.add((i + di, j + dj))
+            return result
+
+    def vehicle_pair(self, vehicle_id, pickup, dropoff, km=CORRIDOR_KM):
+        """Egy jármű: a felrakó és lerakó km-en belül, helyes sorrendben esik-e az útvonalára"""
+        return self.vehicle_points(vehicle_id, [pickup, dropoff], km)
+
+    def vehicle_points(self, vehicle_id, points, km=CORRIDOR_KM):
+        """Egy jármű: a megállók km-en belül, sorrendben esnek-e az útvonalára (lásd ordered_points)"""
+        if len(points) < 2 or not points[0] or not points[-1]:
+            return False
+        with self._lock:
+            if self._line(vehicle_id) is None:
+                return False
+            reached = None
+            for point in (p for p in points if p):
+                hit = self._locate(vehicle_id, point[0], point[1], km)
+                if not hit:
+                    return False
+                reached = float(hit[1][0]) if reached is None else _next_position(hit[1], reached)
+                if reached is None:
+                    return False
+        return True
+
+
+class CorridorIndex(CorridorLookup):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._lines = {}                 # vehicle_id -> (lats, lons, kumulált km)
+        self._cells = {}                 # vehicle_id -> {cell}
+        self._grid = defaultdict(dict)   # cell -> {vehicle_id: (első szakasz, utolsó szakasz)}
+
+    def __len__(self):
+        return len(self._lines)
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self._cells.clear()
+            self._grid.clear()
+
+    def upsert(self, vehicle_id, encoded):
+        with self._lock:
+            self.remove(vehicle_id)
+            if not encoded:
+                return
+            lats, lons = decode_polyline(encoded)
+            if len(lats) < 2:
+                return
+
+            self._lines[vehicle_id] = (lats, lons, _cumulative_km(lats, lons))
+            cells, segments = segment_cells(lats, lons)
+            for cell, segs in zip(cells, segments):
+                self._grid[cell][vehicle_id] = (int(segs[0]), int(segs[-1]))
+            self._cells[vehicle_id] = set(cells)
+
+    def remove(self, vehicle_id):
+        with self._lock:
+            self._lines.pop(vehicle_id, None)
+            for cell in self._cells.pop(vehicle_id, ()):
+                bucket = self._grid.get(cell)
+                if bucket is None:
+                    continue
+                bucket.pop(vehicle_id, None)
+                if not bucket:
+                    del self._grid[cell]
+
+    def _line(self, vehicle_id):
+        return self._lines.get(vehicle_id)
+
+    def _cell_entries(self, cell):
+        return [(vid, lo, hi) for vid, (lo, hi) in self._grid.get(cell, {}).items()]
+
+    def _line_cells(self, vehicle_id):
+        return self._cells.get(vehicle_id, ())
+
+    def compact(self):
+        """
+        Tömbös másolat (CorridorArrays bemenete), vehicle_id és cella kulcs szerint rendezve:
+        - line_*: a polyline-ok egymás után, a line_offsets[i]:line_offsets[i+1] szelet az i. járműé
+        - cell_*: cellánként (cell_keys, tömör kulcs) a járművek és szakasz tartományaik, CSR-ben
+        """
+        with self._lock:
+            vids = sorted(self._lines)
+            lines = [self._lines[vid] for vid in vids]
+            cells = sorted(((i + _CELL_OFFSET) * _CELL_WIDTH + (j + _CELL_OFFSET), sorted(bucket.items()))
+                           for (i, j), bucket in self._grid.items())
+        entries = [entry for _, bucket in cells for entry in bucket]
+        return {
+            "line_vehicle_id": np.array(vids, dtype=np.int64),
+            "line_offsets": np.concatenate(([0], np.cumsum([len(line[0]) for line in lines], dtype=np.int64))),
+            "lats": np.concatenate([line[0] for line in lines]) if lines else np.empty(0),
+            "lons": np.concatenate([line[1] for line in lines]) if lines else np.empty(0),
+            "cum": np.concatenate([line[2] for line in lines]) if lines else np.empty(0),
+            "cell_keys": np.array([key for key, _ in cells], dtype=np.int64),
+            "cell_offsets": np.concatenate(([0], np.cumsum([len(bucket) for _, bucket in cells], dtype=np.int64))),
+            "cell_vehicle_id": np.array([vid for vid, _ in entries], dtype=np.int64),
+            "cell_first": np.array([lo for _, (lo, _) in entries], dtype=np.int32),
+            "cell_last": np.array([hi for _, (_, hi) in entries], dtype=np.int32),
+        }
+
+
+class CorridorArrays(CorridorLookup):
+    """
+    CorridorIndex.compact() tömbjei fölötti, csak olvasható folyosó index (MatchSnapshot).
+    A tömbök lehetnek mmap-pel megnyitott .npy fájlok: a szeletek nézetek, másolat nélkül,
+    a keresés bináris (searchsorted), folyamatonként nem épül dict.
+    """
+    def __init__(self, arrays):
+        self._lock = threading.RLock()
+        self.arrays = arrays
+        self._line_vehicle_id = arrays["line_vehicle_id"]
+        self._line_offsets = arrays["line_offsets"]
+        self._lats, self._lons, self._cum = arrays["lats"], arrays["lons"], arrays["cum"]
+        self._cell_keys = arrays["cell_keys"]
+        self._cell_offsets = arrays["cell_offsets"]
+        self._cell_vehicle_id = arrays["cell_vehicle_id"]
+        self._cell_first, self._cell_last = arrays["cell_first"], arrays["cell_last"]
+
+    # a lock nem pickle-elhető (batch workerek)
+    def __getstate__(self):
+        return {"arrays": self.arrays}
+
+    def __setstate__(self, state):
+        self.__init__(state["arrays"])
+
+    def __len__(self):
+        return len(self._line_vehicle_id)
+
+    def _line(self, vehicle_id):
+        i = int(np.searchsorted(self._line_vehicle_id, vehicle_id))
+        if i >= len(self._line_vehicle_id) or self._line_vehicle_id[i] != vehicle_id:
+            return None
+        lo, hi = self._line_offsets[i], self._line_offsets[i + 1]
+        return self._lats[lo:hi], self._lons[lo:hi], self._cum[lo:hi]
+
+    def _cell_entries(self, cell):
+        key = (cell[0] + _CELL_OFFSET) * _CELL_WIDTH + (cell[1] + _CELL_OFFSET)
+        i = int(np.searchsorted(self._cell_keys, key))
+        if i >= len(self._cell_keys) or self._cell_keys[i] != key:
+            return ()
+        lo, hi = self._cell_offsets[i], self._cell_offsets[i + 1]
+        return zip(self._cell_vehicle_id[lo:hi].tolist(), self._cell_first[lo:hi].tolist(),
+                   self._cell_last[lo:hi].tolist())
+
+    def _line_cells(self, vehicle_id):
+        line = self._line(vehicle_id)
+        if line is None:
+            return ()
+        return segment_cells(np.asarray(line[0]), np.asarray(line[1]))[0]
+
+
+class RouteCorridor:
+    """
+    Egyetlen (nem tárolt) útvonal polyline-ja szakasz rács indexszel, sok pont lekérdezéséhez.
+    Minden pontot csak a saját cellája körüli szakaszokhoz mérünk (pont - szakasz távolság),
+    így a költség az útvonal hosszával és a pontok számával arányos, nem a szorzatukkal.
+    points: [(lat, lon), ...]
+    """
+
+    def __init__(self, points):
+        lats, lons = np.asarray(points, dtype=np.float64).reshape(-1, 2).T
+        if len(lats) == 1:
+            lats, lons = np.repeat(lats, 2), np.repeat(lons, 2)
+        self.lats, self.lons = lats, lons
+        self.cum = _cumulative_km(lats, lons)
+        cells, segments = segment_cells(lats, lons) if len(lats) >= 2 else ([], [])
+        self._grid = dict(zip(cells, segments))   # cell -> szakasz index-ek (növekvő)
+
+    @property
+    def cells(self):
+        """Az útvonal által érintett cellák"""
+        return self._grid.keys()
+
+    def _segments_near(self, cell, km):
+        i, j = cell
+        lat, lon = (i + 0.5) * GRID_DEG, (j + 0.5) * GRID_DEG
+        found = [self._grid[c] for c in cells_around(lat, lon, km) if c in self._grid]
+        return np.unique(np.concatenate(found)) if found else None
+
+    def locate(self, lats, lons, km=CORRIDOR_KM):
+        """
+        Pontok (n) távolsága az útvonaltól és a vetületük útvonal menti pozíciója (km-ben).
+        Visszaadja: (távolság, pozíció) tömbök; a km-nél távolabbi pontoknál inf / nan.
+        Egy pontnál a legközelebbi szakasz számít (egyenlőségnél az útvonal mentén korábbi).
+        """
+        lats, lons = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+        dist = np.full(len(lats), np.inf)
+        along = np.full(len(lats), np.nan)
+        if not len(lats) or not self._grid:
+            return dist, along
+
+        cell_i = np.floor(lats / GRID_DEG).astype(np.int64)
+        cell_j = np.floor(lons / GRID_DEG).astype(np.int64)
+        order = np.lexsort((cell_j, cell_i))
+        keys = (cell_i[order] + _CELL_OFFSET) * _CELL_WIDTH + (cell_j[order] + _CELL_OFFSET)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        for rows in np.split(order, starts[1:]):
+            segs = self._segments_near((int(cell_i[rows[0]]), int(cell_j[rows[0]])), km)
+            if segs is None:
+                continue
+            # pontonkénti lokális equirectangular vetület, (pontok x szakaszok)
+            kx = KM_PER_DEG_LON * np.cos(np.radians(lats[rows]))[:, None]
+            plat, plon = lats[rows][:, None], lons[rows][:, None]
+            x0, y0 = (self.lons[segs] - plon) * kx, (self.lats[segs] - plat) * KM_PER_DEG_LAT
+            dx, dy = (self.lons[segs + 1] - plon) * kx - x0, (self.lats[segs + 1] - plat) * KM_PER_DEG_LAT - y0
+            length2 = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(length2 > 0, -(x0 * dx + y0 * dy) / length2, 0.0)
+            t = np.clip(t, 0.0, 1.0)
+            seg_dist = np.hypot(x0 + t * dx, y0 + t * dy)
+            best = seg_dist.argmin(axis=1)
+            picked = np.arange(len(rows))
+            dist[rows] = seg_dist[picked, best]
+            along[rows] = self.cum[segs[best]] + t[picked, best] * (self.cum[segs[best] + 1] - self.cum[segs[best]])
+
+        outside = dist > km
+        dist[outside], along[outside] = np.inf, np.nan
+        return dist, along
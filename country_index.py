@@ -0,0 +1,106 @@
+# country_index.py
+"""
+Koordináta -> országkód (pont a poligonban), folyamaton belüli indexszel.
+
+A static/geojson/countries/<ORSZÁG>.geojson fájlok egyszer töltődnek be (lustán, az első
+lekérdezéskor). Az országok (Multi)Polygon geometriái egyenként külön poligonokra bomlanak
+(pl. a tengerentúli területek így nem fújják fel a befoglaló téglalapot), előkészítve
+(shapely.prepare), egy STRtree-ben:
+- STRtree.query: befoglaló téglalap jelöltek, egyszerre az összes pontra
+- shapely.intersects az előkészített poligonokon: pontos teszt (a határon lévő pont is találat)
+
+API:
+    country_index.country_code(lat, lon)     -> "HU" vagy None
+    country_index.country_codes(lats, lons)  -> [országkód vagy None], pontonként
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+COUNTRIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "geojson", "countries")
+
+
+class CountryIndex:
+    def __init__(self, path=COUNTRIES_DIR):
+        self._lock = threading.RLock()
+        self._built = False
+        self.path = path
+        self._tree = None
+        self._polygons = np.empty(0, dtype=object)
+        self._codes = np.empty(0, dtype=object)   # poligononként az országkód
+
+    def __len__(self):
+        return len(self._polygons)
+
+    def build(self):
+        started = time.perf_counter()
+        polygons, codes = [], []
+        for fname in sorted(os.listdir(self.path)):
+            if not fname.endswith(".geojson"):
+                continue
+            country_code = fname.split(".")[0].upper()
+            with open(os.path.join(self.path, fname), encoding="utf-8") as f:
+                gj = json.load(f)
+            for feature in gj.get("features", []):
+                if not feature.get("geometry"):
+                    continue
+                for part in shapely.get_parts(shape(feature["geometry"])):
+                    polygons.append(part)
+                    codes.append(country_code)
+        self.load(polygons, codes)
+        print(f"[LOG] CountryIndex felépítve: {len(set(codes))} ország, {len(polygons)} poligon "
+              f"({time.perf_counter() - started:.1f} s)")
+
+    def load(self, polygons, codes):
+        polygons = np.array(polygons, dtype=object)
+        shapely.prepare(polygons)
+        tree = shapely.STRtree(polygons)
+        with self._lock:
+            self._polygons = polygons
+            self._codes = np.array(codes, dtype=object)
+            self._tree = tree
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def country_codes(self, lats, lons):
+        """Pontonként az országkód (vagy None, ha egyik országba sem esik / hiányzik a koordináta)"""
+        self.ensure_built()
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(len(lats), None, dtype=object)
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if not len(valid) or self._tree is None:
+            return result.tolist()
+        points = shapely.points(lons[valid], lats[valid])
+        with self._lock:
+            point_idx, poly_idx = self._tree.query(points)   # befoglaló téglalap jelöltek
+            hit = shapely.intersects(self._polygons[poly_idx], points[point_idx])
+            point_idx, poly_idx = point_idx[hit], poly_idx[hit]
+            # több találatnál (közös határ) a legkisebb poligon index nyer, mint a régi fájl sorrendnél
+            order = np.lexsort((poly_idx, point_idx))
+            point_idx, poly_idx = point_idx[order], poly_idx[order]
+            first = np.r_[True, point_idx[1:] != point_idx[:-1]] if len(point_idx) else np.empty(0, dtype=bool)
+            result[valid[point_idx[first]]] = self._codes[poly_idx[first]]
+        return result.tolist()
+
+    def country_code(self, lat, lon):
+        if lat is None or lon is None:
+            return None
+        return self.country_codes([lat], [lon])[0]
+
+
+# process-szintű példány
+country_index = CountryIndex()
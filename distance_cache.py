@@ -0,0 +1,270 @@
+# distance_cache.py
+"""
+Település-település távolság cache a kitérő (detour) számításhoz.
+
+- kulcs: route_index.city_key (NAGYBETŰS ország, település), a pár rendezve
+- ha nincs tárolt érték: haversine * ROAD_FACTOR becslés a koordinátákból, minden hívásnál újraszámolva
+  (olcsó, ezért sem a memóriában, sem a táblában nem tároljuk)
+- a valódi közúti távolság (pl. OSRM válaszból) a city_distance táblába kerül (flush),
+  induláskor onnan töltődik vissza
+
+Így egy jelölt kitérője néhány dict lookup, nem útvonaltervező hívás.
+
+A megosztott matching snapshotba (match_service) a cache tömbös másolata kerül (compact()):
+DistanceArrays, csak olvasva, a párok rendezett kódjain bináris kereséssel.
+"""
+import math
+import threading
+
+import numpy as np
+from sqlalchemy import or_, and_
+
+from extensions import db
+from models import City, CityDistance
+
+ROAD_FACTOR = 1.3   # haversine -> becsült közúti km (átlagos kanyargósság)
+FLUSH_BATCH = 1000
+
+
+def _haversine(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(h))
+
+
+def _pair(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+class DistanceLookup:
+    """A kitérő számítás közös része; a distance()-t az alosztály adja (DistanceCache, DistanceArrays)"""
+    def distance(self, a, b):
+        raise NotImplementedError
+
+    def detour(self, origin, pickup, dropoff, destination=None):
+        """
+        Kitérő km: origin -> pickup -> dropoff -> destination mínusz origin -> destination.
+        destination None ("bármely ország" jármű): az üres ráállás, origin -> pickup.
+        None, ha valamelyik távolság nem ismert.
+        """
+        to_pickup = self.distance(origin, pickup)
+        if to_pickup is None:
+            return None
+        if destination is None:
+            return to_pickup
+        legs = (self.distance(pickup, dropoff), self.distance(dropoff, destination), self.distance(origin, destination))
+        if None in legs:
+            return None
+        return max(0.0, to_pickup + legs[0] + legs[1] - legs[2])
+
+
+class DistanceCache(DistanceLookup):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._km = {}        # (key_a, key_b) -> km
+        self._road = set()   # párok, ahol a km valódi közúti távolság
+        self._coords = {}    # key -> (lat, lon)
+        self._pending = {}   # (key_a, key_b) -> közúti km, még nincs mentve
+        self._loaded = False
+
+    def load(self):
+        rows = db.session.query(
+            CityDistance.from_country, CityDistance.from_city, CityDistance.to_country, CityDistance.to_city,
+            CityDistance.km, CityDistance.source
+        ).all()
+        with self._lock:
+            for r in rows:
+                pair = _pair((r.from_country, r.from_city), (r.to_country, r.to_city))
+                self._km[pair] = r.km
+                if r.source == "road":
+                    self._road.add(pair)
+            self._loaded = True
+        print(f"[LOG] DistanceCache betöltve: {len(rows)} település pár")
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    # ------------------------------------------------------------------
+    # Koordináták
+    # ------------------------------------------------------------------
+    def set_coords(self, key, coords):
+        if key[1] and coords:
+            with self._lock:
+                self._coords[key] = coords
+
+    def has_coords(self, key):
+        return key in self._coords
+
+    def load_city_coords(self, keys):
+        """Hiányzó koordináták a City táblából, egy lekérdezéssel (500-as csomagokban)"""
+        keys = [k for k in keys if k[0] and k[1] and k not in self._coords]
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = db.session.query(City.country_code, City.city_name, City.latitude, City.longitude).filter(
+                City.latitude != None, City.longitude != None,
+                or_(*[and_(City.country_code == c, City.city_name == name) for c, name in chunk])
+            ).all()
+            with self._lock:
+                for r in rows:
+                    self._coords.setdefault(((r.country_code or "").upper(), r.city_name), (r.latitude, r.longitude))
+
+    # ------------------------------------------------------------------
+    # Távolságok
+    # ------------------------------------------------------------------
+    def distance(self, a, b):
+        """km a két település között (tárolt vagy haversine becslés), None ha nincs koordináta"""
+        if a == b:
+            return 0.0
+        pair = _pair(a, b)
+        km = self._km.get(pair)
+        if km is not None:
+            return km
+        ca, cb = self._coords.get(a), self._coords.get(b)
+        if ca is None or cb is None:
+            return None
+        return _haversine(ca, cb) * ROAD_FACTOR
+
+    def record_road(self, a, b, km):
+        """Valódi közúti távolság (pl. OSRM route distance) rögzítése"""
+        if a == b or not a[1] or not b[1] or km is None:
+            return
+        pair = _pair(a, b)
+        with self._lock:
+            self._km[pair] = km
+            self._road.add(pair)
+            self._pending[pair] = km
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+    def compact(self, extra_keys=()):
+        """
+        Tömbös másolat a DistanceArrays-hez: (kulcsok rendezve, {"coords", "pair_codes", "km"}).
+        extra_keys: kulcsok, amiknek akkor is kell index, ha nincs koordinátájuk (pl. jármű végpontok)
+        """
+        with self._lock:
+            keys = set(self._coords)
+            keys.update(k for pair in self._km for k in pair)
+            keys.update(k for k in extra_keys if k and k[1])
+            keys = sorted(keys)
+            index = {key: i for i, key in enumerate(keys)}
+            coords = np.full((len(keys), 2), np.nan)
+            for key, (lat, lon) in self._coords.items():
+                coords[index[key]] = (lat, lon)
+            codes = np.fromiter((index[a] * len(keys) + index[b] for a, b in self._km),
+                                dtype=np.int64, count=len(self._km))
+            km = np.fromiter(self._km.values(), dtype=np.float64, count=len(self._km))
+        order = np.argsort(codes)
+        return keys, {"coords": coords, "pair_codes": codes[order], "km": km[order]}
+
+    # ------------------------------------------------------------------
+    # Mentés
+    # ------------------------------------------------------------------
+    def flush(self):
+        """Új közúti távolságok mentése (felülírják a korábbi becslés sorokat)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            insert = None
+
+        rows = [
+            {"from_country": a[0], "from_city": a[1], "to_country": b[0], "to_city": b[1], "km": km, "source": "road"}
+            for (a, b), km in pending.items()
+        ]
+        for start in range(0, len(rows), FLUSH_BATCH):
+            batch = rows[start:start + FLUSH_BATCH]
+            if insert is None:
+                for row in batch:
+                    self._merge_row(row)
+                continue
+            stmt = insert(CityDistance).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["from_country", "from_city", "to_country", "to_city"],
+                set_={"km": stmt.excluded.km, "source": stmt.excluded.source},
+            )
+            db.session.execute(stmt)
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def _merge_row(row):
+        existing = CityDistance.query.filter_by(
+            from_country=row["from_country"], from_city=row["from_city"],
+            to_country=row["to_country"], to_city=row["to_city"]
+        ).first()
+        if existing is None:
+            db.session.add(CityDistance(**row))
+        else:
+            existing.km, existing.source = row["km"], row["source"]
+
+
+class DistanceArrays(DistanceLookup):
+    """
+    DistanceCache.compact() tömbjei fölötti, csak olvasható távolság lookup (MatchSnapshot).
+    Pár: (i * len(keys) + j) kód, i <= j a rendezett kulcs lista indexei; a tárolt km-ek bináris
+    kereséssel, a hiányzók haversine becsléssel (nem tárolódnak). Folyamatonként csak a
+    kulcs -> index dict épül; set_coords (a rakomány saját koordinátái) egy kis helyi dict-be ír.
+    """
+    MAX_LOCAL_COORDS = 10000
+
+    def __init__(self, keys, arrays):
+        self.keys = keys
+        self.arrays = arrays
+        self._index = {key: i for i, key in enumerate(keys)}
+        self._coords = arrays["coords"]
+        self._codes = arrays["pair_codes"]
+        self._pair_km = arrays["km"]
+        self._local_coords = {}   # key -> (lat, lon), a snapshotban nem szereplő koordináták
+
+    def __len__(self):
+        return len(self._codes)
+
+    def ref(self, key):
+        """A kulcs indexe a keys listában, -1 ha nincs benne (vagy None)"""
+        return self._index.get(key, -1) if key else -1
+
+    def set_coords(self, key, coords):
+        if not key[1] or not coords or self.has_coords(key):
+            return
+        if len(self._local_coords) >= self.MAX_LOCAL_COORDS:
+            self._local_coords.clear()
+        self._local_coords[key] = coords
+
+    def has_coords(self, key):
+        return key in self._local_coords or self._coords_at(self._index.get(key)) is not None
+
+    def _coords_at(self, i):
+        if i is None or np.isnan(self._coords[i, 0]):
+            return None
+        return float(self._coords[i, 0]), float(self._coords[i, 1])
+
+    def distance(self, a, b):
+        """km a két település között (tárolt vagy haversine becslés), None ha nincs koordináta"""
+        if a == b:
+            return 0.0
+        ia, ib = self._index.get(a), self._index.get(b)
+        if ia is not None and ib is not None:
+            code = min(ia, ib) * len(self.keys) + max(ia, ib)
+            i = int(np.searchsorted(self._codes, code))
+            if i < len(self._codes) and self._codes[i] == code:
+                return float(self._pair_km[i])
+        ca = self._local_coords.get(a) or self._coords_at(ia)
+        cb = self._local_coords.get(b) or self._coords_at(ib)
+        if ca is None or cb is None:
+            return None
+        return _haversine(ca, cb) * ROAD_FACTOR
+
+
+# process-szintű példány
+distance_cache = DistanceCache()
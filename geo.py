@@ -0,0 +1,92 @@
+# geo.py
+"""
+Vektorizált földrajzi távolság számítás (NumPy).
+
+- haversine: gömbi nagykör távolság (km), tetszőleges broadcastolható tömbökön
+- one_to_many: egy pont és n pont távolsága
+- distance_matrix: n x m távolság mátrix, CHUNK_ELEMENTS elemes darabokban számolva,
+  így nagy bemenetnél sem foglal egyszerre n * m méretű köztes tömböket
+- equirectangular: gyors közelítés rövid távolságokra (egy cos / pár, nincs arcsin / sin^2)
+- nearest: n pont közül a legközelebbi, m pontra, darabokban
+- bounding_box: sugár keresés befoglaló téglalapja (rács / SQL előszűréshez)
+
+Az equirectangular hibája a haversine-hoz képest (ugyanaz a gömb sugár, a két pont átlagos
+szélességén vett cos-szal, |lat| <= 70°, mérve): 10 km-en belül < 0.001%, 100 km-en belül < 0.01%,
+500 km-en belül < 0.3% (a hiba nagyjából a távolság négyzetével nő). A ±180°-os hosszúságon
+átnyúló párokra nem jó. Sugár keresésnél, pár száz km-ig bőven elég; pontos határértékhez
+(pl. "<= diff km") a jelölteket haversine-nal kell ellenőrizni.
+"""
+import math
+
+import numpy as np
+
+EARTH_KM = 6371.0
+KM_PER_DEG_LAT = 110.57
+KM_PER_DEG_LON = 111.32   # egyenlítőnél, cos(lat)-tal szorozva
+CHUNK_ELEMENTS = 1 << 20  # distance_matrix darabméret (elemszám, ~8 MB float64 / köztes tömb)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Nagykör távolság km-ben; a bemenetek skalárok vagy broadcastolható tömbök (fok)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_KM * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def one_to_many(lat, lon, lats, lons):
+    """Egy pont távolsága (km) n ponttól: (n,) tömb"""
+    return haversine(lat, lon, lats, lons)
+
+
+def equirectangular(lat1, lon1, lat2, lon2):
+    """Közelítő távolság km-ben (a hibahatár a modul leírásában); broadcastolható tömbökön"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    return EARTH_KM * np.hypot((lon2 - lon1) * np.cos((lat1 + lat2) / 2), lat2 - lat1)
+
+
+def distance_matrix(lats_a, lons_a, lats_b, lons_b, approx=False):
+    """
+    Távolság mátrix (km): (len(a), len(b)) alakú, darabokban számolva.
+    approx: equirectangular közelítés haversine helyett
+    """
+    lats_a, lons_a = np.asarray(lats_a, dtype=np.float64), np.asarray(lons_a, dtype=np.float64)
+    lats_b, lons_b = np.asarray(lats_b, dtype=np.float64), np.asarray(lons_b, dtype=np.float64)
+    metric = equirectangular if approx else haversine
+    result = np.empty((len(lats_a), len(lats_b)), dtype=np.float64)
+    rows = max(1, CHUNK_ELEMENTS // max(len(lats_b), 1))
+    for start in range(0, len(lats_a), rows):
+        stop = start + rows
+        result[start:stop] = metric(lats_a[start:stop, None], lons_a[start:stop, None], lats_b[None, :], lons_b[None, :])
+    return result
+
+
+def nearest(lats_a, lons_a, lats_b, lons_b):
+    """
+    Minden b ponthoz a legközelebbi a pont: (index, km) tömbök, len(b) hosszúak.
+    Darabokban számol, a teljes mátrixot nem tartja meg; egyenlőségnél a kisebb index.
+    """
+    lats_a, lons_a = np.asarray(lats_a, dtype=np.float64), np.asarray(lons_a, dtype=np.float64)
+    lats_b, lons_b = np.asarray(lats_b, dtype=np.float64), np.asarray(lons_b, dtype=np.float64)
+    index = np.zeros(len(lats_b), dtype=np.int64)
+    best = np.full(len(lats_b), np.inf)
+    rows = max(1, CHUNK_ELEMENTS // max(len(lats_b), 1))
+    for start in range(0, len(lats_a), rows):
+        stop = start + rows
+        chunk = haversine(lats_a[start:stop, None], lons_a[start:stop, None], lats_b[None, :], lons_b[None, :])
+        arg = chunk.argmin(axis=0)
+        dist = chunk[arg, np.arange(len(lats_b))]
+        better = dist < best
+        index[better], best[better] = arg[better] + start, dist[better]
+    return index, best
+
+
+def bounding_box(lat, lon, km):
+    """
+    A (lat, lon) körüli km sugarú kört (gömbön) biztosan befoglaló (lat_min, lat_max, lon_min, lon_max).
+    A hosszúság félszélessége a kör legnagyobb hosszúság eltérése, asin(sin(d) / cos(lat)).
+    """
+    d = km / EARTH_KM
+    dlat = math.degrees(d)
+    ratio = math.sin(min(d, math.pi / 2)) / max(math.cos(math.radians(lat)), 1e-9)
+    dlon = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
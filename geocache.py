@@ -0,0 +1,166 @@
+# geocache.py
+"""
+Közös cache a külső geokódoló hívások elé (GeoNames, Nominatim).
+
+Szintek:
+1. memória: LRU (OrderedDict), legfeljebb MAX_ENTRIES kulcs, a DB-vel azonos lejárattal
+2. DB: GeocodeCache tábla, (szolgáltató, normalizált kulcs) -> JSON válasz + lejárat
+3. a hívó fetch függvénye (HTTP), az eredmény mindkét szintre kerül
+
+Negatív találat (a fetch None-t ad) is tárolódik, rövidebb lejárattal (NEGATIVE_TTL), így
+egy nem létező település sem megy ki újra minden kérésnél. Ha a fetch kivételt dob
+(hálózat, timeout, HTTP hiba), semmi nem tárolódik, a kivétel a hívóhoz megy tovább.
+
+A DB írás/olvasás külön kapcsolaton fut (db.engine), nem a hívó db.session-jén: a cache
+commit-ja nem commit-olhatja a hívó félkész objektumait (pl. rakomány mentés közben).
+App context nélkül (háttér szál) csak a memória szint működik.
+
+API:
+    geocache.cached(provider, query_key(...), fetch)  -> fetch() eredménye, cache-ből ha lehet
+    query_key(*parts)                                  -> normalizált kulcs
+    geocache.stats                                     -> találat / hiba számlálók
+"""
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy import select, delete
+
+from extensions import db
+from models.geocode import GeocodeCache
+from geocoder import normalize
+
+POSITIVE_TTL = timedelta(days=90)
+NEGATIVE_TTL = timedelta(days=1)
+MAX_ENTRIES = 10000         # memória LRU (kulcs)
+MAX_KEY_LEN = 255           # GeocodeCache.query_key hossza
+
+_MISSING = object()
+
+
+def query_key(*parts):
+    """Normalizált kulcs a lekérdezés részeiből: "Stuttgart", "de" == "stuttgart", "DE" """
+    return "|".join(normalize(str(p)) if p is not None else "" for p in parts)[:MAX_KEY_LEN]
+
+
+class GeocodeCacheStore:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()   # (szolgáltató, kulcs) -> (lejárat, érték), LRU sorrendben
+        self.max_entries = max_entries
+        self.stats = {"memory": 0, "db": 0, "miss": 0, "negative": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ------------------------------------------------------------------
+    # Memória szint
+    # ------------------------------------------------------------------
+    def _get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= now:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key, expires_at, value):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # DB szint
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _load(key, now):
+        """(lejárat, érték) a DB-ből, vagy None (nincs / lejárt / nincs app context)"""
+        if not has_app_context():
+            return None
+        table = GeocodeCache.__table__
+        try:
+            with db.engine.connect() as conn:
+                row = conn.execute(
+                    select(table.c.payload, table.c.expires_at)
+                    .where(table.c.provider == key[0], table.c.query_key == key[1])
+                ).first()
+        except Exception as e:
+            print("[ERROR] GeocodeCache olvasási hiba:", e)
+            return None
+        if row is None or row.expires_at <= now:
+            return None
+        return row.expires_at, (json.loads(row.payload) if row.payload is not None else None)
+
+    @staticmethod
+    def _store(key, expires_at, value):
+        if not has_app_context():
+            return
+        table = GeocodeCache.__table__
+        try:
+            with db.engine.begin() as conn:   # lejárt / régi sor cseréje egy tranzakcióban
+                conn.execute(delete(table).where(table.c.provider == key[0], table.c.query_key == key[1]))
+                conn.execute(table.insert().values(
+                    provider=key[0], query_key=key[1], expires_at=expires_at, created_at=datetime.now(),
+                    payload=json.dumps(value) if value is not None else None,
+                ))
+        except Exception as e:   # pl. párhuzamos beszúrás ugyanarra a kulcsra: a memória szint így is megvan
+            print("[ERROR] GeocodeCache mentési hiba:", e)
+
+    def purge_expired(self):
+        """Lejárt DB sorok törlése (ütemezett feladat); visszaadja a törölt sorok számát"""
+        table = GeocodeCache.__table__
+        with db.engine.begin() as conn:
+            deleted = conn.execute(delete(table).where(table.c.expires_at <= datetime.now())).rowcount
+        print(f"[LOG] GeocodeCache: {deleted} lejárt sor törölve")
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def cached(self, provider, key, fetch):
+        """
+        provider + key (query_key) alapján a tárolt válasz; ha nincs, fetch() hívása és tárolása.
+        fetch: JSON-szerializálható értéket ad, None = negatív találat; kivétel esetén nincs tárolás.
+        """
+        key = (provider, key)
+        now = datetime.now()
+        value = self._get(key, now)
+        if value is not _MISSING:
+            self.stats["memory"] += 1
+            return value
+
+        loaded = self._load(key, now)
+        if loaded is not None:
+            self.stats["db"] += 1
+            self._put(key, *loaded)
+            return loaded[1]
+
+        self.stats["miss"] += 1
+        try:
+            value = fetch()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        if value is None:
+            self.stats["negative"] += 1
+        # JSON oda-vissza: a cache-ből és a friss hívásból ugyanolyan alakú érték jön (tuple -> lista)
+        value = json.loads(json.dumps(value)) if value is not None else None
+        expires_at = now + (POSITIVE_TTL if value is not None else NEGATIVE_TTL)
+        self._put(key, expires_at, value)
+        self._store(key, expires_at, value)
+        return value
+
+
+# process-szintű példány
+geocache = GeocodeCacheStore()
@@ -0,0 +1,340 @@
+# geocoder.py
+"""
+Offline geokódoló: település név (+ ország, irányítószám) -> koordináta, memóriából.
+
+Forrás: City (név, ascii név), AlterName (alternatív nevek), CityZipcode (irányítószámok).
+A kulcsok normalizáltak (unidecode, kisbetű, egyszeres szóközök), így "Győr", "GYOR" és "gyor"
+ugyanaz. Egy kulcshoz mindig a legnagyobb népességű település tartozik.
+
+Szerkezet:
+- per-ország hash map: {ország: {kulcs: sor}}, és egy ország nélküli {kulcs: sor}
+- rendezett prefix tömbök ("ORSZÁG\\x00kulcs" és "kulcs"), bisect-tel; egy prefix tartomány
+  legnagyobb népességű eleme blokkonkénti maximumokkal (BLOCK elemes blokkok), nem a teljes tartomány bejárásával
+- (ország, irányítószám) -> sorok
+
+Egy lookup ugyanazt a négy szintet adja, mint a régi lookup_coords_local SQL kaszkád:
+pontos + ország, pontos, prefix + ország, prefix (mindegyiken belül népesség szerint).
+
+Hidegindítás: a felépített index pickle snapshotba kerül (SNAPSHOT_PATH); induláskor, ha a
+DB aláírása egyezik, a snapshotból töltődik a DB helyett. Az aláírás táblánként a sorszám,
+a legnagyobb id és egy tartalmi ellenőrzőösszeg (a használt oszlopok SQL aggregátumai: koordináták,
+népesség, szöveghosszak), így a helyben módosított sorok (UPDATE) is új indexet adnak. Az adatfeltöltő
+scriptek ezen felül a végén törlik a snapshotot (invalidate_snapshot).
+"""
+import os
+import pickle
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple, defaultdict
+
+import numpy as np
+from sqlalchemy import func, cast, BigInteger
+from unidecode import unidecode
+
+from extensions import db
+from models.city import City, AlterName, CityZipcode
+
+SNAPSHOT_PATH = os.environ.get("GEOCODER_SNAPSHOT", os.path.join("instance", "geocoder.pkl"))
+SNAPSHOT_VERSION = 2
+BLOCK = 64                  # prefix tartomány maximum: blokkméret
+MAX_ALTER_NAME_LEN = 100    # ennél hosszabb / link jellegű alternatív nevek kimaradnak
+
+GeoHit = namedtuple("GeoHit", [
+    "city_id", "city_name", "country_code", "latitude", "longitude", "population", "zipcode", "tier"
+])
+
+# lookup szintek (GeoHit.tier)
+TIER_ZIPCODE, TIER_EXACT_COUNTRY, TIER_EXACT, TIER_PREFIX_COUNTRY, TIER_PREFIX = (
+    "zipcode", "exact_country", "exact", "prefix_country", "prefix"
+)
+
+
+def normalize(text):
+    """Kereső kulcs: ékezetmentes, kisbetűs, egyszeres szóközökkel"""
+    return " ".join(unidecode(text or "").lower().split())
+
+
+class _PrefixArray:
+    """Rendezett kulcsok + soronkénti népesség; prefix tartomány legnagyobb népességű eleme"""
+
+    def __init__(self, keys, rows, population):
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.rows = np.asarray(rows, dtype=np.int64)[order] if len(order) else np.empty(0, dtype=np.int64)
+        self.pop = population[self.rows] if len(self.rows) else np.empty(0, dtype=np.int64)
+        n_blocks = (len(self.rows) + BLOCK - 1) // BLOCK
+        padded = np.full(n_blocks * BLOCK, -1, dtype=np.int64)
+        padded[:len(self.pop)] = self.pop
+        blocks = padded.reshape(n_blocks, BLOCK)
+        self.block_arg = blocks.argmax(axis=1) + np.arange(n_blocks) * BLOCK   # blokkonként a legjobb index
+        self.block_max = blocks.max(axis=1)
+
+    def best(self, prefix):
+        """A prefix-szel kezdődő kulcsok közül a legnagyobb népességű sor, vagy None"""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        if hi <= lo:
+            return None
+        first_block, last_block = -(-lo // BLOCK), hi // BLOCK   # teljes blokkok: [first_block, last_block)
+        if first_block >= last_block:
+            return int(self.rows[lo + int(self.pop[lo:hi].argmax())])
+        candidates = [int(self.block_arg[first_block + int(self.block_max[first_block:last_block].argmax())])]
+        if lo < first_block * BLOCK:
+            candidates.append(lo + int(self.pop[lo:first_block * BLOCK].argmax()))
+        if last_block * BLOCK < hi:
+            candidates.append(last_block * BLOCK + int(self.pop[last_block * BLOCK:hi].argmax()))
+        return int(self.rows[min(candidates, key=lambda i: (-self.pop[i], i))])
+
+
+def _checksum_columns(model):
+    """
+    Tartalmi ellenőrzőösszeg: a geokódoló által használt oszlopok egész értékű összegei
+    (szövegeknél id-vel súlyozott hossz, hogy két sor cseréje is látsszon; BigInteger, nem csordul túl)
+    """
+    row_id = cast(model.id, BigInteger)
+    if model is City:
+        return (
+            func.sum(cast(City.latitude * 1e6, BigInteger)),
+            func.sum(cast(City.longitude * 1e6, BigInteger)),
+            func.sum(City.population),
+            func.sum(row_id * func.length(City.city_name)),
+            func.sum(row_id * func.length(City.ascii_name)),
+            func.sum(row_id * func.length(City.country_code)),
+            func.sum(row_id * func.length(City.zipcode)),
+        )
+    if model is AlterName:
+        return func.sum(row_id * AlterName.city_id), func.sum(row_id * func.length(AlterName.alternames))
+    return func.sum(row_id * CityZipcode.city_id), func.sum(row_id * func.length(CityZipcode.zipcode))
+
+
+class OfflineGeocoder:
+    def __init__(self, snapshot_path=SNAPSHOT_PATH):
+        self._lock = threading.RLock()
+        self._built = False
+        self.snapshot_path = snapshot_path
+        self._clear()
+
+    def _clear(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lats = np.empty(0, dtype=np.float64)
+        self.lons = np.empty(0, dtype=np.float64)
+        self.population = np.empty(0, dtype=np.int64)
+        self.countries = []
+        self.names = []
+        self.zipcodes = []                        # soronként az elsődleges irányítószám (City, különben CityZipcode)
+        self._exact = {}                          # kulcs -> sor
+        self._exact_country = {}                  # ország -> {kulcs -> sor}
+        self._by_zipcode = {}                     # (ország, irsz.) -> [sor]
+        self._prefix = _PrefixArray([], [], self.population)
+        self._prefix_country = _PrefixArray([], [], self.population)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Felépítés
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _signature():
+        """
+        A forrás táblák aláírása (egy aggregáló lekérdezés táblánként): a snapshot ezzel egyezve érvényes.
+        Az egész értékű összegek adatbázistól és végrehajtási tervtől függetlenül pontosak.
+        """
+        return (SNAPSHOT_VERSION,) + tuple(
+            tuple(db.session.query(func.count(model.id), func.max(model.id), *_checksum_columns(model)).one())
+            for model in (City, AlterName, CityZipcode)
+        )
+
+    def invalidate_snapshot(self):
+        """A snapshot törlése (adatfeltöltés után): a következő build a DB-ből épít"""
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+            print(f"[LOG] Geocoder snapshot törölve: {self.snapshot_path}")
+
+    def build(self):
+        started = time.perf_counter()
+        signature = self._signature()
+        if self._load_snapshot(signature):
+            print(f"[LOG] Geocoder snapshotból betöltve: {len(self)} település "
+                  f"({time.perf_counter() - started:.1f} s)")
+            return
+
+        cities = db.session.query(
+            City.id, City.city_name, City.ascii_name, City.country_code, City.latitude, City.longitude,
+            City.population, City.zipcode
+        ).filter(City.latitude != None, City.longitude != None).all()
+        alter_names = db.session.query(AlterName.city_id, AlterName.alternames).all()
+        zipcodes = db.session.query(CityZipcode.city_id, CityZipcode.zipcode).all()
+        self.load(cities, alter_names, zipcodes)
+        self._save_snapshot(signature)
+        print(f"[LOG] Geocoder felépítve: {len(cities)} település, {len(alter_names)} alternatív név "
+              f"({time.perf_counter() - started:.1f} s)")
+
+    def load(self, cities, alter_names=(), zipcodes=()):
+        """
+        cities: (id, city_name, ascii_name, country_code, lat, lon, population, zipcode) sorok
+        alter_names: (city_id, név), zipcodes: (city_id, irányítószám)
+        """
+        rows = {}
+        ids, lats, lons, population, countries, names, primary_zip = [], [], [], [], [], [], []
+        for r in cities:
+            rows[r[0]] = len(ids)
+            ids.append(r[0])
+            names.append(r[1])
+            countries.append((r[3] or "").upper())
+            lats.append(r[4])
+            lons.append(r[5])
+            population.append(r[6] or 0)
+            primary_zip.append(r[7] or None)
+        population = np.array(population, dtype=np.int64)
+
+        # (kulcs, sor) párok: név, ascii név, alternatív nevek
+        names_of = defaultdict(set)
+        for r in cities:
+            row = rows[r[0]]
+            for name in (r[1], r[2]):
+                if name:
+                    names_of[row].add(normalize(name))
+        for city_id, name in alter_names:
+            row = rows.get(city_id)
+            if row is None or not name or len(name) > MAX_ALTER_NAME_LEN or name.startswith("http"):
+                continue
+            names_of[row].add(normalize(name))
+
+        exact, exact_country = {}, defaultdict(dict)
+        for row, keys in names_of.items():
+            country, pop = countries[row], population[row]
+            by_country = exact_country[country]
+            for key in keys:
+                if not key:
+                    continue
+                best = exact.get(key)
+                if best is None or pop > population[best]:
+                    exact[key] = row
+                best = by_country.get(key)
+                if best is None or pop > population[best]:
+                    by_country[key] = row
+
+        by_zipcode = defaultdict(list)
+        for row, z in enumerate(primary_zip):
+            if z:
+                by_zipcode[(countries[row], z)].append(row)
+        for city_id, z in zipcodes:
+            row = rows.get(city_id)
+            if row is None or not z:
+                continue
+            if primary_zip[row] is None:
+                primary_zip[row] = z
+            if row not in by_zipcode[(countries[row], z)]:
+                by_zipcode[(countries[row], z)].append(row)
+
+        prefix = _PrefixArray(list(exact), list(exact.values()), population)
+        country_keys, country_rows = [], []
+        for country, by_key in exact_country.items():
+            for key, row in by_key.items():
+                country_keys.append(f"{country}\x00{key}")
+                country_rows.append(row)
+        prefix_country = _PrefixArray(country_keys, country_rows, population)
+
+        with self._lock:
+            self.ids = np.array(ids, dtype=np.int64)
+            self.lats = np.array(lats, dtype=np.float64)
+            self.lons = np.array(lons, dtype=np.float64)
+            self.population = population
+            self.countries, self.names, self.zipcodes = countries, names, primary_zip
+            self._exact, self._exact_country = exact, dict(exact_country)
+            self._by_zipcode = dict(by_zipcode)
+            self._prefix, self._prefix_country = prefix, prefix_country
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    # ------------------------------------------------------------------
+    # Snapshot (hidegindítás)
+    # ------------------------------------------------------------------
+    _STATE = ("ids", "lats", "lons", "population", "countries", "names", "zipcodes",
+              "_exact", "_exact_country", "_by_zipcode", "_prefix", "_prefix_country")
+
+    def _save_snapshot(self, signature):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp = f"{self.snapshot_path}.tmp{os.getpid()}"
+            with open(tmp, "wb") as f:
+                pickle.dump({"signature": signature, **{name: getattr(self, name) for name in self._STATE}},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.snapshot_path)
+        except OSError as e:
+            print("[ERROR] Geocoder snapshot mentési hiba:", e)
+
+    def _load_snapshot(self, signature):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print("[ERROR] Geocoder snapshot olvasási hiba:", e)
+            return False
+        if state.get("signature") != signature:
+            return False
+        with self._lock:
+            for name in self._STATE:
+                setattr(self, name, state[name])
+            self._built = True
+        return True
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def _hit(self, row, tier):
+        return GeoHit(int(self.ids[row]), self.names[row], self.countries[row], float(self.lats[row]),
+                      float(self.lons[row]), int(self.population[row]), self.zipcodes[row], tier)
+
+    def lookup(self, country, city, postcode=None):
+        """
+        A legjobb találat (GeoHit) vagy None. Szintek sorrendben:
+        irányítószám + név, pontos + ország, pontos, prefix + ország, prefix.
+        """
+        key = normalize(city)
+        if not key:
+            return None
+        country = (country or "").strip().upper()
+        self.ensure_built()
+        with self._lock:
+            if country and postcode:
+                for row in self._by_zipcode.get((country, str(postcode).strip()), ()):
+                    if normalize(self.names[row]) == key:
+                        return self._hit(row, TIER_ZIPCODE)
+            if country:
+                row = self._exact_country.get(country, {}).get(key)
+                if row is not None:
+                    return self._hit(row, TIER_EXACT_COUNTRY)
+            row = self._exact.get(key)
+            if row is not None:
+                return self._hit(row, TIER_EXACT)
+            if country:
+                row = self._prefix_country.best(f"{country}\x00{key}")
+                if row is not None:
+                    return self._hit(row, TIER_PREFIX_COUNTRY)
+            row = self._prefix.best(key)
+            if row is not None:
+                return self._hit(row, TIER_PREFIX)
+        return None
+
+    def by_zipcode(self, country, postcode):
+        """Az (ország, irányítószám) települései népesség szerint csökkenő sorrendben: [GeoHit]"""
+        self.ensure_built()
+        with self._lock:
+            rows = self._by_zipcode.get(((country or "").strip().upper(), str(postcode or "").strip()), ())
+            return [self._hit(row, TIER_ZIPCODE) for row in sorted(rows, key=lambda r: -self.population[r])]
+
+
+# process-szintű példány
+geocoder = OfflineGeocoder()
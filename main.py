@@ -14,8 +14,12 @@ from utils import *
 from models import *
 from config import *
 from apscheduler.schedulers.background import BackgroundScheduler
+from match_store import prune_matches
+from geocoder import geocoder
+from geocache import geocache
 from datetime import date, datetime
 import os
+import threading
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 app = Flask(__name__)
 app.config['BABEL_DEFAULT_LOCALE'] = 'hu'
@@ -133,6 +137,10 @@ def notify_expired_items():
             db.session.add(notif)
 
     db.session.commit()
+
+    # --- Tárolt találatok törlése a lejárt tételekhez ---
+    prune_matches(cargo_ids=expired_cargo_ids, vehicle_ids=[v.vehicle_id for v in expired_vehicles])
+
     print(f"[SCHEDULER] Lejárt értesítések frissítve ({len(expired_cargo_ids)} cargo, {len(expired_vehicles)} vehicle).")
 
 
@@ -170,10 +178,20 @@ def start_scheduler(app):
         timezone="Europe/Budapest"
     )
 
+    # Napi takarítás (lejárt geokódoló cache sorok)
+    scheduler.add_job(
+        func=lambda: app.app_context().push() or geocache.purge_expired(),
+        trigger="cron",
+        hour=3,
+        minute=0,
+        timezone="Europe/Budapest"
+    )
+
     scheduler.start()
     print("Scheduler started:")
     print(" - delete_expired -> every day at 00:01")
     print(" - delete_expired_offers -> every hour")
+    print(" - geocache.purge_expired -> every day at 03:00")
 
 
 @app.context_processor
@@ -274,6 +292,8 @@ if __name__ == "__main__":
     with app.app_context():
         db.create_all()
     start_scheduler(app)
+    # offline geokódoló felépítése a háttérben (snapshotból, ha friss), hogy az első kérés ne várjon rá
+    threading.Thread(target=lambda: app.app_context().push() or geocoder.ensure_built(), daemon=True).start()
     # app.run(debug=True)
     print("[DB URI]:", app.config["SQLALCHEMY_DATABASE_URI"])
     socketio.run(app, '0.0.0.0', port=port, debug=True)
@@ -0,0 +1,80 @@
+# major_city.py
+"""
+Rejtett helyszínek bújtatása: a település helyett a legközelebbi "nagy" település
+(népesség >= MIN_POPULATION, mint a GeoNames cities15000 lista) neve és irányítószáma.
+
+Teljesen helyben fut, HTTP hívás nélkül:
+1. az eredeti település koordinátája: geocoder.lookup (City + AlterName, memóriából)
+2. legközelebbi nagy település: city_index.k_nearest(min_population=MIN_POPULATION)
+3. irányítószám: CityZipcode (a település első irányítószáma), különben City.zipcode
+
+Az eredmény (ország, normalizált név) kulcsra cache-elődik (LRU), a nem talált település is.
+
+API:
+    major_city_masker.mask(city_name, country_code)  -> (városnév, irányítószám vagy None)
+"""
+import threading
+from collections import OrderedDict
+
+from models.city import CityZipcode
+from city_index import city_index
+from geocoder import geocoder, normalize
+
+MIN_POPULATION = 15000
+MAX_ENTRIES = 4096          # memória LRU (település)
+
+
+class MajorCityMasker:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()   # (ország, kulcs) -> (városnév, irsz.) vagy None, LRU sorrendben
+        self.max_entries = max_entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _postcode(city):
+        zipcode = CityZipcode.query.filter_by(city_id=city.id).order_by(CityZipcode.id).first()
+        if zipcode and zipcode.zipcode:
+            return zipcode.zipcode
+        return city.zipcode or None
+
+    @classmethod
+    def _compute(cls, city_name, country_code):
+        hit = geocoder.lookup(country_code, city_name)
+        if hit is None:
+            return None
+        ids, _ = city_index.k_nearest(hit.latitude, hit.longitude, k=1, min_population=MIN_POPULATION)
+        majors = city_index.cities(ids)
+        if not majors:
+            return None
+        major = majors[0]
+        return major.city_name, cls._postcode(major)
+
+    def mask(self, city_name, country_code):
+        """(bújtatott városnév, irányítószám); ha nincs találat, (city_name, None), mint a GeoNames változatnál"""
+        key = ((country_code or "").strip().upper(), normalize(city_name))
+        if not key[1]:
+            return city_name, None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                result = self._entries[key]
+                return result if result is not None else (city_name, None)
+
+        result = self._compute(city_name, country_code)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if result is None:
+            print(f"[LOG] Bújtatás: nincs találat {city_name} ({country_code}), az eredeti marad")
+            return city_name, None
+        return result
+
+
+# process-szintű példány
+major_city_masker = MajorCityMasker()
@@ -0,0 +1,408 @@
+# match_service.py
+"""
+Önálló matching szolgáltatás: az útvonal / elérhetőség / kapacitás index egyetlen
+folyamatban él, a web workerek egy memóriába mappelt oszlopos snapshotot olvasnak.
+
+- a szolgáltatás építi a route_index-et és a cargo_index-et, és a batch matchinghez
+  használt MatchSnapshot-ot verziózott könyvtárba írja (SNAPSHOT_DIR/v000042/):
+  oszlopok (a kitérőhöz a végpont hivatkozásokkal), postings CSR, folyosó rács (corridor.*)
+  és távolság (distances.*) tömbök .npy fájlokban, település kulcsok keys.json /
+  distances.keys.json fájlokban; folyamatonként csak a kulcs -> index dict-ek épülnek újra
+- a CURRENT fájl az aktuális verzió neve; atomikusan cserélődik (os.replace),
+  így az olvasó vagy a régi, vagy az új teljes snapshotot látja
+- a web workerek np.load(mmap_mode="r")-rel nyitják meg: a tömbök a page cache-ben
+  egyszer vannak, a workerek számától függetlenül (zero-copy)
+- a változásokat (jármű / rakomány mentés, törlés) a workerek a szolgáltatásnak küldik
+  (multiprocessing.connection), az index frissítés és az újrapublikálás csak ott fut
+- a fordított irányú pontozást (jármű -> rakományok, score_vehicle) a workerek kérésként
+  küldik (request), a szolgáltatás a saját route_index / cargo_index-ével válaszol, így a
+  web workerekben nem épül route_index
+
+Bekapcsolás a web workerekben: MATCH_SERVICE=1. Ha a szolgáltatás nem érhető el
+vagy még nincs snapshot, minden a korábbi, folyamaton belüli indexekkel működik.
+
+A kapcsolat kulcsa a MATCH_SERVICE_AUTHKEY (legalább MIN_AUTHKEY_LENGTH karakter), a szolgáltatás és
+a workerek ugyanazt kapják. Kötelező: a Listener / Client a fogadott üzenetet unpickle-öli, és a
+MATCH_SERVICE_HOST más gépre is mutathat. Kulcs nélkül a szolgáltatás nem indul, a workerek nem
+csatlakoznak (helyben számolnak).
+
+Futtatás:
+    python match_service.py
+"""
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections.abc import Mapping
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+SNAPSHOT_DIR = os.environ.get("MATCH_SNAPSHOT_DIR", os.path.join("instance", "match_snapshot"))
+SERVICE_ADDRESS = (os.environ.get("MATCH_SERVICE_HOST", "127.0.0.1"), int(os.environ.get("MATCH_SERVICE_PORT", 6001)))
+SERVICE_AUTHKEY = os.environ.get("MATCH_SERVICE_AUTHKEY", "").encode()
+MIN_AUTHKEY_LENGTH = 16
+PUBLISH_SECONDS = 2.0      # változás után legfeljebb ennyi idő múlva új snapshot
+REBUILD_SECONDS = 3600.0   # teljes újraépítés (lejárt járművek, kimaradt események ellen)
+CHECK_SECONDS = 1.0        # az olvasó ennyi időnként nézi meg a CURRENT fájlt
+REQUEST_SECONDS = 10.0     # ennyit várunk a szolgáltatás válaszára (request), utána helyben számolunk
+KEEP_VERSIONS = 3          # ennyi régi verzió marad (a még mappelt olvasóknak)
+
+_POSTING_ARRAYS = ("vehicle_id", "position", "kind", "radius_km")
+_REQUESTS = ("score_vehicle",)   # válaszos üzenetek, a többi esemény
+
+
+def enabled():
+    """
+    Web worker oldalon: a szolgáltatást használjuk-e (a szolgáltatás folyamatban mindig False).
+    MATCH_SERVICE_AUTHKEY nélkül akkor sem, ha MATCH_SERVICE=1 (egyszer hibát logol).
+    """
+    if os.environ.get("MATCH_SERVICE") != "1" or _in_service:
+        return False
+    return has_authkey()
+
+
+def has_authkey():
+    global _authkey_warned
+    if len(SERVICE_AUTHKEY) >= MIN_AUTHKEY_LENGTH:
+        return True
+    if not _authkey_warned:
+        _authkey_warned = True
+        print(f"[ERROR] MATCH_SERVICE_AUTHKEY nincs beállítva (legalább {MIN_AUTHKEY_LENGTH} karakter), "
+              f"a matching szolgáltatás nem használható")
+    return False
+
+
+_in_service = False
+_authkey_warned = False
+
+
+# ----------------------------------------------------------------------
+# Snapshot írás / olvasás
+# ----------------------------------------------------------------------
+class CsrPostings(Mapping):
+    """
+    A postings dict ((country, city) -> (vehicle_id, position, kind, radius_km) tömbök)
+    CSR formában: egy kulcs a keys listában i. helyen, a tömbjei az offsets[i]:offsets[i+1] szelet.
+    A szeletek a mappelt tömbök nézetei, másolat nélkül.
+    """
+    def __init__(self, keys, offsets, arrays):
+        self._index = {key: i for i, key in enumerate(keys)}
+        self._offsets = offsets
+        self._arrays = arrays
+
+    @classmethod
+    def from_dict(cls, postings):
+        keys = sorted(postings)
+        lengths = [len(postings[k][0]) for k in keys]
+        offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        arrays = tuple(
+            np.concatenate([postings[k][i] for k in keys]) if keys else np.empty(0)
+            for i in range(len(_POSTING_ARRAYS))
+        )
+        return cls(keys, offsets, arrays)
+
+    def __getitem__(self, key):
+        i = self._index[key]
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        return tuple(a[lo:hi] for a in self._arrays)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+
+def write_snapshot(snapshot, directory=SNAPSHOT_DIR):
+    """MatchSnapshot kiírása új verzióként; visszaadja a verzió nevét"""
+    os.makedirs(directory, exist_ok=True)
+    version = f"v{current_version_number(directory) + 1:06d}"
+    tmp = os.path.join(directory, f".{version}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for name, values in snapshot.columns.items():
+        np.save(os.path.join(tmp, f"columns.{name}.npy"), np.ascontiguousarray(values))
+    postings = snapshot.postings if isinstance(snapshot.postings, CsrPostings) \
+        else CsrPostings.from_dict(snapshot.postings)
+    keys = list(postings)
+    np.save(os.path.join(tmp, "postings.offsets.npy"), np.asarray(postings._offsets))
+    for name, values in zip(_POSTING_ARRAYS, postings._arrays):
+        np.save(os.path.join(tmp, f"postings.{name}.npy"), np.asarray(values))
+    with open(os.path.join(tmp, "keys.json"), "w", encoding="utf-8") as f:
+        json.dump(keys, f, ensure_ascii=False)
+    for name, values in snapshot.corridor.arrays.items():
+        np.save(os.path.join(tmp, f"corridor.{name}.npy"), np.ascontiguousarray(values))
+    for name, values in snapshot.distances.arrays.items():
+        np.save(os.path.join(tmp, f"distances.{name}.npy"), np.ascontiguousarray(values))
+    with open(os.path.join(tmp, "distances.keys.json"), "w", encoding="utf-8") as f:
+        json.dump(snapshot.distances.keys, f, ensure_ascii=False)
+
+    os.rename(tmp, os.path.join(directory, version))
+    pointer = os.path.join(directory, "CURRENT.tmp")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(directory, "CURRENT"))
+    _prune_versions(directory, version)
+    return version
+
+
+def _prune_versions(directory, current):
+    # Linuxon a már mappelt fájlok törlés után is olvashatók maradnak
+    versions = sorted(d for d in os.listdir(directory) if d.startswith("v") and d != current)
+    for old in versions[:-(KEEP_VERSIONS - 1) or None]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+
+def current_version(directory=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def current_version_number(directory=SNAPSHOT_DIR):
+    version = current_version(directory)
+    return int(version[1:]) if version else 0
+
+
+def _load_arrays(path, prefix):
+    """A prefix.<név>.npy fájlok mmap-pel (csak olvasható): {név: tömb}"""
+    return {
+        name[len(prefix) + 1:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+        for name in os.listdir(path) if name.startswith(prefix + ".") and name.endswith(".npy")
+    }
+
+
+def _load_keys(path, name):
+    with open(os.path.join(path, name), encoding="utf-8") as f:
+        return [tuple(k) for k in json.load(f)]
+
+
+def load_snapshot(version, directory=SNAPSHOT_DIR):
+    """Egy verzió megnyitása: minden tömb mmap-pel (csak olvasható), a kulcs listák JSON-ból"""
+    from batch_matching import MatchSnapshot
+    from corridor_index import CorridorArrays
+    from distance_cache import DistanceArrays
+
+    path = os.path.join(directory, version)
+    columns = _load_arrays(path, "columns")
+    keys = _load_keys(path, "keys.json")
+    postings = CsrPostings(
+        keys,
+        np.load(os.path.join(path, "postings.offsets.npy"), mmap_mode="r"),
+        tuple(np.load(os.path.join(path, f"postings.{name}.npy"), mmap_mode="r") for name in _POSTING_ARRAYS),
+    )
+    corridor = CorridorArrays(_load_arrays(path, "corridor"))
+    distances = DistanceArrays(_load_keys(path, "distances.keys.json"), _load_arrays(path, "distances"))
+    snapshot = MatchSnapshot(postings, columns, corridor, distances)
+    snapshot.version = version
+    return snapshot
+
+
+class SharedSnapshot:
+    """Web worker oldali olvasó: mindig az aktuális verziót adja, változáskor újra mappel"""
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._checked = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._checked < CHECK_SECONDS:
+            return self._snapshot
+        with self._lock:
+            self._checked = now
+            version = current_version(self.directory)
+            if version and (self._snapshot is None or self._snapshot.version != version):
+                try:
+                    self._snapshot = load_snapshot(version, self.directory)
+                    print(f"[LOG] Matching snapshot betöltve: {version}")
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[ERROR] Matching snapshot betöltési hiba ({version}):", e)
+            return self._snapshot
+
+
+_shared = SharedSnapshot()
+
+
+def shared_snapshot():
+    """Az aktuális megosztott snapshot, vagy None (nincs bekapcsolva / még nincs publikálva)"""
+    return _shared.get() if enabled() else None
+
+
+# ----------------------------------------------------------------------
+# Web worker -> szolgáltatás események
+# ----------------------------------------------------------------------
+def notify(kind, item_id):
+    """
+    Változás jelzése a szolgáltatásnak: "vehicle", "drop_vehicle", "cargo", "drop_cargo",
+    vagy "cargo_index" (csak a cargo_index frissítése, a találatokat a hívó menti).
+    False, ha nincs bekapcsolva vagy nem érhető el (ilyenkor a hívó helyben intézi).
+    """
+    if not enabled():
+        return False
+    try:
+        with Client(SERVICE_ADDRESS, authkey=SERVICE_AUTHKEY) as conn:
+            conn.send((kind, int(item_id)))
+        return True
+    except (OSError, EOFError) as e:
+        print(f"[ERROR] Matching szolgáltatás nem érhető el ({kind} {item_id}):", e)
+        return False
+
+
+def request(kind, item_id, timeout=REQUEST_SECONDS):
+    """
+    Kérés a szolgáltatásnak, válasszal: "score_vehicle" -> a jármű pontozott rakományai
+    ([ScoredMatch], ugyanaz, mint matching.score_vehicle).
+    None, ha nincs bekapcsolva, nem érhető el, nem válaszol időben vagy hibát jelez
+    (ilyenkor a hívó helyben számol).
+    """
+    if not enabled():
+        return None
+    try:
+        with Client(SERVICE_ADDRESS, authkey=SERVICE_AUTHKEY) as conn:
+            conn.send((kind, int(item_id)))
+            if not conn.poll(timeout):
+                print(f"[ERROR] Matching szolgáltatás nem válaszolt időben ({kind} {item_id})")
+                return None
+            status, result = conn.recv()
+    except (OSError, EOFError) as e:
+        print(f"[ERROR] Matching szolgáltatás nem érhető el ({kind} {item_id}):", e)
+        return None
+    if status != "ok":
+        print(f"[ERROR] Matching szolgáltatás hiba ({kind} {item_id}):", result)
+        return None
+    return result
+
+
+# ----------------------------------------------------------------------
+# Szolgáltatás
+# ----------------------------------------------------------------------
+class MatchService:
+    def __init__(self, app, directory=SNAPSHOT_DIR):
+        self.app = app
+        self.directory = directory
+        self.events = queue.Queue()
+
+    def _listen(self):
+        with Listener(SERVICE_ADDRESS, authkey=SERVICE_AUTHKEY) as listener:
+            print(f"[LOG] Matching szolgáltatás figyel: {SERVICE_ADDRESS[0]}:{SERVICE_ADDRESS[1]}")
+            while True:
+                conn = None
+                try:
+                    conn = listener.accept()
+                    kind, item_id = conn.recv()
+                except (OSError, EOFError, AuthenticationError, ValueError) as e:
+                    print("[ERROR] Matching szolgáltatás esemény hiba:", e)
+                    if conn is not None:
+                        conn.close()
+                    continue
+                if kind in _REQUESTS:
+                    self.events.put((kind, item_id, conn))   # a választ a fő ciklus küldi, utána zár
+                else:
+                    conn.close()
+                    self.events.put((kind, item_id, None))
+
+    def publish(self):
+        from batch_matching import MatchSnapshot
+
+        started = time.perf_counter()
+        version = write_snapshot(MatchSnapshot.from_indexes(), self.directory)
+        print(f"[LOG] Matching snapshot publikálva: {version} ({time.perf_counter() - started:.2f} s)")
+
+    def rebuild(self):
+        from route_index import route_index
+        from cargo_index import cargo_index
+
+        route_index.build()
+        cargo_index.build()
+        self.publish()
+
+    def answer(self, kind, item_id, conn):
+        """Egy kérés megválaszolása a szolgáltatás indexeivel; hiba esetén ("error", üzenet) megy vissza"""
+        from extensions import db
+        from models import Vehicle
+        from matching import score_vehicle
+
+        reply = ("error", f"ismeretlen kérés: {kind}")
+        try:
+            if kind == "score_vehicle":
+                vehicle = db.session.get(Vehicle, item_id)
+                reply = ("ok", score_vehicle(vehicle) if vehicle else [])
+        except Exception as e:
+            reply = ("error", str(e))
+            raise
+        finally:
+            try:
+                conn.send(reply)
+            except (OSError, EOFError) as e:
+                print(f"[ERROR] Matching válasz küldési hiba ({kind} {item_id}):", e)
+            conn.close()
+
+    def apply(self, kind, item_id):
+        """Egy esemény: index frissítés + tárolt találatok, ugyanúgy, mint a match_store hookok"""
+        import match_store
+        from cargo_index import cargo_index
+
+        handler = {
+            "vehicle": match_store.sync_vehicle,
+            "drop_vehicle": match_store.drop_vehicle,
+            "cargo": match_store.sync_cargo,
+            "drop_cargo": match_store.drop_cargo,
+            "cargo_index": cargo_index.refresh_cargo,
+        }.get(kind)
+        if handler is None:
+            print(f"[ERROR] Ismeretlen matching esemény: {kind}")
+            return False
+        handler(item_id)
+        return kind in ("vehicle", "drop_vehicle")  # csak a járműindex része a snapshotnak
+
+    def run(self):
+        global _in_service
+        if not has_authkey():
+            raise RuntimeError("MATCH_SERVICE_AUTHKEY nincs beállítva, a matching szolgáltatás nem indul el")
+        _in_service = True
+        threading.Thread(target=self._listen, daemon=True).start()
+
+        with self.app.app_context():
+            self.rebuild()
+            rebuilt, dirty_since = time.monotonic(), None
+            while True:
+                try:
+                    kind, item_id, conn = self.events.get(timeout=PUBLISH_SECONDS)
+                    if conn is not None:
+                        self.answer(kind, item_id, conn)
+                    elif self.apply(kind, item_id) and dirty_since is None:
+                        dirty_since = time.monotonic()
+                except queue.Empty:
+                    pass
+                except Exception as e:
+                    from extensions import db
+                    db.session.rollback()
+                    print("[ERROR] Matching esemény feldolgozási hiba:", e)
+                finally:
+                    from extensions import db
+                    db.session.remove()
+
+                now = time.monotonic()
+                if now - rebuilt >= REBUILD_SECONDS:
+                    self.rebuild()
+                    rebuilt, dirty_since = now, None
+                elif dirty_since is not None and now - dirty_since >= PUBLISH_SECONDS:
+                    self.publish()
+                    dirty_since = None
+
+
+if __name__ == "__main__":
+    from main import app
+    MatchService(app).run()
@@ -0,0 +1,168 @@
+# match_store.py
+"""
+A cargo_vehicle_match tábla inkrementális karbantartása.
+
+- új / módosított rakomány: csak ezt a rakományt pontozzuk újra (route_index alapján)
+- új / módosított jármű: csak az érintett rakományokat pontozzuk újra (cargo_index alapján)
+- törölt / lejárt tétel: a sorai törlődnek
+A listázás így egy indexelt lekérdezés, nem kell minden oldalbetöltésnél matchinget futtatni.
+"""
+from datetime import date
+
+import numpy as np
+from sqlalchemy.orm import joinedload, selectinload
+
+from extensions import db
+from models import Cargo, Vehicle, CargoVehicleMatch
+from matching import score_cargo, score_vehicle, vehicle_match_dict, cargo_match_dict
+from route_index import route_index
+from cargo_index import cargo_index
+from distance_cache import distance_cache
+from match_service import notify, shared_snapshot, enabled as service_enabled
+from scoring import NO_DATE
+
+
+def _mappings(scored, cargo_id=None, vehicle_id=None):
+    return [
+        {
+            "cargo_id": cargo_id if cargo_id is not None else m.item_id,
+            "vehicle_id": vehicle_id if vehicle_id is not None else m.item_id,
+            "score": m.score,
+            "breakdown": m.breakdown,
+        }
+        for m in scored
+    ]
+
+
+def _without_expired_vehicles(scored):
+    """Lejárt raktér (available_until < ma) nem kerül a táblába, ugyanaz a szabály, mint notify_expired_items-ben"""
+    if not scored:
+        return scored
+    snapshot = shared_snapshot()
+    if snapshot is not None:
+        ids = [m.item_id for m in scored]
+        until = snapshot.vehicle_column("available_until", ids)
+    elif service_enabled():
+        # match_service mellett, még snapshot nélkül: a web worker nem épít route_index-et, a DB dönt
+        ids = sorted({m.item_id for m in scored})
+        expired = set()
+        for start in range(0, len(ids), 500):
+            expired.update(vid for (vid,) in db.session.query(Vehicle.vehicle_id).filter(
+                Vehicle.vehicle_id.in_(ids[start:start + 500]), Vehicle.available_until < date.today()
+            ))
+        return [m for m in scored if m.item_id not in expired]
+    else:
+        rows, ids = route_index.columns.rows_for([m.item_id for m in scored])
+        until = route_index.columns.available_until[rows]
+    expired = set(np.asarray(ids)[(until != NO_DATE) & (until < date.today().toordinal())].tolist())
+    return [m for m in scored if m.item_id not in expired]
+
+
+# ----------------------------------------------------------------------
+# Írás
+# ----------------------------------------------------------------------
+def store_cargo_matches(cargo, scored=None):
+    """
+    Egy rakomány összes találatának újraszámolása és mentése.
+    scored: már kiszámolt ScoredMatch lista (pl. match_stream), ilyenkor nem pontozunk újra
+    """
+    scored = _without_expired_vehicles(score_cargo(cargo) if scored is None else scored)
+
+    CargoVehicleMatch.query.filter_by(cargo_id=cargo.cargo_id).delete(synchronize_session=False)
+    if scored:
+        db.session.bulk_insert_mappings(CargoVehicleMatch, _mappings(scored, cargo_id=cargo.cargo_id))
+    db.session.commit()
+    return len(scored)
+
+
+def store_vehicle_matches(vehicle):
+    """Egy jármű találatainak újraszámolása: csak a jármű útvonalát érintő nyitott rakományok"""
+    scored = score_vehicle(vehicle)
+    if vehicle.available_until and vehicle.available_until < date.today():
+        scored = []
+
+    CargoVehicleMatch.query.filter_by(vehicle_id=vehicle.vehicle_id).delete(synchronize_session=False)
+    if scored:
+        db.session.bulk_insert_mappings(CargoVehicleMatch, _mappings(scored, vehicle_id=vehicle.vehicle_id))
+    db.session.commit()
+    distance_cache.flush()  # a jármű mentésekor rögzített közúti távolságok
+    return len(scored)
+
+
+def prune_matches(cargo_ids=(), vehicle_ids=()):
+    """Lejárt / törölt tételek sorainak törlése"""
+    cargo_ids, vehicle_ids = list(cargo_ids), list(vehicle_ids)
+    if cargo_ids:
+        CargoVehicleMatch.query.filter(CargoVehicleMatch.cargo_id.in_(cargo_ids)).delete(synchronize_session=False)
+    if vehicle_ids:
+        CargoVehicleMatch.query.filter(CargoVehicleMatch.vehicle_id.in_(vehicle_ids)).delete(synchronize_session=False)
+    if cargo_ids or vehicle_ids:
+        db.session.commit()
+
+
+# ----------------------------------------------------------------------
+# Hookok a view-knak: index + tárolt találatok együtt frissülnek
+# (match_service mellett az esemény a szolgáltatáshoz megy, ott futnak le ugyanezek)
+# ----------------------------------------------------------------------
+def sync_vehicle(vehicle_id):
+    if notify("vehicle", vehicle_id):
+        distance_cache.flush()  # a közúti távolság (record_road) a web workerben rögzült
+        return
+    route_index.refresh_vehicle(vehicle_id)
+    vehicle = db.session.get(Vehicle, vehicle_id)
+    if vehicle:
+        store_vehicle_matches(vehicle)
+
+
+def drop_vehicle(vehicle_id):
+    if notify("drop_vehicle", vehicle_id):
+        return
+    route_index.remove_vehicle(vehicle_id)
+    prune_matches(vehicle_ids=[vehicle_id])
+
+
+def sync_cargo(cargo_id):
+    if notify("cargo", cargo_id):
+        return
+    cargo_index.refresh_cargo(cargo_id)
+    cargo = db.session.get(Cargo, cargo_id)
+    if cargo:
+        store_cargo_matches(cargo)
+
+
+def drop_cargo(cargo_id):
+    if notify("drop_cargo", cargo_id):
+        return
+    cargo_index.remove_cargo(cargo_id)
+    prune_matches(cargo_ids=[cargo_id])
+
+
+# ----------------------------------------------------------------------
+# Listázás (indexelt lekérdezés)
+# ----------------------------------------------------------------------
+def list_cargo_matches(cargo_id, limit=None):
+    """Egy rakományhoz tárolt járműtalálatok pontszám szerint csökkenő sorrendben"""
+    q = (
+        db.session.query(CargoVehicleMatch, Vehicle)
+        .join(Vehicle, Vehicle.vehicle_id == CargoVehicleMatch.vehicle_id)
+        .options(joinedload(Vehicle.company))
+        .filter(CargoVehicleMatch.cargo_id == cargo_id)
+        .order_by(CargoVehicleMatch.score.desc(), CargoVehicleMatch.vehicle_id)
+    )
+    if limit:
+        q = q.limit(limit)
+    return [vehicle_match_dict(v, m.score, m.breakdown) for m, v in q.all()]
+
+
+def list_vehicle_matches(vehicle_id, limit=None):
+    """Egy járműhöz tárolt rakománytalálatok pontszám szerint csökkenő sorrendben"""
+    q = (
+        db.session.query(CargoVehicleMatch, Cargo)
+        .join(Cargo, Cargo.cargo_id == CargoVehicleMatch.cargo_id)
+        .options(selectinload(Cargo.locations), joinedload(Cargo.company))
+        .filter(CargoVehicleMatch.vehicle_id == vehicle_id)
+        .order_by(CargoVehicleMatch.score.desc(), CargoVehicleMatch.cargo_id)
+    )
+    if limit:
+        q = q.limit(limit)
+    return [cargo_match_dict(c, m.score, m.breakdown) for m, c in q.all()]
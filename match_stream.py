@@ -0,0 +1,85 @@
+# match_stream.py
+"""
+Rakomány matching háttérben, az eredmények Socket.IO-n a feladó user_{id} szobájába.
+
+A /cargo POST a mentés után azonnal visszatér a cargo_id-val; a pontozás egy háttér
+feladatban fut (socketio.start_background_task), jelölt csomagonként (matching.iter_score_cargo).
+Minden csomag után a "cargo_matches" esemény az eddigi legjobb TOP_N találatot küldi
+(final: false), a végén a cargo_vehicle_match táblába mentett végleges listát (final: true).
+Végleges esemény hiba esetén is megy (üres lista + általános "error" szöveg), hogy a kliens ne várjon tovább.
+"""
+import heapq
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from extensions import db, socketio
+from models import Cargo
+from cargo_index import cargo_index
+from matching import iter_score_cargo, hydrate_vehicle_matches
+from match_store import store_cargo_matches, list_cargo_matches
+from match_service import notify
+
+TOP_N = 10          # ennyi találat megy ki eseményenként
+STREAM_BATCH = 200  # ennyi jelölt egy pontozási csomag
+
+# a böngészőnek csak ezek mennek ki, a részletes hiba a szerver logba kerül
+STREAM_ERROR = "Hiba a találatok keresésekor"
+NOT_FOUND_ERROR = "A rakomány nem található"
+
+
+def jsonable_match(match):
+    return {k: v.isoformat() if isinstance(v, (date, datetime)) else v for k, v in match.items()}
+
+
+def _emit(room, cargo_id, matches, scored, final, error=None):
+    payload = {
+        "cargo_id": cargo_id,
+        "matches": [jsonable_match(m) for m in matches],
+        "top_vehicle_ids": [m["vehicle_id"] for m in matches],
+        "scored": scored,
+        "final": final,
+    }
+    if error:
+        payload["error"] = error
+    socketio.emit("cargo_matches", payload, room=room)
+
+
+def start_cargo_match_stream(cargo_id, user_id):
+    """A matching elindítása háttérben; a hívó (view) nem vár rá"""
+    app = current_app._get_current_object()
+    socketio.start_background_task(_stream_cargo_matches, app, cargo_id, user_id)
+
+
+def _stream_cargo_matches(app, cargo_id, user_id):
+    room = f"user_{user_id}"
+    with app.app_context():
+        scored_all, best, scored = [], [], 0
+        try:
+            # a fordított irány indexe: match_service mellett a szolgáltatásban frissül
+            if not notify("cargo_index", cargo_id):
+                cargo_index.refresh_cargo(cargo_id)
+            cargo = (Cargo.query.options(selectinload(Cargo.locations))
+                     .filter(Cargo.cargo_id == cargo_id).first())
+            if cargo is None:
+                print(f"[ERROR] Matching stream: a rakomány nem található (cargo={cargo_id})")
+                _emit(room, cargo_id, [], scored, final=True, error=NOT_FOUND_ERROR)
+                return
+
+            for batch in iter_score_cargo(cargo, batch_size=STREAM_BATCH):
+                scored_all.extend(batch)
+                scored += len(batch)
+                top = heapq.nlargest(TOP_N, best + batch, key=lambda m: (m.score, -m.item_id))
+                if top != best:
+                    best = top
+                    _emit(room, cargo_id, hydrate_vehicle_matches(best), scored, final=False)
+
+            # végleges lista: mentés, majd a tárolt (lejárt járművek nélküli) top lista
+            store_cargo_matches(cargo, scored=scored_all)
+            _emit(room, cargo_id, list_cargo_matches(cargo_id, limit=TOP_N), scored, final=True)
+            print(f"[LOG] Matching stream kész: cargo={cargo_id}, {scored} találat")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERROR] Matching stream hiba (cargo={cargo_id}):", e)
+            _emit(room, cargo_id, [], scored, final=True, error=STREAM_ERROR)
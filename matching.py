@@ -1,168 +1,467 @@
-from datetime import datetime
+from collections import namedtuple
+import numpy as np
+from sqlalchemy.orm import joinedload, selectinload
 from models import *
-from utils import haversine, parse_time, parse_date
+from route_index import route_index, hit_masks, city_key
+from cargo_index import cargo_index, cargo_entry
+from distance_cache import distance_cache
+from scoring import (LOC_NONE, LOC_NEARBY, LOC_EXACT, date_ordinal, stop_codes, side_codes,
+                     score_candidates, score_components, location_passed, location_scores, capacity_scores, time_scores, upper_bounds, top_k,
+                     any_destination_codes, country_allowed, corridor_codes, detour_scores,
+                     feature_masks, features_compatible)
+from match_service import shared_snapshot, request
 
-# pontszám súlyok
-LOCATION_POINTS = {
-    "exact_match": 50,
-    "on_route": 25,
-}
+# item_id: vehicle_id (cargo -> jármű) vagy cargo_id (jármű -> cargo)
+# breakdown: {"location": .., "time": .., "capacity": .., "detour": ..}
+ScoredMatch = namedtuple("ScoredMatch", ["item_id", "score", "breakdown"])
 
-TIME_POINTS = {
-    "in_time": 40,
-    "late_penalty": 10,   # naponta ennyit vonunk le
-}
 
-CAPACITY_POINTS = {
-    "equal_or_10_less": 25,
-    "much_smaller": 15,
-    "slightly_bigger": 0,
-    "too_big": -30,
-}
-
-
-def get_vehicle_route_cities(vehicle_id):
-    """Lekéri a jármű útvonalán szereplő településeket stop_number szerint"""
-    routes = VehicleRoute.query.filter_by(vehicle_id=vehicle_id).order_by(VehicleRoute.stop_number).all()
-    return [r.city for r in routes]
-
-
-def city_in_route_or_nearby(vehicle, cargo_city, ref_type):
-    """
-    Ellenőrzi, hogy a cargo_city benne van-e a jármű útvonalán vagy NearbyCity-ben
-    a vehicle origin_diff / destination_diff figyelembevételével.
-    ref_type: 'origin' vagy 'destination'
-    """
-    full_route = [vehicle.origin_city] + get_vehicle_route_cities(vehicle.vehicle_id) + [vehicle.destination_city]
-
-    # Pontos match
-    if cargo_city in full_route:
-        return True, "exact"
-
-    # NearbyCity match, csak ha van diff
-    diff = getattr(vehicle, f"{ref_type}_diff")
-    if not diff or diff == 0:
-        return False, None  # jármű nem hajlandó eltérni, skip
-
-    # Lekérjük a NearbyCity-ket a stopokhoz
-    for stop in full_route:
-        nearby_cities = NearbyCity.query.filter_by(
-            reference_country=getattr(vehicle, f"{ref_type}_country"),
-            reference_postcode=getattr(vehicle, f"{ref_type}_postcode"),
-            reference_city=stop
-        ).all()
-
-        for nc in nearby_cities:
-            # Hány km-re van a stop-tól?
-            if nc.city_name == cargo_city and nc.radius_km <= diff:
-                return True, "nearby"
-
-    return False, None
-
-
-def find_matches_for_cargo(cargo: Cargo):
-    """
-    Előszűrés helyszín alapján:
-    - pickup és dropoff városnak szerepelnie kell a jármű útvonalában vagy NearbyCity-ben
-    - sorrend: pickup -> dropoff
-    Utána idő és kapacitás pontozás.
-    """
-    matches = []
-
-    vehicles = Vehicle.query.all()
-
-    for vehicle in vehicles:
-        cargo_origin = next((loc for loc in cargo.locations if loc.type == "pickup"), None)
-        cargo_dest = next((loc for loc in cargo.locations if loc.type == "dropoff"), None)
-
-        if not cargo_origin or not cargo_dest:
-            continue  # nincs pickup/dropoff -> nem értelmezhető
-
-        # --- Előszűrés: pickup és dropoff benne van a jármű útvonalában vagy NearbyCity-ben ---
-        ok_origin, origin_type = city_in_route_or_nearby(vehicle, cargo_origin.city, "origin")
-        ok_dest, dest_type = city_in_route_or_nearby(vehicle, cargo_dest.city, "destination")
-
-        if not (ok_origin and ok_dest):
-            continue  # jármű nem tudja vállalni a cargo-t
-
-        # sorrendellenőrzés az útvonalon (exact vagy nearby)
-        full_route = [vehicle.origin_city] + get_vehicle_route_cities(vehicle.vehicle_id) + [vehicle.destination_city]
-        try:
-            if full_route.index(cargo_origin.city) >= full_route.index(cargo_dest.city):
-                continue
-        except ValueError:
-            # ha nearby volt, előfordulhat, hogy nincs pontosan benne az útvonalban
-            pass
-
-        # --- PONTOZÁS ---
-        score = 0
-
-        # Város pontozás
-        if origin_type == "exact":
-            score += LOCATION_POINTS["exact_match"]
-        elif origin_type == "nearby":
-            score += LOCATION_POINTS["on_route"]
-
-        if dest_type == "exact":
-            score += LOCATION_POINTS["exact_match"]
-        elif dest_type == "nearby":
-            score += LOCATION_POINTS["on_route"]
-
-        # Időpontozás
-        time_score = 0
-        if vehicle.available_from and cargo_origin.start_date:
-            if vehicle.available_until is None:
-                delta_days = max(0, (vehicle.available_from - cargo_origin.start_date).days)
-                time_score += max(0, 40 - delta_days * 10)
-            else:
-                if vehicle.available_from <= cargo_origin.start_date <= vehicle.available_until:
-                    time_score += 40
-                else:
-                    if cargo_origin.start_date < vehicle.available_from:
-                        delta = (vehicle.available_from - cargo_origin.start_date).days
-                    else:
-                        delta = (cargo_origin.start_date - vehicle.available_until).days
-                    time_score += max(0, 40 - delta * 10)
-        score += time_score
-
-        # Kapacitás pontozás
-        capacity_score = 0
-        if vehicle.capacity_t and cargo.weight:
-            ratio = cargo.weight / vehicle.capacity_t
-            if 0.9 <= ratio <= 1.0:
-                capacity_score += 25
-            elif ratio < 0.9:
-                capacity_score += 15
-            elif 1.0 < ratio <= 1.1:
-                capacity_score += 0
-            else:
-                capacity_score += -30
-        score += capacity_score
-
-        # --- Találat hozzáadása ---
-        matches.append({
-            "vehicle_id": vehicle.vehicle_id,
-            "origin_country": vehicle.origin_country,
-            "origin_postcode": vehicle.origin_postcode,
-            "origin_city": vehicle.origin_city,
-            "available_from": vehicle.available_from,
-            "destination_country": vehicle.destination_country,
-            "destination_postcode": vehicle.destination_postcode,
-            "destination_city": vehicle.destination_city,
-            "available_until": vehicle.available_until,
-            "vehicle_type": vehicle.vehicle_type,
-            "structure": vehicle.structure,
-            "equipment": vehicle.equipment,
-            "cargo_securement": vehicle.cargo_securement,
-            "description": vehicle.description,
-            "capacity_t": vehicle.capacity_t,
-            "volume_m3": vehicle.volume_m3,
-            "price": vehicle.price,
-            "currency": vehicle.currency,
-            "company": vehicle.company.name if vehicle.company else None,
-            "score": score
-        })
+def _scored(item_ids, location, time, capacity, detour):
+    return [
+        ScoredMatch(item_id, l + t + c + d, {"location": l, "time": t, "capacity": c, "detour": d})
+        for item_id, l, t, c, d in zip(item_ids, location.tolist(), time.tolist(), capacity.tolist(), detour.tolist())
+    ]
+
+
+def detour_km(vehicle_ids, pickup_key, dropoff_key):
+    """Járművenkénti kitérő km (distance_cache, néhány dict lookup / jármű), NaN ha nem ismert"""
+    result = np.full(len(vehicle_ids), np.nan)
+    for i, vid in enumerate(vehicle_ids):
+        origin_key, destination_key = route_index.endpoints(vid)
+        if origin_key:
+            km = distance_cache.detour(origin_key, pickup_key, dropoff_key, destination_key)
+            if km is not None:
+                result[i] = km
+    return result
+
+
+def _coords(loc):
+    if loc.latitude is None or loc.longitude is None:
+        return None
+    return loc.latitude, loc.longitude
+
+
+def cargo_stops(cargo):
+    """A rakomány megállói sorrendben: (felrakók, lerakók), felvitel (id) szerint"""
+    locations = sorted(cargo.locations, key=lambda loc: loc.id or 0)
+    return ([loc for loc in locations if loc.type == "pickup"],
+            [loc for loc in locations if loc.type == "dropoff"])
+
+
+def stop_arrays(hits_per_stop, vehicle_ids, ref_type, diffs):
+    """Megállónkénti helyszín kódok és pozíció maszkok: (megállók, jelöltek) alakú tömbök"""
+    codes, masks = zip(*(stop_codes(*hit_masks(hits, vehicle_ids, ref_type, diffs)) for hits in hits_per_stop))
+    return np.vstack(codes), np.vstack(masks)
+
+
+def _padded_stop_arrays(keys_per_item, hits_for=None, ref_type=None, diff=0.0, countries=None):
+    """
+    stop_arrays egy járműre, tételenként (rakományonként) eltérő számú megállóval: (max megálló, tételek).
+    A hiányzó megálló LOC_EXACT kódú és 0 maszkú, így sem a pontot, sem a sorrendet nem befolyásolja.
+    countries: "bármely ország" jármű bitsetje; ilyenkor a megálló országa dönt, a pozíció ismeretlen.
+    """
+    n_stops = max(len(keys) for keys in keys_per_item)
+    codes = np.full((n_stops, len(keys_per_item)), LOC_EXACT, dtype=np.int64)
+    masks = np.zeros((n_stops, len(keys_per_item)), dtype=np.uint64)
+    for stop in range(n_stops):
+        items = [i for i, keys in enumerate(keys_per_item) if len(keys) > stop]
+        if countries is not None:
+            codes[stop, items] = [LOC_NEARBY if country_allowed(countries, keys_per_item[i][stop][0])[0] else LOC_NONE
+                                  for i in items]
+            continue
+        hits = {i: hits_for(keys_per_item[i][stop]) for i in items}
+        codes[stop, items], masks[stop, items] = stop_codes(*hit_masks(hits, items, ref_type, diff))
+    return codes, masks
+
+
+def _common_ids(hits_per_stop):
+    ids = set(hits_per_stop[0])
+    for hits in hits_per_stop[1:]:
+        ids &= hits.keys()
+    return ids
+
+
+# helyszín szűrésen átjutott jelöltek, pontozás előtt
+# rows / vehicle_ids: VehicleColumns sorok és járművek; origin_codes / dest_codes: oldalanként a helyszín kód
+CargoCandidates = namedtuple("CargoCandidates", [
+    "rows", "vehicle_ids", "origin_codes", "dest_codes", "pickup_key", "dropoff_key", "start_date", "weight"
+])
+
+
+def cargo_candidates(cargo: Cargo, within_days=None):
+    """
+    Egy cargo jelölt járművei a helyszín előszűrés után (route_index), pontozás nélkül.
+    Az összes felrakó és lerakó számít: mindegyiknek az útvonalon (vagy NearbyCity-ben) kell lennie,
+    a sorrendjüknek megfelelő, monoton útvonal pozíciókon (scoring.route_order_passed).
+    Visszaadja: CargoCandidates vagy None, ha nincs jelölt
+    """
+    pickups, dropoffs = cargo_stops(cargo)
+    if not pickups or not dropoffs:
+        return None  # nincs pickup/dropoff -> nem értelmezhető
+    cargo_origin, cargo_dest = pickups[0], dropoffs[-1]
+
+    # --- Előszűrés: minden megálló benne van a jármű útvonalában vagy NearbyCity-ben ---
+    # ("bármely ország" járműveknél a lerakók országát a bitset ellenőrzi lent)
+    pickup_hits = [route_index.lookup(loc.country, loc.city) for loc in pickups]
+    dropoff_hits = [route_index.lookup(loc.country, loc.city) for loc in dropoffs]
+    # folyosó: a jármű útvonal polyline-ja minden megállótól km-en belül, helyes sorrendben
+    corridor = route_index.corridor_vehicles([_coords(loc) for loc in pickups + dropoffs])
+    candidate_ids = (_common_ids(pickup_hits) & (_common_ids(dropoff_hits) | route_index.any_vehicle_ids())) | corridor
+    if within_days is not None:
+        candidate_ids &= route_index.available_near(cargo_origin.start_date, within_days)
+    candidate_ids = sorted(candidate_ids)
+    if not candidate_ids:
+        return None
+
+    columns = route_index.columns
+    rows, vehicle_ids = columns.rows_for(candidate_ids)
+    # kemény szűrő: típus / felépítmény / felszereltség / rögzítés bitmaszkok
+    compatible = features_compatible(columns.features[rows], feature_masks(cargo))
+    rows, vehicle_ids = rows[compatible], np.asarray(vehicle_ids, dtype=np.int64)[compatible].tolist()
+    if not vehicle_ids:
+        return None
+
+    pickup_codes, pickup_masks = stop_arrays(pickup_hits, vehicle_ids, "origin", columns.origin_diff[rows])
+    dropoff_codes, dropoff_masks = stop_arrays(dropoff_hits, vehicle_ids, "destination",
+                                               columns.destination_diff[rows])
+    dropoff_codes, dropoff_masks = any_destination_codes(columns.destination_countries[rows], dropoff_codes,
+                                                         dropoff_masks, [loc.country for loc in dropoffs])
+    if corridor:
+        in_corridor = np.fromiter((vid in corridor for vid in vehicle_ids), dtype=bool, count=len(vehicle_ids))
+        pickup_codes = corridor_codes(pickup_codes, in_corridor)
+        dropoff_codes = corridor_codes(dropoff_codes, in_corridor)
+
+    passed = location_passed(pickup_codes, dropoff_codes, pickup_masks, dropoff_masks)
+    if not passed.any():
+        return None
+
+    # a kitérőhöz: az első felrakó és az utolsó lerakó koordinátája a distance_cache-be
+    pickup_key, dropoff_key = city_key(cargo_origin.country, cargo_origin.city), city_key(cargo_dest.country, cargo_dest.city)
+    distance_cache.set_coords(pickup_key, _coords(cargo_origin))
+    distance_cache.set_coords(dropoff_key, _coords(cargo_dest))
+    return CargoCandidates(
+        rows=rows[passed],
+        vehicle_ids=np.asarray(vehicle_ids)[passed],
+        origin_codes=side_codes(pickup_codes[:, passed]),
+        dest_codes=side_codes(dropoff_codes[:, passed]),
+        pickup_key=pickup_key,
+        dropoff_key=dropoff_key,
+        start_date=cargo_origin.start_date,
+        weight=cargo.weight,
+    )
+
+
+def _shared_scored(cargo: Cargo, within_days=None):
+    """
+    score_cargo a match_service megosztott (mmap) snapshotjából: ugyanazok a szabályok (MatchSnapshot.score_entry).
+    None, ha nincs megosztott snapshot (ilyenkor a folyamaton belüli route_index számol).
+    """
+    snapshot = shared_snapshot()
+    if snapshot is None:
+        return None
+    entry = cargo_entry(cargo)
+    if entry is None:
+        return []
+    snapshot.distances.set_coords(entry.pickup_key, entry.pickup_coords)
+    snapshot.distances.set_coords(entry.dropoff_key, entry.dropoff_coords)
+    result = snapshot.score_entry(entry)
+    if result is None:
+        return []
+    vehicle_ids, location, time, capacity, detour = result
+    if within_days is not None:
+        keep = snapshot.available_near(vehicle_ids, entry.start_date, within_days)
+        vehicle_ids, location, time, capacity, detour = (a[keep] for a in (vehicle_ids, location, time, capacity, detour))
+    return _scored(vehicle_ids.tolist(), location, time, capacity, detour)
+
+
+def score_cargo(cargo: Cargo, limit=None, within_days=None):
+    """
+    Egy cargo jelölt járműveinek pontozása (route_index + vektorizált pontozás), betöltés nélkül.
+    limit: csak a legjobb `limit` jármű (top-k, felső korlát alapú vágással), pontszám szerint rendezve
+    within_days: csak a pickup dátum ± within_days napon belül elérhető járművek (availability_index);
+                 ZERO_TIME_DAYS - 1 mellett pontosan a > 0 időpontot kapók. A tárolt találatok (match_store,
+                 batch_matching) nem szűrnek: 0 időponttal a jármű a helyszín / kapacitás / kitérő pontjaival
+                 még jó találat lehet, és dátum nélküli rakománynál minden jármű kiesne.
+    Visszaadja: [ScoredMatch(vehicle_id, score, breakdown), ...]
+    """
+    shared = _shared_scored(cargo, within_days)
+    if shared is not None:
+        return sorted(shared, key=lambda m: (-m.score, m.item_id))[:limit] if limit else shared
+
+    c = cargo_candidates(cargo, within_days)
+    if c is None:
+        return []
+
+    # --- Kitérő (distance_cache) ---
+    detour = detour_scores(detour_km(c.vehicle_ids.tolist(), c.pickup_key, c.dropoff_key))
+
+    columns = route_index.columns
+    if limit:
+        return _top_scored(columns, c.rows, c.vehicle_ids, c.origin_codes, c.dest_codes, detour, c.start_date,
+                           c.weight, limit)
+
+    # --- PONTOZÁS (vektorizált) ---
+    location, time, capacity = score_candidates(columns, c.rows, c.origin_codes, c.dest_codes, c.start_date, c.weight)
+    return _scored(c.vehicle_ids.tolist(), location, time, capacity, detour)
+
+
+def iter_score_cargo(cargo: Cargo, batch_size=200, within_days=None):
+    """
+    Ugyanaz, mint score_cargo, de jelölt csomagonként adja vissza a ScoredMatch listákat (streameléshez).
+    A jelöltek az olcsó helyszín + kapacitás pont szerint csökkenő sorrendben jönnek,
+    így az első csomagok legjobbjai már közel vannak a végleges top listához.
+    """
+    shared = _shared_scored(cargo, within_days)
+    if shared is not None:
+        # a snapshot egy lépésben pontoz, csak a csomagolás és a sorrend marad
+        shared.sort(key=lambda m: -(m.breakdown["location"] + m.breakdown["capacity"]))
+        for start in range(0, len(shared), batch_size):
+            yield shared[start:start + batch_size]
+        return
+
+    c = cargo_candidates(cargo, within_days)
+    if c is None:
+        return
+
+    columns = route_index.columns
+    cheap = location_scores(c.origin_codes, c.dest_codes) + capacity_scores(columns.capacity_t[c.rows], c.weight)
+    order = np.argsort(-cheap, kind="stable")
+    for start in range(0, len(order), batch_size):
+        part = order[start:start + batch_size]
+        rows, vehicle_ids = c.rows[part], c.vehicle_ids[part]
+        detour = detour_scores(detour_km(vehicle_ids.tolist(), c.pickup_key, c.dropoff_key))
+        location, time, capacity = score_candidates(columns, rows, c.origin_codes[part], c.dest_codes[part],
+                                                    c.start_date, c.weight)
+        yield _scored(vehicle_ids.tolist(), location, time, capacity, detour)
+
+
+def _top_scored(columns, rows, vehicle_ids, origin_codes, dest_codes, detour, start_date, weight, limit):
+    """
+    Top-k: a helyszín, kapacitás és kitérő pont olcsó, ebből + max időpontból felső korlát;
+    az időpontot csak azokra számoljuk, amelyek még bekerülhetnek a legjobb `limit` közé.
+    """
+    location = location_scores(origin_codes, dest_codes)
+    capacity = np.broadcast_to(capacity_scores(columns.capacity_t[rows], weight), location.shape)
+    # az elérhetőségi ablakon kívüli (±4 nap) járművek időpontja biztosan 0 -> szorosabb korlát
+    available = route_index.available_near(start_date)
+    in_window = np.fromiter((vid in available for vid in vehicle_ids.tolist()), dtype=bool, count=len(vehicle_ids))
+
+    def exact(idx):
+        return location[idx] + capacity[idx] + detour[idx] + time_scores(
+            columns.available_from[rows[idx]], columns.available_until[rows[idx]], start_date
+        )
+
+    best, _ = top_k(upper_bounds(location + detour, capacity, in_window), exact, limit)
+    best = np.asarray(best, dtype=np.int64)
+    time = time_scores(columns.available_from[rows[best]], columns.available_until[rows[best]], start_date)
+    return _scored(vehicle_ids[best].tolist(), location[best], np.broadcast_to(time, best.shape), capacity[best],
+                   detour[best])
+
+
+def score_vehicle(vehicle: Vehicle):
+    """
+    Fordított irány: a jármű útvonalát érintő nyitott rakományok (cargo_index) pontozása,
+    ugyanazokkal az előszűrési és pontozási szabályokkal.
+    match_service mellett a szolgáltatás számol (request), a web workerben nem épül route_index.
+    Visszaadja: [ScoredMatch(cargo_id, score, breakdown), ...]
+    """
+    remote = request("score_vehicle", vehicle.vehicle_id)
+    if remote is not None:
+        return remote
+
+    vehicle_hits = route_index.vehicle_hits(vehicle.vehicle_id)
+    if not vehicle_hits:
+        return []
+
+    # jelöltek: az első felrakó / utolsó lerakó települése a jármű útvonalán (cargo_index)
+    pickup_ids, dropoff_ids = set(), set()
+    by_city = {}  # város -> a jármű bejegyzései, ország nélkül rögzített megállókhoz
+    for key, hits in vehicle_hits.items():
+        pickup_ids.update(cargo_index.pickups_at(key))
+        dropoff_ids.update(cargo_index.dropoffs_at(key))
+        by_city.setdefault(key[1], []).extend(hits)
+
+    def hits_for(key):
+        return vehicle_hits.get(key, ()) if key[0] else by_city.get(key[1], ())
+
+    # "bármely ország" jármű: a lerakók országát a jármű bitsetje dönti el, nem az útvonal
+    rows, _ = route_index.columns.rows_for([vehicle.vehicle_id])
+    countries = route_index.columns.destination_countries[rows]
+    is_any = bool(countries.any())
+
+    # folyosó: a jármű útvonala melletti cellákban felrakó rakományok, a megállók sorrendben az útvonalon
+    corridor = {
+        cid for cid in cargo_index.pickups_in_cells(route_index.corridor.vehicle_cells(vehicle.vehicle_id))
+        if route_index.corridor.vehicle_points(vehicle.vehicle_id, cargo_index.get(cid).stop_coords)
+    }
+
+    candidate_ids = pickup_ids if is_any else pickup_ids & dropoff_ids
+    entries = [cargo_index.get(cid) for cid in sorted(candidate_ids | corridor)]
+    entries = [e for e in entries if e is not None]
+    if entries:
+        # kemény szűrő: a rakományok jármű igényei a jármű bitmaszkjaival
+        compatible = features_compatible(feature_masks(vehicle), [e.features for e in entries])
+        entries = [e for e, ok in zip(entries, compatible.tolist()) if ok]
+    if not entries:
+        return []
+    cargo_ids = [e.cargo_id for e in entries]
+
+    pickup_codes, pickup_masks = _padded_stop_arrays([e.pickup_keys for e in entries], hits_for, "origin",
+                                                     vehicle.origin_diff or 0.0)
+    if is_any:
+        dropoff_codes, dropoff_masks = _padded_stop_arrays([e.dropoff_keys for e in entries], countries=countries)
+    else:
+        dropoff_codes, dropoff_masks = _padded_stop_arrays([e.dropoff_keys for e in entries], hits_for,
+                                                           "destination", vehicle.destination_diff or 0.0)
+    if corridor:
+        in_corridor = np.fromiter((cid in corridor for cid in cargo_ids), dtype=bool, count=len(cargo_ids))
+        pickup_codes = corridor_codes(pickup_codes, in_corridor)
+        dropoff_codes = corridor_codes(dropoff_codes, in_corridor)
+
+    passed = location_passed(pickup_codes, dropoff_codes, pickup_masks, dropoff_masks)
+    if not passed.any():
+        return []
+    origin_codes, dest_codes = side_codes(pickup_codes), side_codes(dropoff_codes)
+
+    # --- PONTOZÁS (vektorizált, a jármű adatai skalárként) ---
+    start_dates = np.fromiter((e.start_date for e in entries), dtype=np.int64, count=len(entries))
+    weights = np.fromiter((e.weight for e in entries), dtype=np.float64, count=len(entries))
+    location, time, capacity = score_components(
+        date_ordinal(vehicle.available_from), date_ordinal(vehicle.available_until), vehicle.capacity_t or 0.0,
+        origin_codes[passed], dest_codes[passed], start_dates[passed], weights[passed]
+    )
+
+    # --- Kitérő (distance_cache), a jármű végpontjaival ---
+    origin_key, destination_key = route_index.endpoints(vehicle.vehicle_id)
+    kept = [e for e, ok in zip(entries, passed.tolist()) if ok]
+    detour = np.full(len(kept), np.nan)
+    if origin_key:
+        for i, e in enumerate(kept):
+            km = distance_cache.detour(origin_key, e.pickup_key, e.dropoff_key, destination_key)
+            if km is not None:
+                detour[i] = km
+    return _scored([e.cargo_id for e in kept], location, time, capacity, detour_scores(detour))
+
+
+def vehicle_match_dict(vehicle, score, breakdown=None):
+    return {
+        "vehicle_id": vehicle.vehicle_id,
+        "origin_country": vehicle.origin_country,
+        "origin_postcode": vehicle.origin_postcode,
+        "origin_city": vehicle.origin_city,
+        "available_from": vehicle.available_from,
+        "destination_country": vehicle.destination_country,
+        "destination_postcode": vehicle.destination_postcode,
+        "destination_city": vehicle.destination_city,
+        "available_until": vehicle.available_until,
+        "vehicle_type": vehicle.vehicle_type,
+        "structure": vehicle.structure,
+        "equipment": vehicle.equipment,
+        "cargo_securement": vehicle.cargo_securement,
+        "description": vehicle.description,
+        "capacity_t": vehicle.capacity_t,
+        "volume_m3": vehicle.volume_m3,
+        "price": vehicle.price,
+        "currency": vehicle.currency,
+        "company": vehicle.company.name if vehicle.company else None,
+        "score": score,
+        "breakdown": breakdown
+    }
+
+
+def _display_location(loc):
+    """Rejtett helyszínnél csak a bújtatott város/irányítószám adható ki"""
+    if not loc:
+        return None, None, None
+    if loc.is_hidden:
+        return loc.country, loc.masked_postcode, loc.masked_city
+    return loc.country, loc.postcode, loc.city
+
+
+def cargo_match_dict(cargo, score, breakdown=None):
+    pickup = next((loc for loc in cargo.locations if loc.type == "pickup"), None)
+    dropoff = next((loc for loc in cargo.locations if loc.type == "dropoff"), None)
+    pickup_country, pickup_postcode, pickup_city = _display_location(pickup)
+    dropoff_country, dropoff_postcode, dropoff_city = _display_location(dropoff)
+
+    return {
+        "cargo_id": cargo.cargo_id,
+        "pickup_country": pickup_country,
+        "pickup_postcode": pickup_postcode,
+        "pickup_city": pickup_city,
+        "pickup_date": pickup.start_date if pickup else None,
+        "dropoff_country": dropoff_country,
+        "dropoff_postcode": dropoff_postcode,
+        "dropoff_city": dropoff_city,
+        "dropoff_date": dropoff.end_date if dropoff else None,
+        "weight": cargo.weight,
+        "size": cargo.size,
+        "vehicle_type": cargo.vehicle_type,
+        "structure": cargo.structure,
+        "equipment": cargo.equipment,
+        "cargo_securement": cargo.cargo_securement,
+        "description": cargo.description,
+        "price": cargo.price,
+        "currency": cargo.currency,
+        "company": cargo.company.name if cargo.company else None,
+        "score": score,
+        "breakdown": breakdown
+    }
+
+
+def hydrate_vehicle_matches(scored):
+    """ScoredMatch lista -> válasz dict-ek, egy lekérdezéssel (company eager load), pontszám szerint rendezve"""
+    if not scored:
+        return []
+    by_id = {m.item_id: m for m in scored}
+    vehicles = (
+        Vehicle.query
+        .options(joinedload(Vehicle.company))
+        .filter(Vehicle.vehicle_id.in_(by_id.keys()))
+        .order_by(Vehicle.vehicle_id)
+        .all()
+    )
+    matches = [vehicle_match_dict(v, by_id[v.vehicle_id].score, by_id[v.vehicle_id].breakdown) for v in vehicles]
 
     # --- Rendezés pontszám szerint ---
     matches.sort(key=lambda m: m["score"], reverse=True)
     return matches
+
+
+def hydrate_cargo_matches(scored):
+    if not scored:
+        return []
+    by_id = {m.item_id: m for m in scored}
+    cargos = (
+        Cargo.query
+        .options(selectinload(Cargo.locations), joinedload(Cargo.company))
+        .filter(Cargo.cargo_id.in_(by_id.keys()))
+        .order_by(Cargo.cargo_id)
+        .all()
+    )
+    matches = [cargo_match_dict(c, by_id[c.cargo_id].score, by_id[c.cargo_id].breakdown) for c in cargos]
+
+    # --- Rendezés pontszám szerint ---
+    matches.sort(key=lambda m: m["score"], reverse=True)
+    return matches
+
+
+def find_matches_for_cargo(cargo: Cargo, limit=None, within_days=None):
+    """
+    Előszűrés helyszín alapján (route_index):
+    - minden pickup és dropoff városnak szerepelnie kell a jármű útvonalában vagy NearbyCity-ben
+    - sorrend: a megállók útvonal pozíciói monotonok (pickupok, majd dropoffok)
+    Utána idő és kapacitás pontozás, az összes jelöltre egyszerre (scoring.py).
+    limit: csak a legjobb `limit` járművet töltjük be (top-k heap, felső korlát vágással).
+    within_days: csak a pickup dátum körül elérhető járművek (availability_index).
+    Csak a továbbjutó járműveket töltjük be egy lekérdezéssel.
+    """
+    return hydrate_vehicle_matches(score_cargo(cargo, limit=limit, within_days=within_days))
+
+
+def find_matches_for_vehicle(vehicle: Vehicle):
+    """
+    Fordított matching: a jármű útvonalát érintő nyitott rakományok (cargo_index),
+    ugyanazokkal az előszűrési és pontozási szabályokkal, mint find_matches_for_cargo.
+    """
+    return hydrate_cargo_matches(score_vehicle(vehicle))
@@ -5,3 +5,7 @@ from .user import *
 from .company import *
 from .city import *
 from .expiration import ExpiredNotification
+from .match import CargoVehicleMatch
+from .subscription import LaneSubscription
+from .neighbours import CityNeighbours
+from .geocode import GeocodeCache
@@ -1,6 +1,8 @@
 from datetime import datetime, date, timedelta
+from sqlalchemy import event
 from utils import *
 from extensions import *
+from scoring import set_feature_masks
 
 class Cargo(db.Model):
     cargo_id = db.Column(db.Integer, primary_key=True)
@@ -26,6 +28,12 @@ class Cargo(db.Model):
     cargo_securement = db.Column(db.String(150))
     note = db.Column(db.String(500))
 
+    # a fenti szöveges mezők bitmaszkjai (scoring.FEATURE_OPTIONS), mentéskor töltődnek
+    vehicle_type_mask = db.Column(db.Integer, default=0)
+    structure_mask = db.Column(db.Integer, default=0)
+    equipment_mask = db.Column(db.Integer, default=0)
+    cargo_securement_mask = db.Column(db.Integer, default=0)
+
     # Kapcsolatok
     locations = db.relationship("CargoLocation", back_populates="cargo", cascade="all, delete-orphan")
     offers = db.relationship("Offer", back_populates="cargo", lazy=True, cascade="all, delete-orphan")
@@ -43,6 +51,12 @@ class Cargo(db.Model):
     )
 
 
+@event.listens_for(Cargo, "before_insert")
+@event.listens_for(Cargo, "before_update")
+def _cargo_feature_masks(mapper, connection, target):
+    set_feature_masks(target)
+
+
 class CargoLocation(db.Model):
     __tablename__ = "cargo_location"
 
@@ -1,3 +1,4 @@
+from datetime import datetime
 from extensions import *
 from sqlalchemy.dialects.postgresql import TSVECTOR
 import os
@@ -16,20 +17,10 @@ class City(db.Model):
     longitude = db.Column(db.Float)
     zipcode = db.Column(db.String(20))  # string legyen
     country_code = db.Column(db.String(2), db.ForeignKey('countries.code'))
+    population = db.Column(db.BigInteger, nullable=True)  # geonames népesség (city_index, nagyváros keresés)
     if os.environ.get('DB_TYPE') == 'postgres':
         search_vector = db.Column(TSVECTOR)
 
-    if os.environ.get("DB_TYPE") == "postgres":
-        score_expr = func.greatest(
-            func.similarity(City.city_name, term),
-            func.similarity(City.ascii_name, term),
-            func.similarity(City.admin1, term),
-            func.similarity(City.admin2, term),
-            func.similarity(City.admin3, term)
-        )
-    else:
-        score_expr = func.length(func.replace(City.city_name, term, term))  # nagyon egyszerű mérőszám SQLite-on
-
 
 class CityZipcode(db.Model):
     __tablename__ = "city_zipcodes"
@@ -66,3 +57,22 @@ class Country(db.Model):
     iso_code = db.Column(db.String(3), nullable=False)
 
     cities = db.relationship('City', backref='country', lazy=True, primaryjoin="Country.code==foreign(City.country_code)")
+
+
+class CityDistance(db.Model):
+    # Település párok távolsága (km) a matching kitérő számításához.
+    # A pár rendezve van tárolva (from < to), így egy sor mindkét irányt lefedi.
+    __tablename__ = "city_distance"
+
+    id = db.Column(db.Integer, primary_key=True)
+    from_country = db.Column(db.String(3), nullable=False)
+    from_city = db.Column(db.String(100), nullable=False)
+    to_country = db.Column(db.String(3), nullable=False)
+    to_city = db.Column(db.String(100), nullable=False)
+    km = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(10), nullable=False, default="haversine")  # "haversine" (becslés) vagy "road"
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        db.UniqueConstraint("from_country", "from_city", "to_country", "to_city", name="uq_city_distance_pair"),
+    )
@@ -0,0 +1,28 @@
+# -------------------------------------------------------
+# MODELL: Külső geokódoló válaszok cache-e (geocache.py)
+# -------------------------------------------------------
+from datetime import datetime
+from extensions import db
+
+
+class GeocodeCache(db.Model):
+    __tablename__ = "geocode_cache"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # --- szolgáltató + normalizált lekérdezés kulcs ---
+    provider = db.Column(db.String(40), nullable=False)     # pl. "geonames_search", "nominatim"
+    query_key = db.Column(db.String(255), nullable=False)
+
+    # --- JSON válasz; NULL = negatív találat (a szolgáltató nem talált semmit) ---
+    payload = db.Column(db.Text, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    # --- lekérdezésenként egy sor ---
+    __table_args__ = (
+        db.UniqueConstraint("provider", "query_key", name="uq_geocode_cache_query"),
+    )
+
+    def __repr__(self):
+        return f"<GeocodeCache {self.provider} {self.query_key!r} neg={self.payload is None}>"
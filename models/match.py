@@ -0,0 +1,27 @@
+# -------------------------------------------------------
+# MODELL: Tárolt rakomány <-> jármű találatok
+# -------------------------------------------------------
+from datetime import datetime
+from extensions import db
+
+
+class CargoVehicleMatch(db.Model):
+    __tablename__ = "cargo_vehicle_match"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cargo_id = db.Column(db.Integer, db.ForeignKey("cargo.cargo_id", ondelete="CASCADE"), nullable=False)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey("vehicle.vehicle_id", ondelete="CASCADE"), nullable=False)
+
+    score = db.Column(db.Integer, nullable=False)
+    breakdown = db.Column(db.JSON, nullable=True)  # {"location": .., "time": .., "capacity": ..}
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # --- egy pár csak egyszer, listázás pontszám szerint indexből ---
+    __table_args__ = (
+        db.UniqueConstraint("cargo_id", "vehicle_id", name="uq_cargo_vehicle_match"),
+        db.Index("ix_match_cargo_score", "cargo_id", "score"),
+        db.Index("ix_match_vehicle_score", "vehicle_id", "score"),
+    )
+
+    def __repr__(self):
+        return f"<CargoVehicleMatch cargo={self.cargo_id}, vehicle={self.vehicle_id}, score={self.score}>"
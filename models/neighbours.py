@@ -0,0 +1,30 @@
+# -------------------------------------------------------
+# MODELL: Referencia települések szomszédai (radius_cache.py)
+# -------------------------------------------------------
+from datetime import datetime
+from extensions import db
+
+
+class CityNeighbours(db.Model):
+    __tablename__ = "city_neighbours"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # --- referencia település (jármű indulási / cél települése) ---
+    country_code = db.Column(db.String(2), nullable=False)
+    postcode = db.Column(db.String(20), nullable=False)
+    city_name = db.Column(db.String(100), nullable=False)
+
+    # --- szomszédok radius_km-ig, távolság szerint rendezve, tömör bináris tömbként ---
+    radius_km = db.Column(db.Float, nullable=False)
+    city_ids = db.Column(db.LargeBinary, nullable=False)    # int32 City.id-k
+    distances = db.Column(db.LargeBinary, nullable=False)   # float32 km, növekvő
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # --- referenciánként egy sor ---
+    __table_args__ = (
+        db.UniqueConstraint("country_code", "postcode", "city_name", name="uq_city_neighbours_reference"),
+    )
+
+    def __repr__(self):
+        return f"<CityNeighbours {self.country_code} {self.postcode} {self.city_name} r={self.radius_km}>"
@@ -0,0 +1,59 @@
+# -------------------------------------------------------
+# MODELL: Fuvarozói útvonal (lane) feliratkozás új rakományokra
+# -------------------------------------------------------
+from datetime import datetime
+from extensions import db
+
+
+class LaneSubscription(db.Model):
+    __tablename__ = "lane_subscription"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    company_id = db.Column(db.Integer, db.ForeignKey("company.company_id", ondelete="CASCADE"), nullable=True)
+
+    # --- felrakó terület: ország, opcionálisan település + sugár (km) ---
+    origin_country = db.Column(db.String(2), nullable=False)
+    origin_city = db.Column(db.String(100), nullable=True)    # None -> az egész ország
+    origin_radius_km = db.Column(db.Integer, default=0)
+    origin_lat = db.Column(db.Float, nullable=True)
+    origin_lon = db.Column(db.Float, nullable=True)
+
+    # --- lerakó terület ---
+    destination_country = db.Column(db.String(2), nullable=False)
+    destination_city = db.Column(db.String(100), nullable=True)
+    destination_radius_km = db.Column(db.Integer, default=0)
+    destination_lat = db.Column(db.Float, nullable=True)
+    destination_lon = db.Column(db.Float, nullable=True)
+
+    # --- felrakási dátum ablak és járműtípus (None -> bármely) ---
+    date_from = db.Column(db.Date, nullable=True)
+    date_until = db.Column(db.Date, nullable=True)
+    vehicle_type = db.Column(db.String(30), nullable=True)
+
+    active = db.Column(db.Boolean, default=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    user = db.relationship(
+        "User",
+        backref=db.backref("lane_subscriptions", cascade="all, delete-orphan")
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "origin_country": self.origin_country,
+            "origin_city": self.origin_city,
+            "origin_radius_km": self.origin_radius_km,
+            "destination_country": self.destination_country,
+            "destination_city": self.destination_city,
+            "destination_radius_km": self.destination_radius_km,
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_until": self.date_until.isoformat() if self.date_until else None,
+            "vehicle_type": self.vehicle_type,
+            "active": self.active,
+        }
+
+    def __repr__(self):
+        return (f"<LaneSubscription {self.id}: {self.origin_country}/{self.origin_city} -> "
+                f"{self.destination_country}/{self.destination_city}>")
@@ -1,7 +1,10 @@
 from datetime import datetime
 from email.policy import default
 
+from sqlalchemy import event
+
 from extensions import db
+from scoring import set_feature_masks
 
 class Vehicle(db.Model):
     vehicle_id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +17,10 @@ class Vehicle(db.Model):
     structure = db.Column(db.String(30), nullable=True)     # pl. "ponyva", "dobozos", "hűtős"
     equipment = db.Column(db.String(255), nullable=True)    # pl. "rakodó rámpa, emelőhátfal"
     cargo_securement = db.Column(db.String(150), nullable=True) # pl. "rakonca", "spanifer"
+    vehicle_type_mask = db.Column(db.Integer, default=0)        # a fenti mezők bitmaszkjai
+    structure_mask = db.Column(db.Integer, default=0)           # (scoring.FEATURE_OPTIONS), mentéskor töltődnek
+    equipment_mask = db.Column(db.Integer, default=0)
+    cargo_securement_mask = db.Column(db.Integer, default=0)
     description = db.Column(db.Text, default="Nincs leírás")
 
     capacity_t = db.Column(db.Float, nullable=True)         # hány tonnát képes elvinni
@@ -33,6 +40,7 @@ class Vehicle(db.Model):
     destination_city = db.Column(db.String(100))
     destination_diff = db.Column(db.Integer, nullable=True)  # pl. +25 km
     load_type = db.Column(db.String(3), nullable=True, default="FTL")  # pl. FTL / LTL
+    route_polyline = db.Column(db.Text, nullable=True)  # OSRM útvonal, encoded polyline (polyline.py)
 
     company = db.relationship('Company', back_populates='vehicles')
     routes = db.relationship('VehicleRoute', back_populates='vehicle', cascade="all, delete-orphan", lazy=True)
@@ -40,6 +48,12 @@ class Vehicle(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now())
 
 
+@event.listens_for(Vehicle, "before_insert")
+@event.listens_for(Vehicle, "before_update")
+def _vehicle_feature_masks(mapper, connection, target):
+    set_feature_masks(target)
+
+
 class VehicleRoute(db.Model):
     # Egy-egy településről tárolja el sorrendben, hogy melyik útvonalon van rajta és melyik jármű teszi meg az utat.
     id = db.Column(db.Integer, primary_key=True)                        # saját azonosító
@@ -54,6 +68,7 @@ class VehicleRoute(db.Model):
 
 class NearbyCity(db.Model):
     # Egy adott jármű eredeti vagy cél településéhez közeli városokat tárolja el, hogy a keresés gyorsabb legyen.
+    # Régi tábla: a matching már a közös sugár cache-t használja (radius_cache.py, CityNeighbours), ide nem íródik.
     id = db.Column(db.Integer, primary_key=True)
     country_code = db.Column(db.String(2), nullable=False)              # város országkódja
     zipcode = db.Column(db.String(20), nullable=False)                  # város irányítószáma
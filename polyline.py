@@ -0,0 +1,87 @@
+# polyline.py
+"""
+Útvonal koordináták tömör tárolása (Google encoded polyline, 1e-5 fok pontosság).
+Egy OSRM útvonal [[lat, lon], ...] listája így pontonként néhány bájt szöveg.
+
+Tárolás / folyosó számítás előtt az útvonal ritkítható (simplify_polyline, Ramer–Douglas–Peucker):
+az eredeti útvonal minden pontja legfeljebb tolerance_m méterre van a ritkított útvonaltól.
+"""
+import numpy as np
+
+from geo import KM_PER_DEG_LAT, KM_PER_DEG_LON
+
+PRECISION = 1e5
+ROUTE_TOLERANCE_M = 50   # alapértelmezett ritkítási tűrés (méter)
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_polyline(coords):
+    """[[lat, lon], ...] -> encoded polyline string"""
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coords:
+        lat, lon = int(round(lat * PRECISION)), int(round(lon * PRECISION))
+        _encode_value(lat - prev_lat, out)
+        _encode_value(lon - prev_lon, out)
+        prev_lat, prev_lon = lat, lon
+    return "".join(out)
+
+
+def decode_polyline(encoded):
+    """encoded polyline string -> (lats, lons) NumPy tömbök"""
+    values, value, shift = [], 0, 0
+    for ch in encoded or "":
+        b = ord(ch) - 63
+        value |= (b & 0x1f) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+
+    deltas = np.array(values[:len(values) - len(values) % 2], dtype=np.int64).reshape(-1, 2)
+    points = np.cumsum(deltas, axis=0) / PRECISION
+    return points[:, 0], points[:, 1]
+
+
+def simplify_polyline(coords, tolerance_m=ROUTE_TOLERANCE_M):
+    """
+    Ramer–Douglas–Peucker ritkítás: [[lat, lon], ...] -> [[lat, lon], ...], az első és utolsó pont mindig marad.
+    A kihagyott pontok távolsága a megtartott szakasztól (pont - szakasz, pontonkénti lokális
+    equirectangular vetület, mint a corridor_index-ben) legfeljebb tolerance_m méter.
+    """
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if len(points) <= 2:
+        return points.tolist()
+    lats, lons = points[:, 0], points[:, 1]
+    tolerance_km = tolerance_m / 1000.0
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(points) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        inner = slice(a + 1, b)
+        kx = KM_PER_DEG_LON * np.cos(np.radians(lats[inner]))
+        x0, y0 = (lons[a] - lons[inner]) * kx, (lats[a] - lats[inner]) * KM_PER_DEG_LAT
+        dx, dy = (lons[b] - lons[a]) * kx, (lats[b] - lats[a]) * KM_PER_DEG_LAT
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(length2 > 0, -(x0 * dx + y0 * dy) / length2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(x0 + t * dx, y0 + t * dy)
+        worst = int(dist.argmax())
+        if dist[worst] > tolerance_km:
+            mid = a + 1 + worst
+            keep[mid] = True
+            stack.append((a, mid))
+            stack.append((mid, b))
+    return points[keep].tolist()
@@ -0,0 +1,283 @@
+# radius_cache.py
+"""
+Közös sugár cache referencia településenként (a járművenkénti NearbyCity sorok helyett).
+
+Egy referencia település (ország, irányítószám, név) szomszédai egyszer tárolódnak, távolság
+szerint rendezve, radius_km-ig (legalább DEFAULT_RADIUS_KM). Bármely diff <= radius_km
+lekérdezés egy bináris keresés (searchsorted) a rendezett távolságokon; nagyobb diff-nél
+a bejegyzés újraszámolódik a nagyobb sugárral.
+
+Szintek:
+1. memória: LRU (OrderedDict), legfeljebb MAX_ENTRIES referencia
+2. DB: CityNeighbours tábla, referenciánként egy sor (int32 id-k + float32 km tömören)
+3. számítás: city_index.radius_query (azonos ország), utána mentés a DB-be
+
+A DB írás/olvasás külön kapcsolaton fut (db.engine), nem a hívó db.session-jén, mint a
+geocache-nél: a cache mentése nem commit-olhatja / görgetheti vissza a hívó félkész
+objektumait (pl. jármű mentés közben). Mentés INSERT ... ON CONFLICT-tal (PostgreSQL,
+SQLite) az egyedi referencia kulcson, és egy meglévő sort csak nagyobb sugár ír felül; más
+adatbázison soronkénti INSERT, ahol az IntegrityError azt jelenti, hogy a sor már megvan.
+
+Településnevenként egy szomszéd marad (a legközelebbi), mint a NearbyCity egyedi kulcsánál.
+
+API:
+    radius_cache.neighbours(country, postcode, city, km)  -> ([(country, city) kulcs], km tömb), távolság szerint
+    radius_cache.warm({ref: km})                          -> {ref: RadiusEntry}, több referencia egyszerre
+    within(entry, km)                                     -> egy bejegyzés km-en belüli része
+    vehicle_refs(vehicle)                                 -> {ref: diff} egy jármű referenciáira
+    rebuild_all(reset=False)                              -> a teljes flotta referenciái
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple, defaultdict
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import or_, select, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Vehicle, CityNeighbours
+from city_index import city_index
+
+DEFAULT_RADIUS_KM = 100.0   # legalább eddig számolunk, így a tipikus diff-ek egy bejegyzésből jönnek
+MAX_ENTRIES = 4096          # memória LRU (referencia)
+UPSERT_BATCH = 500          # ennyi referencia egy INSERT-ben
+REF_TYPES = ("origin", "destination")
+
+# city_ids / distances: azonos hosszú tömbök, távolság szerint növekvő; keys: (ORSZÁG, név) index kulcsok
+RadiusEntry = namedtuple("RadiusEntry", ["radius_km", "city_ids", "distances", "keys"])
+
+
+def ref_key(country, postcode, city):
+    """Referencia kulcs, ugyanaz az egyezés, mint City.query.filter_by(country_code, zipcode, city_name)"""
+    return (country or "").upper(), postcode, city
+
+
+def vehicle_refs(vehicle):
+    """{ref kulcs: legnagyobb diff} a jármű pozitív diff-es referenciáira (Vehicle vagy query sor)"""
+    refs = {}
+    for ref_type in REF_TYPES:
+        diff = getattr(vehicle, f"{ref_type}_diff")
+        ref = (getattr(vehicle, f"{ref_type}_country"), getattr(vehicle, f"{ref_type}_postcode"),
+               getattr(vehicle, f"{ref_type}_city"))
+        if diff and diff > 0 and all(ref):
+            key = ref_key(*ref)
+            refs[key] = max(refs.get(key, 0), diff)
+    return refs
+
+
+def _entry(radius_km, city_ids, distances):
+    """Bejegyzés rendezett tömbökből; azonos nevű településekből a legközelebbi marad"""
+    keys, keep, seen = [], [], set()
+    for i, c in enumerate(city_index.cities(city_ids)):
+        key = (c.country_code, (c.city_name or "").strip())   # route_index.city_key alak
+        if key not in seen:
+            seen.add(key)
+            keys.append(key)
+            keep.append(i)
+    keep = np.array(keep, dtype=np.int64)
+    return RadiusEntry(float(radius_km), np.asarray(city_ids, dtype=np.int32)[keep],
+                       np.asarray(distances, dtype=np.float32)[keep], keys)
+
+
+_EMPTY = RadiusEntry(np.inf, np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), [])
+
+
+def within(entry, km):
+    """A bejegyzés km-en belüli része bináris kereséssel: ([(ország, név)], km tömb)"""
+    entry = entry or _EMPTY
+    n = int(np.searchsorted(entry.distances, km, side="right"))
+    return entry.keys[:n], entry.distances[:n]
+
+
+class RadiusCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()   # ref -> RadiusEntry, LRU sorrendben
+        self.max_entries = max_entries
+        self.stats = {"memory": 0, "db": 0, "computed": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ------------------------------------------------------------------
+    # Memória szint
+    # ------------------------------------------------------------------
+    def _get(self, key, km):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.radius_km < km:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["memory"] += 1
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # DB szint + számolás
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _rows(keys):
+        """CityNeighbours sorok a kulcsokra, egy lekérdezéssel (ország + irsz. szűrés, pontos egyezés Pythonban)"""
+        table = CityNeighbours.__table__
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.country_code, table.c.postcode, table.c.city_name, table.c.radius_km,
+                       table.c.city_ids, table.c.distances)
+                .where(table.c.country_code.in_({k[0] for k in keys}), table.c.postcode.in_({k[1] for k in keys}))
+            ).all()
+        found = {}
+        for row in rows:
+            key = (row.country_code, row.postcode, row.city_name)
+            if key in keys:
+                found[key] = row
+        return found
+
+    @staticmethod
+    def _store(entries):
+        """
+        {ref kulcs: RadiusEntry} mentése külön tranzakcióban (db.engine), a hívó session-je nélkül.
+        Egy meglévő sort csak nagyobb sugarú bejegyzés ír felül. Hiba esetén csak a memóriában marad.
+        """
+        table = CityNeighbours.__table__
+        now = datetime.now()
+        rows = [{"country_code": key[0], "postcode": key[1], "city_name": key[2], "radius_km": entry.radius_km,
+                 "city_ids": entry.city_ids.tobytes(), "distances": entry.distances.tobytes(), "updated_at": now}
+                for key, entry in entries.items()]
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            insert = None
+        try:
+            if insert is None:
+                for row in rows:
+                    _insert_or_grow(row)
+                return
+            with db.engine.begin() as conn:
+                for start in range(0, len(rows), UPSERT_BATCH):
+                    stmt = insert(table).values(rows[start:start + UPSERT_BATCH])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[table.c.country_code, table.c.postcode, table.c.city_name],
+                        set_={name: stmt.excluded[name] for name in ("radius_km", "city_ids", "distances",
+                                                                     "updated_at")},
+                        where=table.c.radius_km < stmt.excluded.radius_km,
+                    )
+                    conn.execute(stmt)
+        except Exception as e:
+            print("[ERROR] RadiusCache mentési hiba:", e)
+
+    @staticmethod
+    def _compute(key, km):
+        ref = city_index.find(*key)
+        if ref is None:
+            print(f"[LOG] RadiusCache: nincs koordináta a City táblában {key[2]} ({key[1]})")
+            return None
+        radius = max(float(km), DEFAULT_RADIUS_KM)
+        city_ids, distances = city_index.radius_query(ref.latitude, ref.longitude, radius, country=key[0])
+        return _entry(radius, city_ids, distances)
+
+    def warm(self, refs):
+        """
+        refs: {ref kulcs: km}. A memóriában nem (vagy kisebb sugárral) meglévő referenciák
+        egy DB lekérdezéssel töltődnek; ami ott sincs, kiszámolódik és külön tranzakcióban
+        mentődik (_store; a hívó db.session-jét nem érinti, mentési hiba esetén csak a memóriában marad).
+        Visszaadja: {ref kulcs: RadiusEntry} az összes kért referenciára (akkor is, ha az LRU már kiejtette).
+        """
+        result, missing = {}, {}
+        for key, km in refs.items():
+            entry = self._get(key, km)
+            if entry is None:
+                missing[key] = km
+            else:
+                result[key] = entry
+        if not missing:
+            return result
+        rows = self._rows(set(missing))
+        computed = {}
+        for key, km in missing.items():
+            row = rows.get(key)
+            if row is not None and row.radius_km >= km:
+                self.stats["db"] += 1
+                result[key] = _entry(row.radius_km, np.frombuffer(row.city_ids, dtype=np.int32),
+                                     np.frombuffer(row.distances, dtype=np.float32))
+                self._put(key, result[key])
+                continue
+            entry = result[key] = self._compute(key, km) or _EMPTY
+            self._put(key, entry)
+            if entry is _EMPTY:   # ismeretlen referencia: csak memóriában
+                continue
+            self.stats["computed"] += 1
+            computed[key] = entry
+        if computed:
+            self._store(computed)
+        return result
+
+    def neighbours(self, country, postcode, city, km):
+        """A referenciától km-en belüli települések: ([(ország, név)], km tömb), távolság szerint növekvő"""
+        key = ref_key(country, postcode, city)
+        return within(self._get(key, km) or self.warm({key: km})[key], km)
+
+
+def _insert_or_grow(row):
+    """Egy sor mentése ON CONFLICT nélkül: IntegrityError = a sor már megvan, akkor csak nagyobb sugár írja felül"""
+    table = CityNeighbours.__table__
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(table.insert().values(**row))
+    except IntegrityError:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.country_code == row["country_code"], table.c.postcode == row["postcode"],
+                       table.c.city_name == row["city_name"], table.c.radius_km < row["radius_km"])
+                .values(radius_km=row["radius_km"], city_ids=row["city_ids"], distances=row["distances"],
+                        updated_at=row["updated_at"])
+            )
+
+
+# process-szintű példány
+radius_cache = RadiusCache()
+
+
+def add_for_vehicle(vehicle):
+    """Mentéskor: a jármű referenciáinak szomszédai a cache-be (és a DB-be, ha még nincsenek meg)"""
+    radius_cache.warm(vehicle_refs(vehicle))
+
+
+def rebuild_all(reset=False):
+    """
+    A teljes flotta referenciái: referenciánként egyszer, a legnagyobb diff-fel számolva.
+    reset: előtte az összes CityNeighbours sor törlése (pl. City tábla frissítés után)
+    """
+    started = time.perf_counter()
+    columns = [getattr(Vehicle, f"{ref_type}_{name}") for ref_type in REF_TYPES
+               for name in ("country", "postcode", "city", "diff")]   # vehicle_refs ugyanezeket olvassa
+    vehicles = db.session.query(*columns).filter(or_(Vehicle.origin_diff > 0, Vehicle.destination_diff > 0)).all()
+
+    refs = defaultdict(int)
+    for v in vehicles:
+        for key, diff in vehicle_refs(v).items():
+            refs[key] = max(refs[key], diff)
+
+    if reset:
+        with db.engine.begin() as conn:
+            conn.execute(delete(CityNeighbours.__table__))
+        radius_cache.clear()
+    radius_cache.warm(refs)
+    print(f"[LOG] RadiusCache feltöltve: {len(vehicles)} jármű, {len(refs)} referencia "
+          f"({time.perf_counter() - started:.1f} s)")
+    return len(refs)
@@ -0,0 +1,326 @@
+# route_index.py
+"""
+Folyamaton belüli invertált útvonal-index a matchinghez.
+
+Kulcs: (országkód, település) -> {vehicle_id: [RouteHit, ...]}
+
+A RouteHit megmondja, hogy a település a jármű teljes útvonalán
+(origin + VehicleRoute stopok + destination) hányadik pozíción szerepel,
+illetve hogy pontos egyezés ("exact") vagy a jármű origin / destination települése
+körüli, diff-en belüli szomszéd ("nearby", radius_cache.py).
+Így egy cargo pickup/dropoff városához SQL nélkül megkapjuk azokat a járműveket,
+amelyek útvonala egyáltalán érinti a várost.
+"""
+import threading
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from extensions import db
+from models.vehicle import Vehicle, VehicleRoute, VehicleDestination
+from scoring import VehicleColumns, position_bit, feature_masks
+from availability_index import AvailabilityIndex
+from corridor_index import CorridorIndex, CORRIDOR_KM
+from distance_cache import distance_cache
+from radius_cache import radius_cache, vehicle_refs, ref_key, within
+
+# compact_postings kind kódjai: pontos egyezés, szomszéd az origin / destination referenciához
+HIT_EXACT, HIT_NEARBY_ORIGIN, HIT_NEARBY_DESTINATION = 0, 1, 2
+
+# position: hányadik elem a teljes útvonalon (0 = origin, utolsó = destination)
+# kind: "exact" vagy "nearby"; ref_type/radius_km csak nearby esetén (radius_km: a település távolsága a referenciától)
+RouteHit = namedtuple("RouteHit", ["position", "kind", "ref_type", "radius_km"])
+
+_VEHICLE_COLUMNS = (
+    Vehicle.vehicle_id,
+    Vehicle.origin_country, Vehicle.origin_postcode, Vehicle.origin_city, Vehicle.origin_diff,
+    Vehicle.destination_country, Vehicle.destination_postcode, Vehicle.destination_city, Vehicle.destination_diff,
+    Vehicle.available_from, Vehicle.available_until, Vehicle.capacity_t, Vehicle.route_polyline,
+    Vehicle.vehicle_type_mask, Vehicle.structure_mask, Vehicle.equipment_mask, Vehicle.cargo_securement_mask,
+)
+
+
+def city_key(country, city):
+    """Normalizált index kulcs: (NAGYBETŰS országkód, levágott városnév)"""
+    return (country or "").strip().upper(), (city or "").strip()
+
+
+class RouteIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)    # (country, city) -> {vehicle_id: [RouteHit]}
+        self._countries = defaultdict(set)    # city -> {country}, ország nélküli kereséshez
+        self._vehicle_keys = {}               # vehicle_id -> {(country, city)}
+        self.columns = VehicleColumns()       # pontozáshoz szükséges járműadatok (scoring.py)
+        self.availability = AvailabilityIndex()  # elérhetőségi ablakok (availability_index.py)
+        self.any_vehicles = set()             # "bármely ország" járművek (VehicleDestination sorokkal)
+        self.corridor = CorridorIndex()       # útvonal polyline-ok rács indexe (corridor_index.py)
+        self._endpoints = {}                  # vehicle_id -> (origin kulcs, destination kulcs / None), kitérőhöz
+        self._built = False
+
+    # ------------------------------------------------------------------
+    # Betöltés
+    # ------------------------------------------------------------------
+    def build(self):
+        """Teljes index felépítése három lekérdezéssel (Vehicle, VehicleRoute, VehicleDestination) + radius_cache."""
+        rows = db.session.query(*_VEHICLE_COLUMNS).all()
+        stops = self._load_stops(None)
+        destinations = self._load_destinations(None)
+        nearby = self._warm_refs(rows)
+
+        with self._lock:
+            self._postings.clear()
+            self._countries.clear()
+            self._vehicle_keys.clear()
+            self.columns.clear()
+            self.availability.clear()
+            self.any_vehicles.clear()
+            self.corridor.clear()
+            self._endpoints.clear()
+            for row in rows:
+                self._add_vehicle(row, stops.get(row.vehicle_id, []), nearby, destinations.get(row.vehicle_id))
+            self._built = True
+        self._load_endpoint_coords(self._endpoints.keys())
+
+        print(f"[LOG] RouteIndex felépítve: {len(rows)} jármű, {len(self._postings)} település kulcs")
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    @staticmethod
+    def _load_stops(vehicle_ids):
+        q = db.session.query(VehicleRoute.vehicle_id, VehicleRoute.country, VehicleRoute.city)
+        if vehicle_ids is not None:
+            q = q.filter(VehicleRoute.vehicle_id.in_(vehicle_ids))
+        stops = defaultdict(list)
+        for r in q.order_by(VehicleRoute.vehicle_id, VehicleRoute.stop_number):
+            stops[r.vehicle_id].append((r.country, r.city))
+        return stops
+
+    @staticmethod
+    def _load_destinations(vehicle_ids):
+        """VehicleDestination országok járművenként ("bármely ország" járművek)."""
+        q = db.session.query(VehicleDestination.vehicle_id, VehicleDestination.country)
+        if vehicle_ids is not None:
+            q = q.filter(VehicleDestination.vehicle_id.in_(vehicle_ids))
+        destinations = defaultdict(list)
+        for r in q:
+            destinations[r.vehicle_id].append(r.country)
+        return destinations
+
+    @staticmethod
+    def _warm_refs(rows):
+        """A járművek referenciáinak szomszédai egyszerre (radius_cache: memória / DB / számolás): {ref: RadiusEntry}"""
+        refs = {}
+        for row in rows:
+            for key, diff in vehicle_refs(row).items():
+                refs[key] = max(refs.get(key, 0), diff)
+        return radius_cache.warm(refs)
+
+    # ------------------------------------------------------------------
+    # Karbantartás (mentés / módosítás / törlés)
+    # ------------------------------------------------------------------
+    def refresh_vehicle(self, vehicle_id):
+        """Egy jármű újraindexelése (a szomszéd listák referenciánként közösek, a többi járművet nem érinti)."""
+        if not self._built:
+            self.ensure_built()
+            return
+        self._reindex({vehicle_id})
+
+    def remove_vehicle(self, vehicle_id):
+        with self._lock:
+            self.columns.remove(vehicle_id)
+            self.availability.remove(vehicle_id)
+            self.any_vehicles.discard(vehicle_id)
+            self.corridor.remove(vehicle_id)
+            self._endpoints.pop(vehicle_id, None)
+            for key in self._vehicle_keys.pop(vehicle_id, ()):
+                bucket = self._postings.get(key)
+                if bucket is None:
+                    continue
+                bucket.pop(vehicle_id, None)
+                if not bucket:
+                    del self._postings[key]
+                    self._countries[key[1]].discard(key[0])
+                    if not self._countries[key[1]]:
+                        del self._countries[key[1]]
+
+    def _reindex(self, vehicle_ids):
+        rows = db.session.query(*_VEHICLE_COLUMNS).filter(Vehicle.vehicle_id.in_(vehicle_ids)).all()
+        stops = self._load_stops(vehicle_ids)
+        destinations = self._load_destinations(vehicle_ids)
+        nearby = self._warm_refs(rows)
+        with self._lock:
+            for vid in vehicle_ids:
+                self.remove_vehicle(vid)
+            for row in rows:
+                self._add_vehicle(row, stops.get(row.vehicle_id, []), nearby, destinations.get(row.vehicle_id))
+        self._load_endpoint_coords(vehicle_ids)
+
+    def _load_endpoint_coords(self, vehicle_ids):
+        """A kitérő számításhoz: polyline nélküli járművek végpontjainak koordinátái a City táblából"""
+        distance_cache.ensure_loaded()
+        keys = set()
+        for vid in list(vehicle_ids):
+            for key in self._endpoints.get(vid, ()):
+                if key and not distance_cache.has_coords(key):
+                    keys.add(key)
+        distance_cache.load_city_coords(keys)
+
+    def _add_vehicle(self, row, stops, nearby, destinations=None):
+        """
+        Egy jármű bejegyzései. A lock-ot a hívó tartja.
+        nearby: {ref kulcs: RadiusEntry} (_warm_refs), a szomszédok a diff-ig bináris kereséssel
+        destinations: VehicleDestination országok ("bármely ország" jármű), ilyenkor
+        a cél oldalt az ország bitset adja (origin ország + kiválasztott országok).
+        """
+        vid = row.vehicle_id
+        full_route = (
+            [(row.origin_country, row.origin_city)]
+            + list(stops)
+            + [(row.destination_country, row.destination_city)]
+        )
+        keys = set()
+
+        def add(key, hit):
+            self._postings[key].setdefault(vid, []).append(hit)
+            self._countries[key[1]].add(key[0])
+            keys.add(key)
+
+        for pos, (country, city) in enumerate(full_route):
+            if city:
+                add(city_key(country, city), RouteHit(pos, "exact", None, None))
+
+        # szomszédok: csak akkor, ha a jármű hajlandó eltérni (diff > 0), a diff-en belül,
+        # a referencia település útvonal pozíció(i)n (origin elején, destination a végén)
+        for ref_type in ("origin", "destination"):
+            diff = getattr(row, f"{ref_type}_diff")
+            ref = (getattr(row, f"{ref_type}_country"), getattr(row, f"{ref_type}_postcode"),
+                   getattr(row, f"{ref_type}_city"))
+            if not diff or diff <= 0 or not all(ref):
+                continue
+            positions = [pos for pos, (_, stop_city) in enumerate(full_route) if stop_city == ref[2]]
+            near_keys, distances = within(nearby.get(ref_key(*ref)), diff)
+            for key, km in zip(near_keys, distances.tolist()):
+                for pos in positions:
+                    add(key, RouteHit(pos, "nearby", ref_type, km))
+
+        self._vehicle_keys[vid] = keys
+        countries = [row.origin_country] + list(destinations) if destinations else None
+        if countries:
+            self.any_vehicles.add(vid)
+        self.columns.upsert(vid, row.available_from, row.available_until, row.capacity_t,
+                            row.origin_diff, row.destination_diff, countries, feature_masks(row))
+        self.availability.upsert(vid, row.available_from, row.available_until)
+        self.corridor.upsert(vid, row.route_polyline)
+
+        # kitérő számításhoz: végpont kulcsok, koordináta a polyline végeiből
+        origin_key = city_key(row.origin_country, row.origin_city)
+        destination_key = None if countries else city_key(row.destination_country, row.destination_city)
+        self._endpoints[vid] = (origin_key, destination_key)
+        line_ends = self.corridor.endpoints(vid)
+        if line_ends:
+            distance_cache.set_coords(origin_key, line_ends[0])
+            if destination_key:
+                distance_cache.set_coords(destination_key, line_ends[1])
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def lookup(self, country, city):
+        """
+        Visszaadja: {vehicle_id: [RouteHit, ...]} azokra a járművekre, amelyek útvonala érinti a várost.
+        Ha nincs országkód, az összes azonos nevű települést figyelembe vesszük.
+        """
+        self.ensure_built()
+        country_norm, city_norm = city_key(country, city)
+        if not city_norm:
+            return {}
+
+        with self._lock:
+            if country_norm:
+                return {vid: list(hits) for vid, hits in self._postings.get((country_norm, city_norm), {}).items()}
+
+            merged = {}
+            for c in self._countries.get(city_norm, ()):
+                for vid, hits in self._postings.get((c, city_norm), {}).items():
+                    merged.setdefault(vid, []).extend(hits)
+            return merged
+
+    def available_near(self, day, slack_days=None):
+        """Járművek, amelyek elérhetőségi ablaka day ± slack_days napon belül van (availability_index)."""
+        self.ensure_built()
+        if slack_days is None:
+            return self.availability.available_near(day)
+        return self.availability.available_near(day, slack_days)
+
+    def compact_postings(self):
+        """
+        Az index tömbösített másolata (snapshot / batch feldolgozáshoz):
+        {(country, city): (vehicle_id, position, kind, radius_km)} NumPy tömbökkel,
+        kind: HIT_EXACT / HIT_NEARBY_ORIGIN / HIT_NEARBY_DESTINATION, radius_km pontos egyezésnél inf.
+        """
+        self.ensure_built()
+        kinds = {"origin": HIT_NEARBY_ORIGIN, "destination": HIT_NEARBY_DESTINATION}
+        compact = {}
+        with self._lock:
+            for key, bucket in self._postings.items():
+                hits = [(vid, h.position, HIT_EXACT if h.kind == "exact" else kinds[h.ref_type],
+                         h.radius_km if h.kind == "nearby" else np.inf)
+                        for vid, vehicle_hits in bucket.items() for h in vehicle_hits]
+                vids, positions, kind, radius = zip(*hits)
+                compact[key] = (
+                    np.array(vids, dtype=np.int64), np.array(positions, dtype=np.int32),
+                    np.array(kind, dtype=np.int8), np.array(radius, dtype=np.float64),
+                )
+        return compact
+
+    def corridor_vehicles(self, points, km=CORRIDOR_KM):
+        """
+        Járművek, amelyek útvonala km-en belül, helyes sorrendben halad el a megállók mellett.
+        points: a rakomány megállóinak (lat, lon) koordinátái sorrendben (None, ha nincs)
+        """
+        self.ensure_built()
+        return self.corridor.ordered_points(points, km)
+
+    def endpoints(self, vehicle_id):
+        """(origin kulcs, destination kulcs) vagy (origin kulcs, None) "bármely ország" járműnél"""
+        return self._endpoints.get(vehicle_id, (None, None))
+
+    def any_vehicle_ids(self):
+        """A "bármely ország" járművek azonosítói (másolat)."""
+        self.ensure_built()
+        with self._lock:
+            return set(self.any_vehicles)
+
+    def vehicle_hits(self, vehicle_id):
+        """Egy jármű összes bejegyzése: {(country, city): [RouteHit, ...]} (fordított matchinghez)."""
+        self.ensure_built()
+        with self._lock:
+            return {
+                key: list(self._postings[key][vehicle_id])
+                for key in self._vehicle_keys.get(vehicle_id, ())
+            }
+
+
+def hit_masks(hits_by_vehicle, vehicle_ids, ref_type, diffs):
+    """
+    Útvonal találatok pozíció bitmaszkokként (scoring.stop_codes), a vektorizált pontozáshoz:
+    - a pontos egyezések pozíciói (bárhol a teljes útvonalon)
+    - a ref_type-hoz tartozó, diff-en belüli szomszéd találatok referencia stopjainak pozíciói
+    """
+    exact_mask = np.zeros(len(vehicle_ids), dtype=np.uint64)
+    nearby_mask = np.zeros(len(vehicle_ids), dtype=np.uint64)
+    for i, (vid, diff) in enumerate(zip(vehicle_ids, np.broadcast_to(diffs, (len(vehicle_ids),)).tolist())):
+        for h in hits_by_vehicle.get(vid, ()):
+            if h.kind == "exact":
+                exact_mask[i] |= position_bit(h.position)
+            elif diff and h.ref_type == ref_type and h.radius_km <= diff:
+                nearby_mask[i] |= position_bit(h.position)
+    return exact_mask, nearby_mask
+
+
+# process-szintű példány
+route_index = RouteIndex()
@@ -8,7 +8,10 @@ from utils import *
 from . import cargo_bp
 from models import *
 from extensions import *
-from matching import find_matches_for_cargo
+from match_store import sync_vehicle, drop_vehicle, sync_cargo, drop_cargo
+from match_stream import start_cargo_match_stream
+from subscription_index import publish_new_cargo
+from geocache import geocache
 
 
 def cargo_to_dict(cargo):
@@ -59,6 +62,8 @@ def delete_cargos():
             deleted_ids.append(cargo.cargo_id)
 
         db.session.commit()
+        for cid in deleted_ids:
+            drop_cargo(cid)
         return jsonify({'success': True, 'deleted_ids': deleted_ids})
     except Exception as e:
         db.session.rollback()
@@ -85,6 +90,7 @@ def delete_cargo(cargo_id):
 
         db.session.delete(cargo)
         db.session.commit()
+        drop_cargo(cargo_id)
         return jsonify({"success": True})
     except Exception as e:
         db.session.rollback()
@@ -169,6 +175,17 @@ def handle_expired_action():
     db.session.delete(notif)
 
     db.session.commit()
+
+    if item_type == "cargo":
+        if action == "delete":
+            drop_cargo(int(item_id))
+        else:
+            sync_cargo(int(item_id))
+    elif item_type == "vehicle":
+        if action == "delete":
+            drop_vehicle(int(item_id))
+        else:
+            sync_vehicle(int(item_id))
     return jsonify({"success": True})
 
 
@@ -378,7 +395,6 @@ def cargo():
             is_hidden = pickup_hidden_flags[i]
 
             # masked érték
-            masked_city, masked_postcode = (get_nearby_major_city(city, country) if is_hidden else (city, postcode))
             # print(f"[DEBUG] city={city}, country={country}, is_hidden={is_hidden}")
             masked_city, masked_postcode = (
                 get_nearby_major_city(city, country or "HU") if is_hidden else (city, postcode))
@@ -565,16 +581,19 @@ def cargo():
             flash("Hiba történt mentés közben: " + str(e), "error")
             return jsonify({"success": False, "error": str(e)})
 
-        # --- Matching járművek ---
-        matches = find_matches_for_cargo(new_cargo)  # list of {"vehicle_id":..., "score":...}
-        top_matches = matches[:10]
+        # --- Matching háttérben: a találatok Socket.IO-n jönnek ("cargo_matches", user_{id} szoba) ---
+        start_cargo_match_stream(new_cargo.cargo_id, current_user.user_id)
+        # --- Lane feliratkozók értesítése (predikátum index, nem a feliratkozók végigjárása) ---
+        try:
+            publish_new_cargo(new_cargo)
+        except Exception as e:
+            print("[ERROR] Lane értesítés hiba:", e)
 
-        # Visszaadjuk JSON-ben, ne rendereljünk oldalt
+        # Visszaadjuk JSON-ben, ne rendereljünk oldalt; a matchingre nem várunk
         return jsonify({
             "success": True,
-            "cargo_id": new_cargo.cargo_id,  # hasznos extra
-            "matches": top_matches,
-            "top_vehicle_ids": [m["vehicle_id"] for m in top_matches],
+            "cargo_id": new_cargo.cargo_id,
+            "matching": "pending",
             "message": "Új rakomány sikeresen hozzáadva!"
         })
 
@@ -1180,6 +1199,8 @@ def update_cargo(cargo_id):
         current_app.logger.exception("Adatbázis mentés sikertelen update_cargo")
         return jsonify({'error': 'Adatbázis mentés sikertelen', 'details': str(ex)}), 500
 
+    sync_cargo(cargo.cargo_id)
+
     # visszaküldött objektum
     pickups = [l for l in sorted(cargo.locations, key=lambda x: x.id) if l.type == 'pickup']
     dropoffs = [l for l in sorted(cargo.locations, key=lambda x: x.id) if l.type == 'dropoff']
@@ -1497,25 +1518,24 @@ def geocode_location_api():
     country = request.args.get('country', '')
     city = request.args.get('city', '')
     postcode = request.args.get('postcode', '')
+    if not any([postcode, city, country]):
+        return jsonify({'lat': None, 'lng': None, 'error': 'No query'}), 400
     try:
-        q = ', '.join([x for x in [postcode, city, country] if x])
-        if not q:
-            return jsonify({'lat': None, 'lng': None, 'error': 'No query'}), 400
-        res = requests.get(
-            'https://nominatim.openstreetmap.org/search',
-            params={'q': q, 'format': 'json', 'limit': 1},
-            headers={'User-Agent': 'GVM-app'},
-            timeout=5
-        )
-        if res.status_code == 200:
-            j = res.json()
-            if j:
-                return jsonify({'lat': float(j[0]['lat']), 'lng': float(j[0]['lon'])})
+        coords = nominatim_search(country, city, postcode)
+        if coords:
+            return jsonify({'lat': coords[0], 'lng': coords[1]})
         return jsonify({'lat': None, 'lng': None, 'error': 'Not found'}), 404
     except Exception as e:
         return jsonify({'lat': None, 'lng': None, 'error': str(e)}), 500
 
 
+@cargo_bp.route('/geocode_cache/stats')
+@login_required
+def geocode_cache_stats():
+    # külső geokódoló cache számlálói (memória / DB találat, HTTP hívás, negatív, hiba)
+    return jsonify({**geocache.stats, "entries": len(geocache)})
+
+
 @cargo_bp.route("/ajax/city_search")
 def city_search():
     term = request.args.get("q", "").strip()
@@ -1,8 +1,27 @@
 from flask import request, jsonify
-from matching import find_matches_for_cargo
-from models import Cargo, Vehicle
+from flask_login import login_required, current_user
+from extensions import db
+from match_store import list_cargo_matches, list_vehicle_matches, store_cargo_matches, store_vehicle_matches
+from models import Cargo, Vehicle, City, LaneSubscription
+from subscription_index import subscription_index
+from utils import parse_date
 from . import matching_bp
 
+def _limit(value):
+    """Találati limit: pozitív egész (hiányzó/üres -> 0, azaz nincs korlát), különben None (hibás érték)"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    if limit <= 0 or limit != float(value):
+        return None
+    return limit
+
+
 # routes/matching.py
 @matching_bp.route("/find_matches", methods=["POST"])
 def find_matches():
@@ -18,7 +37,14 @@ def find_matches():
     if not cargo:
         return jsonify({"error": "Cargo not found"}), 404
 
-    matches = find_matches_for_cargo(cargo)  # már objektum tömb: {"vehicle_id":..,"score":..}
+    limit = _limit(data.get("limit"))  # opcionális: csak a legjobb N találat
+    if limit is None:
+        return jsonify({"error": "limit pozitív egész szám legyen"}), 400
+
+    # tárolt találatok (cargo_vehicle_match); ha még nincs pontozva, most pontozzuk és mentjük
+    matches = list_cargo_matches(cargo.cargo_id, limit=limit)  # már objektum tömb: {"vehicle_id":..,"score":..}
+    if not matches and store_cargo_matches(cargo):
+        matches = list_cargo_matches(cargo.cargo_id, limit=limit)
 
     # Backend log
     # print("=== Backend log: matches visszaküldés előtt ===")
@@ -28,4 +54,114 @@ def find_matches():
     return jsonify({"matches": matches})
 
 
+@matching_bp.route("/find_cargo_matches", methods=["POST"])
+def find_cargo_matches():
+    data = request.json
+    vehicle_id = data.get("vehicle_id")
+    if not vehicle_id:
+        return jsonify({"error": "vehicle_id missing"}), 400
+
+    vehicle = Vehicle.query.get(vehicle_id)
+    if not vehicle:
+        return jsonify({"error": "Vehicle not found"}), 404
+
+    limit = _limit(data.get("limit"))  # opcionális: csak a legjobb N találat
+    if limit is None:
+        return jsonify({"error": "limit pozitív egész szám legyen"}), 400
+
+    matches = list_vehicle_matches(vehicle.vehicle_id, limit=limit)  # {"cargo_id":.., "score":..} lista, pontszám szerint
+    if not matches and store_vehicle_matches(vehicle):
+        matches = list_vehicle_matches(vehicle.vehicle_id, limit=limit)
+
+    return jsonify({"matches": matches})
+
+
+# ----------------------------------------------------------------------
+# Lane feliratkozások (új rakomány értesítés, subscription_index.py)
+# ----------------------------------------------------------------------
+def _area_coords(country, city):
+    if not city:
+        return None, None
+    c = City.query.filter_by(city_name=city, country_code=country).first()
+    return (c.latitude, c.longitude) if c else (None, None)
+
+
+def _radius_km(value):
+    """Sugár km-ben: nemnegatív egész (üres -> 0), különben None (hibás érték)"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool):
+        return None
+    try:
+        radius = int(value)
+    except (TypeError, ValueError):
+        return None
+    if radius < 0 or radius != float(value):
+        return None
+    return radius
+
+
+@matching_bp.route("/lane_subscriptions", methods=["GET"])
+@login_required
+def list_lane_subscriptions():
+    subs = (LaneSubscription.query
+            .filter_by(user_id=current_user.user_id)
+            .order_by(LaneSubscription.created_at.desc())
+            .all())
+    return jsonify({"subscriptions": [s.to_dict() for s in subs]})
+
+
+@matching_bp.route("/lane_subscriptions", methods=["POST"])
+@login_required
+def create_lane_subscription():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Érvénytelen kérés"}), 400
+    origin_radius_km = _radius_km(data.get("origin_radius_km"))
+    destination_radius_km = _radius_km(data.get("destination_radius_km"))
+    if origin_radius_km is None or destination_radius_km is None:
+        return jsonify({"error": "origin_radius_km és destination_radius_km nemnegatív egész szám legyen"}), 400
+
+    origin_country = (data.get("origin_country") or "").strip().upper()
+    destination_country = (data.get("destination_country") or "").strip().upper()
+    if not origin_country or not destination_country:
+        return jsonify({"error": "origin_country és destination_country kötelező"}), 400
+
+    origin_city = (data.get("origin_city") or "").strip() or None
+    destination_city = (data.get("destination_city") or "").strip() or None
+    origin_lat, origin_lon = _area_coords(origin_country, origin_city)
+    destination_lat, destination_lon = _area_coords(destination_country, destination_city)
+
+    sub = LaneSubscription(
+        user_id=current_user.user_id,
+        company_id=current_user.company_id,
+        origin_country=origin_country,
+        origin_city=origin_city,
+        origin_radius_km=origin_radius_km,
+        origin_lat=origin_lat,
+        origin_lon=origin_lon,
+        destination_country=destination_country,
+        destination_city=destination_city,
+        destination_radius_km=destination_radius_km,
+        destination_lat=destination_lat,
+        destination_lon=destination_lon,
+        date_from=parse_date(data.get("date_from")),
+        date_until=parse_date(data.get("date_until")),
+        vehicle_type=(data.get("vehicle_type") or "").strip() or None,
+    )
+    db.session.add(sub)
+    db.session.commit()
+    subscription_index.refresh(sub.id)
+    return jsonify({"subscription": sub.to_dict()})
+
 
+@matching_bp.route("/lane_subscriptions/<int:sub_id>/delete", methods=["POST"])
+@login_required
+def delete_lane_subscription(sub_id):
+    sub = LaneSubscription.query.filter_by(id=sub_id, user_id=current_user.user_id).first()
+    if not sub:
+        return jsonify({"error": "Feliratkozás nem található"}), 404
+    db.session.delete(sub)
+    db.session.commit()
+    subscription_index.remove(sub_id)
+    return jsonify({"success": True})
@@ -10,9 +10,13 @@ from flask import Blueprint, request, redirect, url_for, current_app
 from flask_login import current_user
 from datetime import datetime
 import requests
-from math import radians, sin, cos, sqrt, atan2
 from extensions import db
 from models import Vehicle, VehicleRoute, City
+from match_store import sync_vehicle, drop_vehicle
+from polyline import encode_polyline, simplify_polyline, ROUTE_TOLERANCE_M
+from distance_cache import distance_cache
+from route_index import city_key
+from city_index import city_index
 
 
 @vehicles_bp.route('/vehicles')
@@ -177,6 +181,7 @@ def save_vehicle():
                 db.session.commit()
             except Exception as e:
                 print("[ERROR] Hibás JSON formátum az országlistánál:", e)
+        sync_vehicle(new_vehicle.vehicle_id)
         return redirect(url_for("shipments"))
 
     # -------------------------------
@@ -187,6 +192,7 @@ def save_vehicle():
 
     if not pickup_city or not dropoff_city:
         print("[ERROR] Nem található origin vagy destination város!")
+        sync_vehicle(new_vehicle.vehicle_id)
         return redirect(url_for("shipments"))
 
     osrm_route_coords = []
@@ -205,6 +211,10 @@ def save_vehicle():
             data = response.json()
             if "routes" in data and len(data["routes"]) > 0:
                 osrm_route_coords = [[lat, lon] for lon, lat in data["routes"][0]["geometry"]["coordinates"]]
+                # valódi közúti távolság a kitérő számításhoz (a becslést felülírja)
+                distance_cache.record_road(city_key(origin_country, origin_city),
+                                           city_key(destination_country, destination_city),
+                                           data["routes"][0]["distance"] / 1000)
         except Exception as e:
             print("[ERROR] OSRM hiba:", e)
 
@@ -212,41 +222,15 @@ def save_vehicle():
         osrm_route_coords = [[pickup_city.latitude, pickup_city.longitude],
                              [dropoff_city.latitude, dropoff_city.longitude]]
 
-    # Bounding box + nearby cities
-    lats = [lat for lat, lon in osrm_route_coords]
-    lons = [lon for lat, lon in osrm_route_coords]
-    min_lat, max_lat = min(lats) - 0.1, max(lats) + 0.1
-    min_lon, max_lon = min(lons) - 0.1, max(lons) + 0.1
-
-    cities_query = City.query.filter(
-        City.latitude != None,
-        City.longitude != None,
-        City.latitude >= min_lat, City.latitude <= max_lat,
-        City.longitude >= min_lon, City.longitude <= max_lon
-    ).all()
+    # ritkított útvonal (ROUTE_TOLERANCE_M méteren belül az eredetitől) tömören tárolva a folyosó matchinghez
+    osrm_route_coords = simplify_polyline(osrm_route_coords)
+    new_vehicle.route_polyline = encode_polyline(osrm_route_coords)
 
-    radius_km = 3
-    nearby = []
-    for city in cities_query:
-        min_idx = None
-        min_dist = float('inf')
-        for idx, (lat, lon) in enumerate(osrm_route_coords):
-            max_deg = radius_km / 111.0
-            if abs(lat - city.latitude) > max_deg or abs(lon - city.longitude) > max_deg:
-                continue
-            dlat = radians(city.latitude - lat)
-            dlon = radians(city.longitude - lon)
-            a = sin(dlat / 2) ** 2 + cos(radians(lat)) * cos(radians(city.latitude)) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            dist = 6371 * c
-            if dist <= radius_km and dist < min_dist:
-                min_dist = dist
-                min_idx = idx
-        if min_idx is not None:
-            nearby.append((min_idx, city))
-    nearby.sort(key=lambda x: x[0])
-
-    for stop_number, (_, city) in enumerate(nearby, start=1):
+    # útvonal menti települések (3 km + ritkítási tűrés) a térbeli indexből, az útvonal sorrendjében
+    city_ids, _ = city_index.near_route(osrm_route_coords, 3 + ROUTE_TOLERANCE_M / 1000)
+    nearby = city_index.cities(city_ids)
+
+    for stop_number, city in enumerate(nearby, start=1):
         route_entry = VehicleRoute(
             vehicle_id=new_vehicle.vehicle_id,
             stop_number=stop_number,
@@ -301,6 +285,11 @@ def save_vehicle():
     # -------------------------------
     add_nearby_cities_for_vehicle(new_vehicle)
 
+    # -------------------------------
+    # 9️⃣ Matching index + tárolt találatok frissítése
+    # -------------------------------
+    sync_vehicle(new_vehicle.vehicle_id)
+
     return redirect(url_for("shipments"))
 
 
@@ -398,6 +387,8 @@ def update_vehicle():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+    sync_vehicle(vehicle.vehicle_id)
+
     return jsonify({"success": True})
 
 
@@ -412,6 +403,7 @@ def delete_vehicle(vehicle_id):
 
     db.session.delete(vehicle)
     db.session.commit()
+    drop_vehicle(vehicle_id)
     return jsonify({"success": True})
 
 
@@ -436,6 +428,8 @@ def delete_vehicles():
             deleted_ids.append(vehicle.vehicle_id)
 
         db.session.commit()
+        for vid in deleted_ids:
+            drop_vehicle(vid)
         return jsonify({'success': True, 'deleted_ids': deleted_ids})
     except Exception as e:
         db.session.rollback()
@@ -630,8 +624,11 @@ def cities_near_route():
     POST JSON: {"route": [[lat, lon], ...], "radius_km": 1}
     Visszaadja az összes települést sorrendben, amin keresztül a route megy.
     Gyorsított verzió:
-      - route ritkítása
-      - gyors bounding box szűrés városonként
+      - Douglas–Peucker ritkítás ROUTE_TOLERANCE_M tűréssel, a keresési sugár ennyivel bővebb,
+        így az eredeti útvonal radius_km-es sávjából nem marad ki település
+      - a polyline szakaszait nézzük (pont - szakasz távolság, szakasz rács index)
+      - a települések a memóriában tartott térbeli indexből (city_index.py), DB lekérdezés nélkül
+      - sorrend: a település vetülete az útvonal mentén
     """
     data = request.get_json()
     route = data.get("route", [])
@@ -640,55 +637,11 @@ def cities_near_route():
     if not route or len(route) < 2:
         return jsonify([])
 
-    # ---- route ritkítás ----
-    def simplify_route(points, max_points=200):
-        if len(points) <= max_points:
-            return points
-        step = max(1, len(points) // max_points)
-        return points[::step]
-
-    route = simplify_route(route)
-
-    # ---- bounding box az egész útvonal köré ----
-    lats = [lat for lat, lon in route]
-    lons = [lon for lat, lon in route]
-    min_lat, max_lat = min(lats) - 0.1, max(lats) + 0.1
-    min_lon, max_lon = min(lons) - 0.1, max(lons) + 0.1
-
-    # ---- DB lekérdezés ----
-    cities_query = City.query.filter(
-        City.latitude != None,
-        City.longitude != None,
-        City.latitude >= min_lat, City.latitude <= max_lat,
-        City.longitude >= min_lon, City.longitude <= max_lon
-    ).all()
-
-    # ---- gyors előszűrés távolság becsléssel ----
-    def approx_distance_ok(lat1, lon1, lat2, lon2, radius_km):
-        # ~111 km ~ 1 fok szélesség
-        max_deg = radius_km / 111.0
-        return abs(lat1 - lat2) <= max_deg and abs(lon1 - lon2) <= max_deg
-
-    # ---- települések vizsgálata ----
-    nearby = []
-    for city in cities_query:
-        min_idx = None
-        min_dist = float('inf')
-
-        for idx, (lat, lon) in enumerate(route):
-            if not approx_distance_ok(lat, lon, city.latitude, city.longitude, radius_km):
-                continue  # túl messze, nem kell számolni
-
-            dist = haversine(lat, lon, city.latitude, city.longitude)
-            if dist <= radius_km and dist < min_dist:
-                min_dist = dist
-                min_idx = idx
-
-        if min_idx is not None:
-            nearby.append((min_idx, city))
+    route = simplify_polyline(route)
 
-    # ---- sorrend az útvonal mentén ----
-    nearby.sort(key=lambda x: x[0])
+    # ---- útvonal menti települések a térbeli indexből, útvonal sorrendben ----
+    city_ids, _ = city_index.near_route(route, radius_km + ROUTE_TOLERANCE_M / 1000)
+    nearby = city_index.cities(city_ids)
 
     city_list = [
         {
@@ -696,7 +649,7 @@ def cities_near_route():
             "latitude": c.latitude,
             "longitude": c.longitude
         }
-        for _, c in nearby
+        for c in nearby
     ]
 
     return jsonify(city_list)
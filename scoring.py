@@ -0,0 +1,445 @@
+# scoring.py
+"""
+Oszlopos (NumPy) pontozó motor a matchinghez.
+
+A járművek pontozáshoz szükséges adatai (elérhetőség, kapacitás, diff sugarak)
+tömbökben vannak tárolva, így egy cargo összes jelöltjét egyetlen vektorizált
+lépésben pontozzuk, Python ciklus és ORM objektumok nélkül.
+A pontszámok pontosan megegyeznek a korábbi, járművenkénti számítással.
+"""
+import heapq
+import threading
+
+import numpy as np
+
+# pontszám súlyok
+LOCATION_POINTS = {
+    "exact_match": 50,
+    "on_route": 25,
+}
+
+TIME_POINTS = {
+    "in_time": 40,
+    "late_penalty": 10,   # naponta ennyit vonunk le
+}
+
+CAPACITY_POINTS = {
+    "equal_or_10_less": 25,
+    "much_smaller": 15,
+    "slightly_bigger": 0,
+    "too_big": -30,
+}
+
+# kitérő: max pont 0 km kitérőnél, km_per_point km-enként 1 ponttal kevesebb, 0 alá nem megy
+DETOUR_POINTS = {
+    "max": 20,
+    "km_per_point": 5,
+}
+
+# helyszín kódok
+LOC_NONE, LOC_NEARBY, LOC_EXACT = 0, 1, 2
+_LOCATION_SCORE = np.array([0, LOCATION_POINTS["on_route"], LOCATION_POINTS["exact_match"]], dtype=np.int64)
+
+NO_DATE = 0  # date.toordinal() mindig >= 1, így a 0 jelenti a hiányzó dátumot
+
+# országkód bitset: kétbetűs kód -> bit (26 * 26 = 676 bit, 11 db uint64 szó)
+COUNTRY_WORDS = 11
+
+
+def date_ordinal(d):
+    return d.toordinal() if d else NO_DATE
+
+
+def country_bit(code):
+    """(szó index, maszk) egy kétbetűs országkódhoz; None, ha a kód nem értelmezhető"""
+    code = (code or "").strip().upper()
+    if len(code) != 2 or not code.isascii() or not code.isalpha():
+        return None
+    bit = (ord(code[0]) - 65) * 26 + (ord(code[1]) - 65)
+    return bit // 64, np.uint64(1) << np.uint64(bit % 64)
+
+
+def country_bits(codes):
+    """Országkódok listája -> bitset (COUNTRY_WORDS hosszú uint64 tömb)"""
+    bits = np.zeros(COUNTRY_WORDS, dtype=np.uint64)
+    for code in codes:
+        word_mask = country_bit(code)
+        if word_mask:
+            bits[word_mask[0]] |= word_mask[1]
+    return bits
+
+
+def country_allowed(bits, code):
+    """bits: (n, COUNTRY_WORDS) bitsetek; igaz, ahol az ország bitje be van állítva (O(1) soronként)"""
+    word_mask = country_bit(code)
+    if word_mask is None:
+        return np.zeros(len(bits), dtype=bool)
+    return (bits[:, word_mask[0]] & word_mask[1]) != 0
+
+
+# jármű jellemzők bitmaszkja: mező -> választható értékek (a felületi listák sorrendje = bit sorszám)
+# új értéket csak a lista végére szabad felvenni, különben a tárolt maszkok jelentése eltolódik
+FEATURE_OPTIONS = {
+    "vehicle_type": [
+        "Jármű 3,5 t-ig", "Nyerges szerelvény", "Pótos szerelvény", "Tehergépjármű 7,5 t-ig",
+        "Tehergépjármű 12 t-ig",
+    ],
+    "structure": [
+        "Autószállító", "Billenős konténer", "Cserefelépítmény-Chassis", "Dobozos", "Furgon", "Dupla kabinos",
+        "Félpótkocsi", "Hűtő", "Jumbo", "Klipper", "Konténerszállító", "Kábeldobszálíltó", "Középrakodós", "Mega",
+        "Mozgópadlós", "Mozgópadlós (ömlesztett áru)", "Mélybölcsős", "Nyitott tehergépkocsi", "Oldalrakodós",
+        "Ponyvás", "Sasszé", "Siló", "Speciális jármű", "Szigetelt", "Szállítószalagos", "Tartálykocsi",
+        "Tautliner", "Tele", "Vontató",
+    ],
+    "equipment": [
+        "2. sofőr", "A-Schild", "ADR", "BF3 kísérőjármű", "BF4 kísérőjármű", "Béka", "Emelőhátfal",
+        "Farönkszállító", "GPS követő", "Húskampó", "Rakodódaru", "Rámpa", "Takaróponyva", "Targonca",
+        "Válaszfal", "Vámzsinór",
+    ],
+    "cargo_securement": [
+        "Csúszásgátló", "Láncos feszítő", "Multilock", "Oldalfalas", "Palettarögzítő gerenda",
+        "Rakományrögzítő rúd", "Rakonca", "Spanifer", "Élvédő",
+    ],
+}
+# maszk oszlopok sorrendje (features tömbök oszlopai); az első FEATURE_ANY_OF mező "bármelyik",
+# a többi "mindegyik" jellegű: a rakomány típus / felépítmény igénye közül egy elég,
+# a kért felszereltség és rögzítés viszont mind kell
+FEATURE_FIELDS = ("vehicle_type", "structure", "equipment", "cargo_securement")
+FEATURE_ANY_OF = 2
+_FEATURE_BITS = {
+    field: {option.casefold(): 1 << bit for bit, option in enumerate(options)}
+    for field, options in FEATURE_OPTIONS.items()
+}
+
+
+def feature_mask(field, text):
+    """Vesszővel elválasztott szabad szöveg -> bitmaszk; az ismeretlen értékek kimaradnak"""
+    bits = _FEATURE_BITS[field]
+    mask = 0
+    for value in (text or "").split(","):
+        mask |= bits.get(value.strip().casefold(), 0)
+    return mask
+
+
+def set_feature_masks(obj):
+    """A szöveges mezőkből a *_mask oszlopok kitöltése (Cargo / Vehicle, mentés előtt)"""
+    for field in FEATURE_FIELDS:
+        setattr(obj, f"{field}_mask", feature_mask(field, getattr(obj, field)))
+
+
+def feature_masks(obj):
+    """Egy Cargo / Vehicle (vagy lekérdezett sor) maszkjai FEATURE_FIELDS sorrendben"""
+    return tuple(getattr(obj, f"{field}_mask", 0) or 0 for field in FEATURE_FIELDS)
+
+
+def features_compatible(vehicle_features, cargo_features):
+    """
+    Kemény kompatibilitás szűrő, bitenkénti AND-del (n, 4) / (4,) alakú tömbökön, broadcasttal.
+    - típus, felépítmény: a rakomány nem kér semmit (0), vagy a jármű értéke a kértek között van;
+      ismeretlen (0) jármű érték nem zár ki
+    - felszereltség, rögzítés: a rakomány minden kért bitje megvan a járműnél
+    """
+    vehicle_features = np.asarray(vehicle_features, dtype=np.int64)
+    cargo_features = np.asarray(cargo_features, dtype=np.int64)
+    v_any, c_any = vehicle_features[..., :FEATURE_ANY_OF], cargo_features[..., :FEATURE_ANY_OF]
+    any_ok = ((c_any == 0) | (v_any == 0) | ((v_any & c_any) != 0)).all(axis=-1)
+    c_all = cargo_features[..., FEATURE_ANY_OF:]
+    all_ok = ((vehicle_features[..., FEATURE_ANY_OF:] & c_all) == c_all).all(axis=-1)
+    return any_ok & all_ok
+
+
+class VehicleColumns:
+    """
+    Járműadatok oszlopos tárolása. Minden járműnek egy sora van;
+    törlésnél a sor felszabadul és újrahasznosítható.
+    """
+    def __init__(self, capacity=1024):
+        self._lock = threading.RLock()
+        self._rows = {}    # vehicle_id -> sor index
+        self._free = []
+        self._size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.vehicle_id = np.full(capacity, -1, dtype=np.int64)
+        self.available_from = np.full(capacity, NO_DATE, dtype=np.int64)
+        self.available_until = np.full(capacity, NO_DATE, dtype=np.int64)
+        self.capacity_t = np.zeros(capacity, dtype=np.float64)
+        self.origin_diff = np.zeros(capacity, dtype=np.float64)
+        self.destination_diff = np.zeros(capacity, dtype=np.float64)
+        # "bármely ország" járművek: origin ország + VehicleDestination országok; 0, ha nem ilyen a jármű
+        self.destination_countries = np.zeros((capacity, COUNTRY_WORDS), dtype=np.uint64)
+        # jellemző bitmaszkok FEATURE_FIELDS sorrendben
+        self.features = np.zeros((capacity, len(FEATURE_FIELDS)), dtype=np.int64)
+
+    def _grow(self):
+        old = (self.vehicle_id, self.available_from, self.available_until, self.capacity_t,
+               self.origin_diff, self.destination_diff, self.destination_countries, self.features)
+        self._allocate(len(self.vehicle_id) * 2)
+        new = (self.vehicle_id, self.available_from, self.available_until, self.capacity_t,
+               self.origin_diff, self.destination_diff, self.destination_countries, self.features)
+        for src, dst in zip(old, new):
+            dst[:len(src)] = src
+
+    def __len__(self):
+        return len(self._rows)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._free.clear()
+            self._size = 0
+            self._allocate(len(self.vehicle_id))
+
+    def upsert(self, vehicle_id, available_from, available_until, capacity_t, origin_diff, destination_diff,
+               destination_countries=None, features=None):
+        with self._lock:
+            row = self._rows.get(vehicle_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    if self._size == len(self.vehicle_id):
+                        self._grow()
+                    row = self._size
+                    self._size += 1
+                self._rows[vehicle_id] = row
+
+            self.vehicle_id[row] = vehicle_id
+            self.available_from[row] = date_ordinal(available_from)
+            self.available_until[row] = date_ordinal(available_until)
+            self.capacity_t[row] = capacity_t or 0.0
+            self.origin_diff[row] = origin_diff or 0.0
+            self.destination_diff[row] = destination_diff or 0.0
+            self.destination_countries[row] = country_bits(destination_countries or ())
+            self.features[row] = features or 0
+
+    def remove(self, vehicle_id):
+        with self._lock:
+            row = self._rows.pop(vehicle_id, None)
+            if row is None:
+                return
+            self.vehicle_id[row] = -1
+            self._free.append(row)
+
+    def compact(self):
+        """Élő sorok másolata vehicle_id szerint rendezve (snapshot / batch feldolgozáshoz)."""
+        with self._lock:
+            rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+            rows = rows[np.argsort(self.vehicle_id[rows], kind="stable")]
+            return {
+                "vehicle_id": self.vehicle_id[rows].copy(),
+                "available_from": self.available_from[rows].copy(),
+                "available_until": self.available_until[rows].copy(),
+                "capacity_t": self.capacity_t[rows].copy(),
+                "origin_diff": self.origin_diff[rows].copy(),
+                "destination_diff": self.destination_diff[rows].copy(),
+                "destination_countries": self.destination_countries[rows].copy(),
+                "features": self.features[rows].copy(),
+            }
+
+    def rows_for(self, vehicle_ids):
+        """Visszaadja a sor indexeket és a hozzájuk tartozó (ismert) vehicle_id-kat."""
+        with self._lock:
+            ids = [vid for vid in vehicle_ids if vid in self._rows]
+            rows = np.fromiter((self._rows[vid] for vid in ids), dtype=np.int64, count=len(ids))
+        return rows, ids
+
+
+# útvonal pozíció bitmaszk: bit p = a megálló a teljes útvonal p. elemére esik (0 = origin);
+# a MAX_POSITION-nél hosszabb útvonalak vége az utolsó bitre kerül
+MAX_POSITION = 63
+
+
+def position_bit(position):
+    return np.uint64(1) << np.uint64(min(position, MAX_POSITION))
+
+
+def stop_codes(exact_mask, nearby_mask):
+    """
+    Egy megálló helyszín kódja és a lehetséges útvonal pozíciói (bitmaszk), jelöltenként.
+    exact_mask: a pontos egyezések pozíciói
+    nearby_mask: azon stopok pozíciói, amelyek NearbyCity listájában a diff-en belül szerepel a város
+    Pontos egyezésnél csak a pontos pozíciók számítanak, ugyanúgy, mint a pontszámnál.
+    """
+    exact = exact_mask != 0
+    codes = np.where(exact, LOC_EXACT, np.where(nearby_mask != 0, LOC_NEARBY, LOC_NONE))
+    return codes, np.where(exact, exact_mask, nearby_mask)
+
+
+def route_order_passed(masks, n_pickups):
+    """
+    masks: (megállók, jelöltek) pozíció bitmaszkok a rakomány sorrendjében (felrakók, majd lerakók);
+    0 = ismeretlen pozíció (folyosó / "bármely ország" találat), ez nem köti a sorrendet.
+    Egy menetben, mohón: minden megálló a legkisebb olyan pozíciót kapja, ami >= az előzőé
+    (az első lerakónál szigorúan nagyobb). Ha így nem megy végig, monoton hozzárendelés sincs.
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    passed = np.ones(masks.shape[1], dtype=bool)
+    prev = np.full(masks.shape[1], -1, dtype=np.int64)
+    for stop, mask in enumerate(masks):
+        lower = np.maximum(prev + (1 if stop == n_pickups else 0), 0)
+        below = (np.uint64(1) << np.minimum(lower, MAX_POSITION).astype(np.uint64)) - np.uint64(1)
+        allowed = np.where(lower > MAX_POSITION, np.uint64(0), mask & ~below)
+        known = mask != 0
+        passed &= ~known | (allowed != 0)
+        found = known & (allowed != 0)
+        lowest = allowed & (~allowed + np.uint64(1))  # legalsó beállított bit
+        prev = np.where(found, np.log2(np.maximum(lowest, np.uint64(1)).astype(np.float64)).astype(np.int64), prev)
+    return passed
+
+
+def location_passed(pickup_codes, dropoff_codes, pickup_masks, dropoff_masks):
+    """
+    - minden felrakó és lerakó városnak szerepelnie kell a jármű útvonalában vagy NearbyCity-ben
+    - sorrend: a megállók útvonal pozíciói monotonok (nearby-nál a referencia stop pozíciója)
+    (megállók, jelöltek) alakú tömbök
+    """
+    passed = (pickup_codes != LOC_NONE).all(axis=0) & (dropoff_codes != LOC_NONE).all(axis=0)
+    passed &= route_order_passed(np.vstack((pickup_masks, dropoff_masks)), len(pickup_masks))
+    return passed
+
+
+def side_codes(codes):
+    """Egy oldal (felrakók / lerakók) helyszín kódja: a leggyengébb megállóé"""
+    return codes.min(axis=0)
+
+
+def any_destination_codes(destination_countries, dropoff_codes, dropoff_masks, dropoff_countries):
+    """
+    "Bármely ország" járműveknél (nem üres bitset) a lerakók helyett az országuk dönt:
+    engedélyezett ország -> LOC_NEARBY (on_route pont), különben LOC_NONE.
+    Ezeknek nincs valódi útvonaluk, így a lerakók pozíciója ismeretlen (maszk 0).
+    dropoff_codes, dropoff_masks: (lerakók, jelöltek); dropoff_countries: lerakónként az országkód
+    """
+    is_any = destination_countries.any(axis=1)
+    if not is_any.any():
+        return dropoff_codes, dropoff_masks
+    allowed = np.array([country_allowed(destination_countries, c) for c in dropoff_countries]).reshape(
+        dropoff_codes.shape)
+    dropoff_codes = np.where(is_any, np.where(allowed, LOC_NEARBY, LOC_NONE), dropoff_codes)
+    dropoff_masks = np.where(is_any, np.uint64(0), dropoff_masks)
+    return dropoff_codes, dropoff_masks
+
+
+def corridor_codes(codes, in_corridor):
+    """
+    Folyosó találat (a jármű útvonala km-en belül, helyes sorrendben halad el a felrakó és
+    a lerakó mellett): ahol a településnév nem egyezett, on_route pontot kap.
+    """
+    return np.where(in_corridor & (codes == LOC_NONE), LOC_NEARBY, codes)
+
+
+def location_scores(origin_codes, dest_codes):
+    return _LOCATION_SCORE[origin_codes] + _LOCATION_SCORE[dest_codes]
+
+
+def time_scores(available_from, available_until, start_date):
+    """
+    - elérhetőségi ablakon belül: in_time pont
+    - különben napi late_penalty levonás az ablak széléhez mért távolság alapján
+    - ha nincs available_from vagy cargo kezdő dátum: 0
+    start_date: date / None, vagy ordinal tömb (NO_DATE = hiányzó dátum)
+    """
+    start = start_date if isinstance(start_date, np.ndarray) else date_ordinal(start_date)
+    has_dates = (available_from != NO_DATE) & (start != NO_DATE)
+    has_until = available_until != NO_DATE
+
+    delta = np.where(
+        start < available_from,
+        available_from - start,
+        np.where(has_until & (start > available_until), start - available_until, 0)
+    )
+    score = np.maximum(0, TIME_POINTS["in_time"] - delta * TIME_POINTS["late_penalty"])
+    return np.where(has_dates, score, 0)
+
+
+def capacity_scores(capacity_t, weight):
+    """
+    cargo súly / jármű kapacitás arány szerinti pontozás
+    weight: szám / None, vagy tömb (0 = nincs súly)
+    """
+    weight = np.asarray(weight if weight is not None else 0.0, dtype=np.float64)
+    has_values = (capacity_t != 0) & (weight != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = weight / np.where(capacity_t != 0, capacity_t, 1.0)
+
+    score = np.select(
+        [ratio < 0.9, ratio <= 1.0, ratio <= 1.1],
+        [CAPACITY_POINTS["much_smaller"], CAPACITY_POINTS["equal_or_10_less"], CAPACITY_POINTS["slightly_bigger"]],
+        default=CAPACITY_POINTS["too_big"]
+    )
+    return np.where(has_values, score, 0)
+
+
+def score_components(available_from, available_until, capacity_t, origin_codes, dest_codes, start_date, weight):
+    """
+    Pontszám összetevők (helyszín, idő, kapacitás) (jármű, cargo) párokra.
+    A jármű- és cargo-oldali értékek lehetnek skalárok vagy tömbök (broadcast).
+    """
+    location = location_scores(origin_codes, dest_codes)
+    time = np.broadcast_to(time_scores(available_from, available_until, start_date), location.shape)
+    capacity = np.broadcast_to(capacity_scores(capacity_t, weight), location.shape)
+    return location, time, capacity
+
+
+def score_pairs(available_from, available_until, capacity_t, origin_codes, dest_codes, start_date, weight):
+    """Összesített pontszám (jármű, cargo) párokra."""
+    location, time, capacity = score_components(available_from, available_until, capacity_t,
+                                                origin_codes, dest_codes, start_date, weight)
+    return location + time + capacity
+
+
+def score_candidates(columns, rows, origin_codes, dest_codes, start_date, weight):
+    """Egy cargo összes jelölt járművének pontszám összetevői (egy batch-ben)."""
+    return score_components(columns.available_from[rows], columns.available_until[rows], columns.capacity_t[rows],
+                            origin_codes, dest_codes, start_date, weight)
+
+
+def detour_scores(detour_km):
+    """
+    Kitérő pont: origin -> pickup -> dropoff -> destination mínusz origin -> destination (km) alapján.
+    detour_km: tömb, NaN = nem ismert (nincs koordináta) -> 0 pont
+    """
+    detour_km = np.asarray(detour_km, dtype=np.float64)
+    known = ~np.isnan(detour_km)
+    points = DETOUR_POINTS["max"] - np.floor(np.where(known, detour_km, 0.0) / DETOUR_POINTS["km_per_point"])
+    return np.where(known, np.clip(points, 0, DETOUR_POINTS["max"]), 0).astype(np.int64)
+
+
+def upper_bounds(location, capacity, in_window=None):
+    """
+    Pontszám felső korlát idő pontozás nélkül: a helyszín és a kapacitás pont pontos,
+    az időre a maximális in_time pontot számoljuk.
+    in_window: bool tömb (availability_index); ahol hamis, ott az időpont biztosan 0
+    """
+    time_bound = TIME_POINTS["in_time"] if in_window is None else np.where(in_window, TIME_POINTS["in_time"], 0)
+    return location + capacity + time_bound
+
+
+def top_k(upper, exact_scores, limit, block=256):
+    """
+    A legjobb `limit` jelölt kiválasztása korlátos heap-pel.
+
+    upper: felső korlát jelöltenként (upper_bounds)
+    exact_scores(idx): pontos pontszám a megadott jelölt indexekre (vektorizált)
+    A jelölteket felső korlát szerint csökkenő sorrendben, blokkonként pontozzuk;
+    ha a hátralévők korlátja a heap legrosszabb eleme alatt van, megállunk.
+    Egyenlő pontszámnál a kisebb index nyer, ugyanúgy, mint a teljes rendezésnél.
+    Visszaadja: (indexek, pontszámok) pontszám szerint csökkenő sorrendben
+    """
+    order = np.argsort(-upper, kind="stable")
+    heap = []  # (pontszám, -index) min-heap
+    for start in range(0, len(order), block):
+        chunk = order[start:start + block]
+        if len(heap) == limit and upper[chunk[0]] < heap[0][0]:
+            break
+        for i, score in zip(chunk.tolist(), exact_scores(chunk).tolist()):
+            item = (score, -i)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    best = sorted(heap, reverse=True)
+    return [-i for _, i in best], [score for score, _ in best]
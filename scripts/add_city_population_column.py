@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# Adds the population column to the city table if missing and fills it from the
+# geonames dump (cities1000.txt, the same file scripts/database_upload.py loads;
+# City.id is the geonameid, population is the 15th column).
+import argparse
+import csv
+
+from sqlalchemy import inspect, text
+
+from extensions import db
+from geocoder import geocoder
+from main import app
+from models import City
+
+BATCH = 5000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add and backfill city.population')
+    parser.add_argument('--file', default='cities1000.txt', help='geonames cities dump')
+    args = parser.parse_args()
+
+    with app.app_context():
+        columns = [c["name"] for c in inspect(db.engine).get_columns("city")]
+        if "population" not in columns:
+            print("Adding city.population")
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE city ADD COLUMN population BIGINT"))
+
+        known = {cid for (cid,) in db.session.query(City.id)}
+        updated, batch = 0, []
+        with open(args.file, encoding="utf-8") as f:
+            for row in csv.reader(f, delimiter="\t"):
+                geonameid = int(row[0])
+                if geonameid not in known:
+                    continue
+                batch.append({"id": geonameid, "population": int(row[14] or 0)})
+                if len(batch) >= BATCH:
+                    db.session.bulk_update_mappings(City, batch)
+                    db.session.commit()
+                    updated += len(batch)
+                    batch = []
+        if batch:
+            db.session.bulk_update_mappings(City, batch)
+            db.session.commit()
+            updated += len(batch)
+        geocoder.invalidate_snapshot()  # population decides between same-name cities
+        print(f"Done — population set for {updated} cities.")
+
+
+if __name__ == '__main__':
+    main()
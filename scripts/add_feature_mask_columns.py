@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# Adds the *_mask columns (vehicle type / structure / equipment / securement bitmasks)
+# to the cargo and vehicle tables if missing, then backfills them from the text fields.
+from sqlalchemy import inspect, text
+
+from extensions import db
+from main import app
+from models import Cargo, Vehicle
+from scoring import FEATURE_FIELDS, feature_mask
+
+MASK_COLUMNS = [f"{field}_mask" for field in FEATURE_FIELDS]
+BATCH = 1000
+
+
+def add_columns(table):
+    existing = {c["name"] for c in inspect(db.engine).get_columns(table)}
+    missing = [name for name in MASK_COLUMNS if name not in existing]
+    if not missing:
+        print(f"{table}: mask columns already exist")
+        return
+    with db.engine.begin() as conn:
+        for name in missing:
+            print(f"Adding {table}.{name}")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} INTEGER DEFAULT 0"))
+
+
+def backfill(model, pk):
+    rows = db.session.query(getattr(model, pk), *[getattr(model, field) for field in FEATURE_FIELDS]).all()
+    for start in range(0, len(rows), BATCH):
+        mappings = [
+            {pk: row[0], **{f"{field}_mask": feature_mask(field, value) for field, value in zip(FEATURE_FIELDS, row[1:])}}
+            for row in rows[start:start + BATCH]
+        ]
+        db.session.bulk_update_mappings(model, mappings)
+        db.session.commit()
+    print(f"{model.__tablename__}: {len(rows)} rows backfilled")
+
+
+def main():
+    with app.app_context():
+        add_columns(Cargo.__tablename__)
+        add_columns(Vehicle.__tablename__)
+        backfill(Cargo, "cargo_id")
+        backfill(Vehicle, "vehicle_id")
+        print("Done — restart the app (or the matching service) to rebuild the indexes.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# Adds the route_polyline column to the vehicle table if missing.
+from sqlalchemy import inspect, text
+
+from extensions import db
+from main import app
+
+
+def main():
+    with app.app_context():
+        columns = [c["name"] for c in inspect(db.engine).get_columns("vehicle")]
+        if "route_polyline" in columns:
+            print("vehicle.route_polyline already exists")
+            return
+
+        print("Adding vehicle.route_polyline")
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE vehicle ADD COLUMN route_polyline TEXT"))
+        print("Done — column added. Existing vehicles get a polyline on their next save.")
+
+
+if __name__ == '__main__':
+    main()
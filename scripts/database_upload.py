@@ -2,6 +2,7 @@ import csv
 from extensions import db
 from models import City, AlterName
 from main import app
+from geocoder import geocoder
 
 BATCH_SIZE = 5000  # egyszerre hány rekordot commit-olunk
 
@@ -23,6 +24,7 @@ with app.app_context():
             lat = float(row[4])
             lon = float(row[5])
             country_code = row[8]
+            population = int(row[14] or 0)
 
             city = City(
                 id=geonameid,
@@ -30,7 +32,8 @@ with app.app_context():
                 latitude=lat,
                 longitude=lon,
                 zipcode=0,
-                country_code=country_code
+                country_code=country_code,
+                population=population
             )
             cities_batch.append(city)
 
@@ -74,4 +77,5 @@ with app.app_context():
             db.session.commit()
             print(f"All {j} alternate names committed ✅")
 
+    geocoder.invalidate_snapshot()  # a következő indulás a friss táblákból épít
     print("GeoNames data imported 🚀")
@@ -2,6 +2,7 @@ import csv
 from extensions import db
 from models import City, CityZipcode
 from main import app
+from geocoder import geocoder
 
 ALLCOUNTRIES_FILE = "./allCountries.txt"  # GeoNames postal code dump
 
@@ -53,6 +54,7 @@ def update_zipcodes_from_file():
 
             # végső commit a maradékra
             db.session.commit()
+            geocoder.invalidate_snapshot()  # a geokódoló irányítószámai is változtak
             print(f"Kész! Összesen {updated_cities} város frissítve, {new_zipcodes} új ZIP kód került a CityZipcode táblába.")
 
 
@@ -471,6 +471,21 @@ function showNotification(data) {
 
 socket.on('new_offer', function(data) { showNotification(data); });
 
+// Új rakomány egy feliratkozott útvonalon (subscription_index.py)
+socket.on('lane_alert', function(data) {
+    const $notif = $(`
+        <div class="offer-notification">
+            <a href="/shipments">
+                <div><b>Új rakomány</b> a figyelt útvonalon:</div>
+                <div>${data.pickup_city || '-'} (${data.pickup_country || ''}) → ${data.dropoff_city || '-'} (${data.dropoff_country || ''})</div>
+                <div>${data.pickup_date || ''}${data.weight ? ' · ' + data.weight + ' t' : ''}</div>
+            </a>
+        </div>
+    `);
+    $('body').append($notif);
+    setTimeout(() => $notif.fadeOut(1000, () => $notif.remove()), 10000);
+});
+
 // Stackelt toast konténer
 if($('#toast-container').length === 0){
     $('body').append('<div id="toast-container" style="position:fixed; top:10px; right:10px; z-index:3000; display:flex; flex-direction:column; gap:10px;"></div>');
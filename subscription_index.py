@@ -0,0 +1,227 @@
+# subscription_index.py
+"""
+Fuvarozói lane feliratkozások (LaneSubscription) indexe: új rakománynál a feliratkozók
+kiválasztása a predikátumok indexén keresztül, nem a feliratkozások végigjárásával.
+
+Predikátumonként egy-egy index, a rakomány ezekben néhány lookuppal keres,
+az eredmény a halmazok metszete:
+- felrakó / lerakó terület: ország -> {id} (egész ország), (ország, település) -> {id},
+  sugaras területnél AREA_GRID_DEG fokos rács cella -> {id} + pontos haversine ellenőrzés
+- felrakási dátum ablak: AvailabilityIndex (rendezett kezdőpontok), ablak nélkül külön halmaz
+- járműtípus: típus -> {id}, típus nélkül külön halmaz
+
+A találatok user_{id} szobájába "lane_alert" Socket.IO esemény megy (publish_new_cargo).
+"""
+import math
+import threading
+from collections import defaultdict
+
+from extensions import db, socketio
+from models import LaneSubscription
+from availability_index import AvailabilityIndex
+from route_index import city_key
+from matching import cargo_stops, cargo_match_dict
+from match_stream import jsonable_match
+from geo import haversine, bounding_box
+
+AREA_GRID_DEG = 0.5  # sugaras területek rácsa (~55 km), egy terület néhány tucat cella
+
+
+def _area_cell(lat, lon):
+    return int(math.floor(lat / AREA_GRID_DEG)), int(math.floor(lon / AREA_GRID_DEG))
+
+
+def _circle_cells(lat, lon, km):
+    """A km sugarú kör befoglaló téglalapját lefedő cellák"""
+    lat_min, lat_max, lon_min, lon_max = bounding_box(lat, lon, km)
+    (i0, j0), (i1, j1) = _area_cell(lat_min, lon_min), _area_cell(lat_max, lon_max)
+    return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+
+class _AreaIndex:
+    """Egy oldal (felrakó vagy lerakó) terület predikátumai"""
+    def __init__(self):
+        self.by_country = defaultdict(set)  # ország -> {id}, település nélküli feliratkozás
+        self.by_city = defaultdict(set)     # (ország, település) -> {id}
+        self.by_cell = defaultdict(set)     # rács cella -> {id}, sugaras terület
+        self.circles = {}                   # id -> (lat, lon, sugár km)
+        self._postings = {}                 # id -> [(index, kulcs)], törléshez
+
+    def clear(self):
+        self.by_country.clear()
+        self.by_city.clear()
+        self.by_cell.clear()
+        self.circles.clear()
+        self._postings.clear()
+
+    def add(self, sub_id, country, city, radius_km, lat, lon):
+        postings = []
+        country, city = city_key(country, city)
+        if not city:
+            postings.append((self.by_country, country))
+        else:
+            postings.append((self.by_city, (country, city)))
+            if radius_km and lat is not None and lon is not None:
+                self.circles[sub_id] = (lat, lon, radius_km)
+                postings.extend((self.by_cell, cell) for cell in _circle_cells(lat, lon, radius_km))
+        for index, key in postings:
+            index[key].add(sub_id)
+        self._postings[sub_id] = postings
+
+    def remove(self, sub_id):
+        self.circles.pop(sub_id, None)
+        for index, key in self._postings.pop(sub_id, ()):
+            bucket = index.get(key)
+            if bucket is None:
+                continue
+            bucket.discard(sub_id)
+            if not bucket:
+                del index[key]
+
+    def matching(self, country, city, coords):
+        """Feliratkozások, amelyek területére a hely esik"""
+        country, city = city_key(country, city)
+        result = set(self.by_country.get(country, ())) | self.by_city.get((country, city), set())
+        if coords:
+            for sub_id in self.by_cell.get(_area_cell(*coords), ()):
+                lat, lon, radius_km = self.circles[sub_id]
+                if haversine(lat, lon, coords[0], coords[1]) <= radius_km:
+                    result.add(sub_id)
+        return result
+
+
+class SubscriptionIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._origins = _AreaIndex()
+        self._destinations = _AreaIndex()
+        self._dates = AvailabilityIndex()     # id -> [date_from, date_until] ablak
+        self._undated = set()                 # ablak nélküli feliratkozások
+        self._by_type = defaultdict(set)      # járműtípus (kisbetűs) -> {id}
+        self._any_type = set()                # típus nélküli feliratkozások
+        self._owners = {}                     # id -> (user_id, company_id)
+        self._built = False
+
+    # ------------------------------------------------------------------
+    # Betöltés / karbantartás
+    # ------------------------------------------------------------------
+    def build(self):
+        subs = LaneSubscription.query.filter(LaneSubscription.active == True).all()
+        with self._lock:
+            self._origins.clear()
+            self._destinations.clear()
+            self._dates.clear()
+            self._undated.clear()
+            self._by_type.clear()
+            self._any_type.clear()
+            self._owners.clear()
+            for sub in subs:
+                self._add(sub)
+            self._built = True
+        print(f"[LOG] SubscriptionIndex felépítve: {len(subs)} aktív feliratkozás")
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    def refresh(self, sub_id):
+        """Egy feliratkozás újraindexelése mentés / módosítás után"""
+        if not self._built:
+            self.ensure_built()
+            return
+        sub = db.session.get(LaneSubscription, sub_id)
+        with self._lock:
+            self.remove(sub_id)
+            if sub is not None and sub.active:
+                self._add(sub)
+
+    def remove(self, sub_id):
+        with self._lock:
+            self._origins.remove(sub_id)
+            self._destinations.remove(sub_id)
+            self._dates.remove(sub_id)
+            self._undated.discard(sub_id)
+            self._any_type.discard(sub_id)
+            for vehicle_type in [t for t, ids in self._by_type.items() if sub_id in ids]:
+                self._by_type[vehicle_type].discard(sub_id)
+                if not self._by_type[vehicle_type]:
+                    del self._by_type[vehicle_type]
+            self._owners.pop(sub_id, None)
+
+    def _add(self, sub):
+        """A lock-ot a hívó tartja."""
+        self._origins.add(sub.id, sub.origin_country, sub.origin_city, sub.origin_radius_km,
+                          sub.origin_lat, sub.origin_lon)
+        self._destinations.add(sub.id, sub.destination_country, sub.destination_city, sub.destination_radius_km,
+                               sub.destination_lat, sub.destination_lon)
+        if sub.date_from or sub.date_until:
+            # csak záró dátumnál a kezdet a feliratkozás napja (múltbeli felrakásra nem kérünk értesítést)
+            date_from = sub.date_from or (sub.created_at.date() if sub.created_at else sub.date_until)
+            self._dates.upsert(sub.id, date_from, sub.date_until)
+        else:
+            self._undated.add(sub.id)
+        if sub.vehicle_type:
+            self._by_type[sub.vehicle_type.strip().lower()].add(sub.id)
+        else:
+            self._any_type.add(sub.id)
+        self._owners[sub.id] = (sub.user_id, sub.company_id)
+
+    # ------------------------------------------------------------------
+    # Lekérdezés
+    # ------------------------------------------------------------------
+    def match(self, pickup, dropoff, start_date, vehicle_type):
+        """
+        A rakományra illeszkedő feliratkozások.
+        pickup, dropoff: (ország, település, (lat, lon) vagy None)
+        start_date: felrakási dátum (None -> a dátum ablak nem szűr)
+        """
+        self.ensure_built()
+        with self._lock:
+            result = self._origins.matching(*pickup)
+            if result:
+                result &= self._destinations.matching(*dropoff)
+            if result and start_date:
+                result &= self._undated | self._dates.available_near(start_date, 0)
+            if result:
+                result &= self._any_type | self._by_type.get((vehicle_type or "").strip().lower(), set())
+            return result
+
+    def owner(self, sub_id):
+        return self._owners.get(sub_id, (None, None))
+
+
+# process-szintű példány
+subscription_index = SubscriptionIndex()
+
+
+def publish_new_cargo(cargo):
+    """
+    Új rakomány kiértékelése a feliratkozásokra; feliratkozónként egy "lane_alert" esemény.
+    A feladó cég saját feliratkozásai nem kapnak értesítést.
+    Visszaadja: az értesített felhasználók száma
+    """
+    pickups, dropoffs = cargo_stops(cargo)
+    if not pickups or not dropoffs:
+        return 0
+    pickup, dropoff = pickups[0], dropoffs[-1]
+
+    def place(loc):
+        coords = (loc.latitude, loc.longitude) if loc.latitude is not None and loc.longitude is not None else None
+        return loc.country, loc.city, coords
+
+    by_user = {}
+    for sub_id in subscription_index.match(place(pickup), place(dropoff), pickup.start_date, cargo.vehicle_type):
+        user_id, company_id = subscription_index.owner(sub_id)
+        if user_id is None or (company_id and company_id == cargo.company_id):
+            continue
+        by_user.setdefault(user_id, []).append(sub_id)
+    if not by_user:
+        return 0
+
+    payload = jsonable_match(cargo_match_dict(cargo, None))
+    for user_id, sub_ids in by_user.items():
+        socketio.emit("lane_alert", dict(payload, subscription_ids=sorted(sub_ids)), room=f"user_{user_id}")
+    print(f"[LOG] Lane alert: cargo={cargo.cargo_id}, {len(by_user)} felhasználó értesítve")
+    return len(by_user)
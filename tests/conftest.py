@@ -0,0 +1,60 @@
+# tests/conftest.py
+"""
+Közös fixture-ök: minimális Flask app memóriabeli SQLite-tal.
+
+A main.py-t szándékosan nem importáljuk (blueprintek, ütemező, socketio), csak a
+db-t és a modelleket, így az indexek / cache-ek önállóan tesztelhetők.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extensions import db  # noqa: E402
+import models  # noqa: E402,F401  (a táblák regisztrálása a create_all előtt)
+
+
+@contextmanager
+def _app_context():
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI="sqlite://",
+        # egy közös kapcsolat: a session és a db.engine ugyanazt a memóriabeli adatbázist látja
+        SQLALCHEMY_ENGINE_OPTIONS={"poolclass": StaticPool, "connect_args": {"check_same_thread": False}},
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def app():
+    with _app_context() as app:
+        yield app
+
+
+@pytest.fixture(scope="module")
+def synthetic_app():
+    """Szintetikus járművek / rakományok (benchmarks.synthetic), felépített process-szintű indexekkel"""
+    from benchmarks.synthetic import SyntheticData
+    from city_index import city_index
+    from radius_cache import radius_cache
+    from route_index import route_index
+    from cargo_index import cargo_index
+
+    with _app_context() as app:
+        SyntheticData(300, 200, seed=7).load()
+        city_index.build()
+        radius_cache.clear()
+        route_index.build()
+        cargo_index.build()
+        yield app
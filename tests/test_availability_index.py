@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+from availability_index import AvailabilityIndex
+
+DAY = date(2026, 5, 4)
+
+
+def test_available_near_open_and_bounded_windows():
+    index = AvailabilityIndex()
+    index.upsert(1, DAY, DAY + timedelta(days=2))
+    index.upsert(2, DAY - timedelta(days=30), None)
+    index.upsert(3, DAY + timedelta(days=20), DAY + timedelta(days=25))
+    index.upsert(4, None, None)
+
+    assert index.available_near(DAY, slack_days=3) == {1, 2}
+    assert index.available_near(None) == set()
+    assert len(index) == 3
+
+
+def test_max_length_shrinks_after_remove():
+    index = AvailabilityIndex()
+    index.upsert(1, DAY - timedelta(days=100), DAY - timedelta(days=90))
+    index.upsert(2, DAY - timedelta(days=1), DAY + timedelta(days=1))
+    index.upsert(3, DAY - timedelta(days=2), DAY)
+    assert index._max_length == 10
+
+    index.remove(1)
+    assert index._max_length == 2
+    assert index.available_near(DAY, slack_days=0) == {2, 3}
+
+    # újra-upsert rövidebb ablakkal: a régi hossz nem marad bent
+    index.upsert(2, DAY, DAY)
+    assert index._max_length == 2
+    index.remove(3)
+    assert index._max_length == 0
+    assert index.available_near(DAY, slack_days=0) == {2}
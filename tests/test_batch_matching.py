@@ -0,0 +1,60 @@
+import pickle
+from datetime import date
+
+import numpy as np
+
+from batch_matching import MatchSnapshot
+from cargo_index import cargo_index
+from extensions import db
+from matching import score_cargo
+from models import Cargo
+from scoring import NO_DATE
+
+
+def _in_process(cargo, snapshot):
+    """score_cargo eredménye a snapshotban szereplő (nem lejárt) járművekre szűkítve"""
+    kept = set(snapshot.columns["vehicle_id"].tolist())
+    return sorted((m.item_id, m.score) for m in score_cargo(cargo) if m.item_id in kept)
+
+
+def _from_snapshot(snapshot, entry):
+    scored = snapshot.score_entry(entry)
+    if scored is None:
+        return []
+    vehicle_ids, location, time_points, capacity, detour = scored
+    return sorted(zip(vehicle_ids.tolist(), (location + time_points + capacity + detour).tolist()))
+
+
+def test_snapshot_scores_match_in_process_scoring(synthetic_app):
+    snapshot = MatchSnapshot.from_indexes()
+    matched = 0
+    for entry in cargo_index.open_entries():
+        expected = _in_process(db.session.get(Cargo, entry.cargo_id), snapshot)
+        assert _from_snapshot(snapshot, entry) == expected, entry.cargo_id
+        matched += bool(expected)
+    assert matched > 0
+
+
+def test_available_near_without_date(synthetic_app):
+    snapshot = MatchSnapshot.from_indexes()
+    vehicle_ids = snapshot.columns["vehicle_id"][:5]
+    assert snapshot.available_near(vehicle_ids, NO_DATE, 3).tolist() == [False] * 5
+    assert len(snapshot.available_near(np.empty(0, dtype=np.int64), NO_DATE, 3)) == 0
+
+
+def test_available_near_matches_window(synthetic_app):
+    snapshot = MatchSnapshot.from_indexes()
+    vehicle_ids = snapshot.columns["vehicle_id"]
+    day = date.today().toordinal()
+    start, end = snapshot.columns["available_from"], snapshot.columns["available_until"]
+    expected = (start != NO_DATE) & (start <= day + 1) & ((end == NO_DATE) | (end >= day - 1))
+    assert snapshot.available_near(vehicle_ids, day, 1).tolist() == expected.tolist()
+    # ismeretlen jármű: nincs ablaka
+    assert snapshot.available_near([10 ** 9], day, 1).tolist() == [False]
+
+
+def test_snapshot_survives_pickling_for_workers(synthetic_app):
+    snapshot = MatchSnapshot.from_indexes()
+    copy = pickle.loads(pickle.dumps(snapshot))
+    for entry in cargo_index.open_entries()[:50]:
+        assert _from_snapshot(copy, entry) == _from_snapshot(snapshot, entry)
@@ -0,0 +1,61 @@
+from corridor_index import CorridorIndex, CorridorArrays
+from polyline import encode_polyline
+
+# Budapest -> Győr -> Szeged -> Budapest: Budapest mellett kétszer halad el (elején és végén)
+BUDAPEST, GYOR, SZEGED = (47.4979, 19.0402), (47.6875, 17.6504), (46.2530, 20.1414)
+KECSKEMET = ((SZEGED[0] + BUDAPEST[0]) / 2, (SZEGED[1] + BUDAPEST[1]) / 2)   # a Szeged -> Budapest szakaszon
+ROUND_TRIP = encode_polyline([list(BUDAPEST), list(GYOR), list(SZEGED), list(BUDAPEST)])
+ONE_WAY = encode_polyline([list(BUDAPEST), list(SZEGED)])
+
+
+def _index():
+    index = CorridorIndex()
+    index.upsert(1, ROUND_TRIP)
+    index.upsert(2, ONE_WAY)
+    return index
+
+
+def test_repeated_stop_uses_later_pass():
+    index = _index()
+    # Győr -> Budapest: csak a második budapesti áthaladás van Győr után
+    assert index.ordered_points([GYOR, BUDAPEST]) == {1}
+    assert index.vehicle_points(1, [GYOR, BUDAPEST])
+    assert index.ordered_points([BUDAPEST, GYOR, SZEGED, KECSKEMET, BUDAPEST]) == {1}
+    assert index.vehicle_points(1, [BUDAPEST, GYOR, SZEGED, KECSKEMET, BUDAPEST])
+
+
+def test_repeated_stop_advances_past_later_stops():
+    index = _index()
+    # Szeged -> Budapest után Kecskemét már nem következik: a budapesti megálló csak a
+    # második áthaladás lehet, ami Kecskemét után van
+    assert index.ordered_points([SZEGED, BUDAPEST, KECSKEMET]) == set()
+    assert not index.vehicle_points(1, [SZEGED, BUDAPEST, KECSKEMET])
+    assert index.ordered_points([SZEGED, KECSKEMET, BUDAPEST]) == {1}
+
+
+def test_wrong_order_is_rejected():
+    index = _index()
+    assert index.ordered_points([SZEGED, GYOR]) == set()
+    assert not index.vehicle_points(1, [KECSKEMET, GYOR])
+    assert index.ordered_points([BUDAPEST, SZEGED]) == {1, 2}
+    assert not index.vehicle_points(2, [SZEGED, BUDAPEST])
+
+
+def test_remove_drops_vehicle():
+    index = _index()
+    index.remove(1)
+    assert index.ordered_points([GYOR, BUDAPEST]) == set()
+    assert len(index) == 1
+
+
+def test_compact_arrays_answer_like_the_index():
+    index = _index()
+    arrays = CorridorArrays(index.compact())
+    assert len(arrays) == 2
+    for points in ([GYOR, BUDAPEST], [SZEGED, BUDAPEST, KECSKEMET], [BUDAPEST, SZEGED], [KECSKEMET, GYOR]):
+        assert arrays.ordered_points(points) == index.ordered_points(points)
+        for vid in (1, 2):
+            assert arrays.vehicle_points(vid, points) == index.vehicle_points(vid, points)
+    assert arrays.vehicle_cells(1) == index.vehicle_cells(1)
+    assert arrays.endpoints(2) == index.endpoints(2)
+    assert arrays.endpoints(3) is None and not arrays.vehicle_points(3, [GYOR, BUDAPEST])
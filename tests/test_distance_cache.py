@@ -0,0 +1,59 @@
+import pytest
+
+from distance_cache import DistanceCache, DistanceArrays, ROAD_FACTOR, _haversine
+
+BUDAPEST, GYOR, SZEGED = ("HU", "Budapest"), ("HU", "Győr"), ("HU", "Szeged")
+COORDS = {BUDAPEST: (47.4979, 19.0402), GYOR: (47.6875, 17.6504), SZEGED: (46.2530, 20.1414)}
+
+
+def _cache():
+    cache = DistanceCache()
+    for key, coords in COORDS.items():
+        cache.set_coords(key, coords)
+    cache.record_road(BUDAPEST, GYOR, 121.0)
+    return cache
+
+
+def test_arrays_match_cache_distances_and_detour():
+    cache = _cache()
+    arrays = DistanceArrays(*cache.compact([("AT", "Wien")]))
+    assert arrays.distance(GYOR, BUDAPEST) == 121.0
+    assert arrays.distance(BUDAPEST, SZEGED) == pytest.approx(cache.distance(BUDAPEST, SZEGED))
+    assert arrays.detour(BUDAPEST, GYOR, SZEGED, BUDAPEST) == pytest.approx(cache.detour(BUDAPEST, GYOR, SZEGED, BUDAPEST))
+    # ismert kulcs koordináta nélkül / ismeretlen kulcs
+    assert arrays.ref(("AT", "Wien")) >= 0 and arrays.distance(("AT", "Wien"), BUDAPEST) is None
+    assert arrays.ref(("AT", "Graz")) == -1 and arrays.ref(None) == -1
+
+
+def test_arrays_estimate_is_not_stored_and_local_coords_are_used():
+    arrays = DistanceArrays(*_cache().compact())
+    pairs = len(arrays)
+    arrays.distance(GYOR, SZEGED)
+    assert len(arrays) == pairs
+
+    pecs = ("HU", "Pécs")
+    assert arrays.distance(pecs, BUDAPEST) is None
+    arrays.set_coords(pecs, (46.0727, 18.2323))
+    assert arrays.has_coords(pecs)
+    assert arrays.distance(pecs, BUDAPEST) == pytest.approx(
+        _haversine((46.0727, 18.2323), COORDS[BUDAPEST]) * ROAD_FACTOR)
+
+
+def test_only_road_distances_are_persisted(app):
+    from models import CityDistance
+
+    cache = _cache()
+    estimate = cache.distance(GYOR, SZEGED)
+    assert estimate == pytest.approx(_haversine(COORDS[GYOR], COORDS[SZEGED]) * ROAD_FACTOR)
+    assert cache.flush() == 1
+    rows = CityDistance.query.all()
+    assert [(r.from_city, r.to_city, r.km, r.source) for r in rows] == [("Budapest", "Győr", 121.0, "road")]
+
+    # a becslés nem kerül függőbe, a következő flush üres
+    cache.distance(BUDAPEST, SZEGED)
+    assert cache.flush() == 0
+
+    fresh = DistanceCache()
+    fresh.load()
+    assert fresh.distance(GYOR, BUDAPEST) == 121.0
+    assert fresh.distance(GYOR, SZEGED) is None
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+from sqlalchemy import select, update
+
+import geocache as gc
+from extensions import db
+from geocache import GeocodeCacheStore, query_key
+from models import GeocodeCache
+
+
+class Fetch:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def _rows():
+    table = GeocodeCache.__table__
+    with db.engine.connect() as conn:
+        return conn.execute(select(table.c.query_key, table.c.payload, table.c.expires_at)).all()
+
+
+def _expire_everything(store):
+    past = datetime.now() - timedelta(seconds=1)
+    with store._lock:
+        for key, (_, value) in list(store._entries.items()):
+            store._entries[key] = (past, value)
+    with db.engine.begin() as conn:
+        conn.execute(update(GeocodeCache.__table__).values(expires_at=past))
+
+
+def test_query_key_is_normalized():
+    assert query_key("Stuttgart", "de") == query_key(" stuttgart ", "DE")
+    assert query_key("x", None) == "x|"
+    assert len(query_key("a" * 300)) == gc.MAX_KEY_LEN
+
+
+def test_positive_hit_is_served_from_memory_then_db(app):
+    store = GeocodeCacheStore()
+    fetch = Fetch((47.5, 19.04))
+    key = query_key("Budapest", "HU")
+    assert store.cached("geonames_search", key, fetch) == [47.5, 19.04]
+    assert store.cached("geonames_search", key, fetch) == [47.5, 19.04]
+    store.clear()
+    assert store.cached("geonames_search", key, fetch) == [47.5, 19.04]
+    assert fetch.calls == 1
+    assert (store.stats["miss"], store.stats["memory"], store.stats["db"]) == (1, 1, 1)
+    (row,) = _rows()
+    assert row.expires_at > datetime.now() + gc.POSITIVE_TTL - timedelta(minutes=1)
+
+
+def test_negative_result_is_cached_with_short_ttl(app):
+    store = GeocodeCacheStore()
+    fetch = Fetch(None)
+    key = query_key("Nincsilyen", "HU")
+    assert store.cached("nominatim", key, fetch) is None
+    store.clear()
+    assert store.cached("nominatim", key, fetch) is None
+    assert fetch.calls == 1 and store.stats["negative"] == 1
+    (row,) = _rows()
+    assert row.payload is None
+    assert row.expires_at <= datetime.now() + gc.NEGATIVE_TTL
+
+
+def test_expired_entries_are_fetched_again(app):
+    store = GeocodeCacheStore()
+    fetch = Fetch(None, {"lat": 1.0})
+    key = query_key("Később", "HU")
+    assert store.cached("nominatim", key, fetch) is None
+    _expire_everything(store)
+    assert store.cached("nominatim", key, fetch) == {"lat": 1.0}
+    assert fetch.calls == 2
+    assert len(_rows()) == 1   # a lejárt sor cserélődik, nem duplikálódik
+
+    _expire_everything(store)
+    assert store.purge_expired() == 1
+    assert _rows() == []
+
+
+def test_fetch_exception_is_not_cached(app):
+    store = GeocodeCacheStore()
+    fetch = Fetch(TimeoutError("timeout"), (1.0, 2.0))
+    key = query_key("Hálózat", "HU")
+    with pytest.raises(TimeoutError):
+        store.cached("nominatim", key, fetch)
+    assert len(store) == 0 and _rows() == [] and store.stats["errors"] == 1
+    assert store.cached("nominatim", key, fetch) == [1.0, 2.0]
+    assert fetch.calls == 2
+
+
+def test_without_app_context_only_memory_is_used():
+    store = GeocodeCacheStore(max_entries=2)
+    fetch = Fetch(1, 2, 3)
+    for name in ("a", "b", "c"):
+        store.cached("nominatim", query_key(name), fetch)
+    assert len(store) == 2   # LRU: a legrégebbi kiesik
+    assert store.cached("nominatim", query_key("c"), fetch) == 3
+    assert fetch.calls == 3
+
+
+class _Response:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} hiba", response=self)
+
+    def json(self):
+        return self.payload
+
+
+def test_nominatim_error_status_is_not_cached_as_negative(app, monkeypatch):
+    import utils
+
+    store = GeocodeCacheStore()
+    monkeypatch.setattr(utils, "geocache", store)
+    responses = [_Response(429), _Response(503), _Response(200, []), _Response(200, [{"lat": "1", "lon": "2"}])]
+    monkeypatch.setattr(utils.requests, "get", lambda *args, **kwargs: responses.pop(0))
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            utils.nominatim_search("HU", "Sehol", "1234")
+    assert len(store) == 0 and _rows() == [] and store.stats["errors"] == 2
+
+    # a valódi üres válasz már negatív találat, a következő hívás nem megy ki
+    assert utils.nominatim_search("HU", "Sehol", "1234") is None
+    assert utils.nominatim_search("HU", "Sehol", "1234") is None
+    assert len(responses) == 1 and store.stats["negative"] >= 1
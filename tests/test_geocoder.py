@@ -0,0 +1,50 @@
+from extensions import db
+from geocoder import OfflineGeocoder
+from models.city import City, CityZipcode
+
+
+def _city(city_id, name, lat, lon, population=0):
+    return City(id=city_id, city_name=name, ascii_name=name, country_code="HU", latitude=lat, longitude=lon,
+                population=population)
+
+
+def _built(path):
+    geocoder = OfflineGeocoder(str(path))
+    geocoder.build()
+    return geocoder
+
+
+def test_snapshot_is_reused_until_rows_change_in_place(app, tmp_path):
+    path = tmp_path / "geocoder.pkl"
+    db.session.add_all([_city(1, "Győr", 47.6875, 17.6504, 130000), _city(2, "Szeged", 46.2530, 20.1414, 160000)])
+    db.session.add(CityZipcode(id=1, city_id=1, zipcode="9000"))
+    db.session.commit()
+    assert _built(path).lookup("HU", "gyor").latitude == 47.6875
+    saved = path.stat().st_mtime_ns
+
+    # változatlan adat: a snapshotból töltődik, nem íródik újra
+    assert _built(path).lookup("HU", "Győr").zipcode == "9000"
+    assert path.stat().st_mtime_ns == saved
+
+    # helyben módosított koordináta / irányítószám (a sorszám és a max id nem változik)
+    db.session.get(City, 1).latitude = 47.7
+    db.session.get(CityZipcode, 1).zipcode = "9001"
+    db.session.commit()
+    hit = _built(path).lookup("HU", "Győr")
+    assert (hit.latitude, hit.zipcode) == (47.7, "9001")
+
+    # átnevezés: a sorszám és a max id itt sem változik
+    db.session.get(City, 1).city_name = "Sopron"
+    db.session.commit()
+    assert _built(path).lookup("HU", "Sopron").city_id == 1
+
+
+def test_invalidate_snapshot(app, tmp_path):
+    path = tmp_path / "geocoder.pkl"
+    db.session.add(_city(1, "Pécs", 46.0727, 18.2323))
+    db.session.commit()
+    geocoder = _built(path)
+    assert path.exists()
+    geocoder.invalidate_snapshot()
+    assert not path.exists()
+    geocoder.invalidate_snapshot()   # nincs mit törölni
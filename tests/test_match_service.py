@@ -0,0 +1,139 @@
+import os
+import socket
+import threading
+import time
+from datetime import date
+from multiprocessing import Pipe
+
+import numpy as np
+import pytest
+
+import match_service
+from batch_matching import MatchSnapshot
+from cargo_index import cargo_index
+from extensions import db
+from match_store import _without_expired_vehicles
+from match_service import MatchService, write_snapshot, load_snapshot, current_version, request
+from matching import ScoredMatch, score_vehicle
+from models import Vehicle
+
+
+def _scores(snapshot, entry):
+    scored = snapshot.score_entry(entry)
+    if scored is None:
+        return []
+    vehicle_ids, location, time_points, capacity, detour = scored
+    return sorted(zip(vehicle_ids.tolist(), (location + time_points + capacity + detour).tolist()))
+
+
+def test_written_snapshot_is_mmapped_and_scores_the_same(synthetic_app, tmp_path):
+    snapshot = MatchSnapshot.from_indexes()
+    version = write_snapshot(snapshot, str(tmp_path))
+    assert current_version(str(tmp_path)) == version
+
+    files = os.listdir(tmp_path / version)
+    assert not [name for name in files if name.endswith(".pkl")]
+    assert "corridor.cell_keys.npy" in files and "distances.pair_codes.npy" in files
+
+    loaded = load_snapshot(version, str(tmp_path))
+    assert isinstance(loaded.corridor.arrays["lats"], np.memmap)
+    assert isinstance(loaded.distances.arrays["km"], np.memmap)
+    assert isinstance(loaded.columns["origin_ref"], np.memmap)
+
+    for entry in cargo_index.open_entries():
+        assert _scores(loaded, entry) == _scores(snapshot, entry), entry.cargo_id
+
+
+def test_snapshot_versions_advance(synthetic_app, tmp_path):
+    snapshot = MatchSnapshot.from_indexes()
+    first = write_snapshot(snapshot, str(tmp_path))
+    second = write_snapshot(snapshot, str(tmp_path))
+    assert (first, second) == ("v000001", "v000002")
+    assert current_version(str(tmp_path)) == second
+
+
+@pytest.fixture(autouse=True)
+def _authkey(monkeypatch):
+    monkeypatch.setattr(match_service, "SERVICE_AUTHKEY", b"teszt-kulcs-0123456789")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_listener(address):
+    for _ in range(100):
+        try:
+            socket.create_connection(address, timeout=1).close()   # a listener hibaként eldobja
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+
+
+def test_answer_scores_vehicle_with_service_indexes(synthetic_app):
+    vehicle = next(v for v in Vehicle.query.order_by(Vehicle.vehicle_id) if score_vehicle(v))
+    service_end, worker_end = Pipe()
+    MatchService(synthetic_app).answer("score_vehicle", vehicle.vehicle_id, service_end)
+    status, result = worker_end.recv()
+    assert status == "ok"
+    assert result == score_vehicle(vehicle)
+
+    service_end, worker_end = Pipe()
+    MatchService(synthetic_app).answer("nincs_ilyen", 1, service_end)
+    assert worker_end.recv()[0] == "error"
+
+
+def test_worker_score_vehicle_goes_through_the_service(synthetic_app, monkeypatch):
+    monkeypatch.setattr(match_service, "SERVICE_ADDRESS", ("127.0.0.1", _free_port()))
+    service = MatchService(synthetic_app)
+    threading.Thread(target=service._listen, daemon=True).start()
+
+    reply = [ScoredMatch(42, 150.0, {"location": 100.0, "time": 40.0, "capacity": 10.0, "detour": 0.0})]
+
+    def serve():
+        kind, item_id, conn = service.events.get(timeout=5)
+        assert (kind, item_id) == ("score_vehicle", 1)
+        conn.send(("ok", reply))
+        conn.close()
+
+    server = threading.Thread(target=serve)
+    server.start()
+    _wait_for_listener(match_service.SERVICE_ADDRESS)
+    monkeypatch.setenv("MATCH_SERVICE", "1")
+    result = score_vehicle(db.session.get(Vehicle, 1))
+    server.join(5)
+    assert result == reply
+
+
+def test_request_without_service_falls_back(monkeypatch):
+    monkeypatch.setattr(match_service, "SERVICE_ADDRESS", ("127.0.0.1", _free_port()))
+    monkeypatch.delenv("MATCH_SERVICE", raising=False)
+    assert request("score_vehicle", 1) is None
+    monkeypatch.setenv("MATCH_SERVICE", "1")
+    assert request("score_vehicle", 1) is None   # nem érhető el
+
+
+def test_expired_filter_without_snapshot_reads_the_database(synthetic_app, monkeypatch, tmp_path):
+    monkeypatch.setattr(match_service, "_shared", match_service.SharedSnapshot(str(tmp_path)))
+    monkeypatch.setenv("MATCH_SERVICE", "1")
+    expired = Vehicle.query.filter(Vehicle.available_until < date.today()).first()
+    live = Vehicle.query.filter(Vehicle.available_until.is_(None)).first()
+    scored = [ScoredMatch(expired.vehicle_id, 1.0, {}), ScoredMatch(live.vehicle_id, 1.0, {})]
+    assert [m.item_id for m in _without_expired_vehicles(scored)] == [live.vehicle_id]
+
+
+def test_service_requires_an_authkey(synthetic_app, monkeypatch):
+    monkeypatch.setattr(match_service, "SERVICE_AUTHKEY", b"")
+    monkeypatch.setattr(match_service, "SERVICE_ADDRESS", ("127.0.0.1", _free_port()))
+    monkeypatch.setenv("MATCH_SERVICE", "1")
+    assert not match_service.enabled()
+    assert match_service.notify("vehicle", 1) is False
+    assert request("score_vehicle", 1) is None
+    with pytest.raises(RuntimeError):
+        MatchService(synthetic_app).run()
+    assert not match_service._in_service
+
+    monkeypatch.setattr(match_service, "SERVICE_AUTHKEY", b"rovid")
+    assert not match_service.enabled()
@@ -0,0 +1,32 @@
+import match_stream
+from extensions import socketio
+
+
+def _capture(monkeypatch):
+    events = []
+    monkeypatch.setattr(socketio, "emit", lambda event, payload, room=None: events.append((event, payload, room)))
+    return events
+
+
+def test_missing_cargo_still_sends_final_event(app, monkeypatch):
+    events = _capture(monkeypatch)
+    match_stream._stream_cargo_matches(app, 12345, 7)
+    assert len(events) == 1
+    event, payload, room = events[0]
+    assert (event, room) == ("cargo_matches", "user_7")
+    assert payload["cargo_id"] == 12345 and payload["final"] is True and payload["matches"] == []
+    assert payload["error"] == match_stream.NOT_FOUND_ERROR
+
+
+def test_scoring_error_is_not_sent_to_the_browser(app, monkeypatch):
+    events = _capture(monkeypatch)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("psycopg2.OperationalError: belső részletek")
+
+    monkeypatch.setattr(match_stream.cargo_index, "refresh_cargo", broken)
+    match_stream._stream_cargo_matches(app, 1, 7)
+    payload = events[-1][1]
+    assert payload["final"] is True
+    assert payload["error"] == match_stream.STREAM_ERROR
+    assert "belső" not in payload["error"]
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+import radius_cache as rc
+from city_index import city_index
+from extensions import db
+from models import City, CityNeighbours, Company
+from radius_cache import radius_cache, ref_key
+
+BUDAPEST = ref_key("HU", "1011", "Budapest")
+CITIES = [
+    ("Budapest", "1011", 47.4979, 19.0402),
+    ("Érd", "2030", 47.3919, 18.9045),
+    ("Vác", "2600", 47.7753, 19.1360),
+    ("Győr", "9021", 47.6875, 17.6504),
+]
+
+
+def _load_cities():
+    db.session.add_all(City(city_name=name, ascii_name=name, zipcode=zipcode, country_code="HU",
+                            latitude=lat, longitude=lon) for name, zipcode, lat, lon in CITIES)
+    db.session.commit()
+    city_index.build()
+    radius_cache.clear()
+
+
+def _stored():
+    table = CityNeighbours.__table__
+    with db.engine.connect() as conn:
+        return conn.execute(select(table.c.city_name, table.c.radius_km)).all()
+
+
+def test_warm_does_not_touch_the_callers_session(app):
+    _load_cities()
+    pending = Company(name="Félkész Kft.")
+    db.session.add(pending)
+    with db.session.no_autoflush:
+        entry = radius_cache.warm({BUDAPEST: 50})[BUDAPEST]
+    assert entry.keys[0] == ("HU", "Budapest") and ("HU", "Győr") not in entry.keys
+
+    # a hívó objektuma függőben maradt: nem commit-olta, nem görgette vissza a cache
+    assert pending in db.session.new
+    db.session.rollback()
+    assert Company.query.count() == 0
+    assert _stored() == [("Budapest", rc.DEFAULT_RADIUS_KM)]
+
+
+def test_warm_reads_back_stored_rows_and_grows_them(app):
+    _load_cities()
+    radius_cache.warm({BUDAPEST: 50})
+    radius_cache.clear()
+    radius_cache.warm({BUDAPEST: 80})
+    assert radius_cache.stats["db"] >= 1
+
+    radius_cache.clear()
+    entry = radius_cache.warm({BUDAPEST: 150})[BUDAPEST]
+    assert ("HU", "Győr") in entry.keys
+    assert _stored() == [("Budapest", 150.0)]
+
+
+def test_store_keeps_the_larger_radius(app):
+    _load_cities()
+    big = radius_cache.warm({BUDAPEST: 150})[BUDAPEST]
+    small = rc.RadiusEntry(100.0, big.city_ids[:1], big.distances[:1], big.keys[:1])
+    rc.RadiusCache._store({BUDAPEST: small})
+    assert _stored() == [("Budapest", 150.0)]
+
+
+def test_insert_without_on_conflict_treats_duplicates_as_present(app):
+    row = {"country_code": "HU", "postcode": "1011", "city_name": "Budapest", "radius_km": 100.0,
+           "city_ids": np.array([1], dtype=np.int32).tobytes(),
+           "distances": np.array([0.0], dtype=np.float32).tobytes(), "updated_at": datetime.now()}
+    rc._insert_or_grow(row)
+    rc._insert_or_grow(dict(row, radius_km=50.0))
+    assert _stored() == [("Budapest", 100.0)]
+    rc._insert_or_grow(dict(row, radius_km=120.0))
+    assert _stored() == [("Budapest", 120.0)]
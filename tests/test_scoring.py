@@ -0,0 +1,66 @@
+import numpy as np
+
+from scoring import route_order_passed, position_bit, features_compatible
+
+
+def _masks(*stops):
+    """Megállónként a jelöltek pozíció listái -> (megállók, jelöltek) bitmaszk tömb; None = ismeretlen (0)"""
+    return np.array([[sum(int(position_bit(p)) for p in positions) if positions is not None else 0
+                      for positions in stop] for stop in stops], dtype=np.uint64)
+
+
+def test_route_order_repeated_stops():
+    # útvonal: Budapest(0) -> Győr(1) -> Budapest(2)
+    budapest, gyor = [0, 2], [1]
+    # Budapest -> Győr -> Budapest: az ismétlődő város a későbbi pozícióját kapja
+    assert route_order_passed(_masks([budapest], [gyor], [budapest]), 1).tolist() == [True]
+    # Győr felrakó után a Budapest lerakó a 2. pozíción megvan
+    assert route_order_passed(_masks([gyor], [budapest]), 1).tolist() == [True]
+    # két Győr lerakó Budapest után: csak egy Győr pozíció van, de a lerakók között elég a >=
+    assert route_order_passed(_masks([budapest], [gyor], [gyor]), 1).tolist() == [True]
+    # Budapest -> Győr -> Budapest -> Győr már nem fér bele
+    assert route_order_passed(_masks([budapest], [gyor], [budapest], [gyor]), 2).tolist() == [False]
+
+
+def test_route_order_strict_pickup_to_dropoff_step():
+    # ugyanazon a pozíción felrakó és lerakó: az első lerakónak szigorúan később kell lennie
+    assert route_order_passed(_masks([[3]], [[3]]), 1).tolist() == [False]
+    # felrakók között (és lerakók között) elég a >=
+    assert route_order_passed(_masks([[3]], [[3]], [[5]]), 2).tolist() == [True]
+    assert route_order_passed(_masks([[3]], [[5]], [[5]]), 1).tolist() == [True]
+    # fordított sorrend
+    assert route_order_passed(_masks([[5]], [[2]]), 1).tolist() == [False]
+
+
+def test_route_order_unknown_positions_and_candidates():
+    # jelöltenként külön: 0 (folyosó / "bármely ország") nem köti a sorrendet
+    masks = _masks([[4], None, [1]], [None, [0], [0]])
+    assert route_order_passed(masks, 1).tolist() == [True, True, False]
+    # a MAX_POSITION utáni pozíciók az utolsó bitre esnek, onnan nincs szigorú lépés
+    assert route_order_passed(_masks([[70]], [[80]]), 1).tolist() == [False]
+
+
+def test_features_any_of_fields():
+    # (vehicle_type, structure, equipment, cargo_securement); típus / felépítmény: egy kért érték elég
+    vehicles = np.array([
+        [0b001, 0b01, 0, 0],   # az első kért típus
+        [0b100, 0b10, 0, 0],   # a második kért típus, a kért felépítmény
+        [0b010, 0b01, 0, 0],   # nem kért típus
+        [0, 0, 0, 0],          # ismeretlen típus / felépítmény nem zár ki
+    ])
+    assert features_compatible(vehicles, [0b101, 0, 0, 0]).tolist() == [True, True, False, True]
+    assert features_compatible(vehicles, [0b101, 0b10, 0, 0]).tolist() == [False, True, False, True]
+    assert features_compatible(vehicles, [0, 0, 0, 0]).all()
+
+
+def test_features_all_of_fields():
+    # felszereltség / rögzítés: minden kért bit kell, az ismeretlen (0) jármű is kiesik
+    vehicles = np.array([
+        [0, 0, 0b111, 0b01],
+        [0, 0, 0b011, 0b11],
+        [0, 0, 0, 0],
+    ])
+    assert features_compatible(vehicles, [0, 0, 0b101, 0]).tolist() == [True, False, False]
+    assert features_compatible(vehicles, [0, 0, 0b001, 0b11]).tolist() == [False, True, False]
+    # egyetlen jármű sor is megy (broadcast)
+    assert features_compatible(vehicles[0], [0, 0, 0b100, 0b01])
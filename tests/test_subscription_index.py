@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+from extensions import db
+from models import LaneSubscription
+from subscription_index import SubscriptionIndex
+
+DAY = date(2026, 5, 4)
+BUDAPEST = ("HU", "Budapest", (47.4979, 19.0402))
+VAC = ("HU", "Vác", (47.7784, 19.1322))             # ~32 km Budapesttől
+KECSKEMET = ("HU", "Kecskemét", (46.8964, 19.6897))  # ~85 km Budapesttől
+WIEN = ("AT", "Wien", (48.2082, 16.3738))
+
+
+def _subscription(**kwargs):
+    values = dict(user_id=1, origin_country="HU", destination_country="AT", destination_city="Wien",
+                  created_at=datetime(2026, 5, 1))
+    values.update(kwargs)
+    sub = LaneSubscription(**values)
+    db.session.add(sub)
+    return sub
+
+
+def _index():
+    db.session.commit()
+    index = SubscriptionIndex()
+    index.build()
+    return index
+
+
+def test_radius_area_hits(app):
+    city = _subscription(origin_city="Budapest")
+    near = _subscription(origin_city="Budapest", origin_radius_km=50, origin_lat=BUDAPEST[2][0],
+                         origin_lon=BUDAPEST[2][1])
+    country = _subscription()
+    index = _index()
+
+    assert index.match(BUDAPEST, WIEN, DAY, None) == {city.id, near.id, country.id}
+    # a sugáron belül a pontos haversine dönt, nem a rács cella
+    assert index.match(VAC, WIEN, DAY, None) == {near.id, country.id}
+    assert index.match(KECSKEMET, WIEN, DAY, None) == {country.id}
+    # koordináta nélkül a sugaras terület nem talál, csak a település / ország
+    assert index.match(("HU", "Vác", None), WIEN, DAY, None) == {country.id}
+    # a lerakó oldal is szűr
+    assert index.match(BUDAPEST, ("AT", "Graz", (47.0707, 15.4395)), DAY, None) == set()
+
+
+def test_date_window_hits(app):
+    window = _subscription(date_from=DAY, date_until=DAY.replace(day=10))
+    until_only = _subscription(date_until=DAY.replace(day=6))
+    undated = _subscription()
+    index = _index()
+
+    assert index.match(BUDAPEST, WIEN, DAY, None) == {window.id, until_only.id, undated.id}
+    assert index.match(BUDAPEST, WIEN, DAY.replace(day=8), None) == {window.id, undated.id}
+    assert index.match(BUDAPEST, WIEN, DAY.replace(day=11), None) == {undated.id}
+    # csak záró dátumnál a kezdet a feliratkozás napja (május 1.)
+    assert index.match(BUDAPEST, WIEN, date(2026, 4, 30), None) == {undated.id}
+    # dátum nélküli rakománynál az ablak nem szűr
+    assert index.match(BUDAPEST, WIEN, None, None) == {window.id, until_only.id, undated.id}
+
+    # módosítás után az új ablak számít
+    window.date_from, window.date_until = DAY.replace(day=20), DAY.replace(day=25)
+    db.session.commit()
+    index.refresh(window.id)
+    assert index.match(BUDAPEST, WIEN, DAY.replace(day=8), None) == {undated.id}
+    assert index.match(BUDAPEST, WIEN, DAY.replace(day=22), None) == {window.id, undated.id}
@@ -17,9 +17,9 @@ from extensions import *
 from sqlalchemy import func, or_, and_
 import threading
 from models.city import City, CityZipcode
+from geocache import geocache, query_key
 import logging
 from datetime import datetime
-import geojson
 from models.cargo import *
 from models.vehicle import *
 from models.user import *
@@ -162,62 +162,78 @@ def send_email(to_email, subject, body):
         print("Email küldési hiba:", e)
 
 
-# GeoNames segédfüggvények (get_nearby_major_city)
-def get_nearby_major_city(city_name, country_code):
+# Külső geokódoló hívások, a geocache-en keresztül (ismételt lekérdezés = nincs HTTP hívás)
+def _geonames_get(endpoint, params):
+    """GeoNames JSON válasz; HTTP hibánál és GeoNames hibaüzenetnél (pl. kvóta) kivétel, hogy ne cache-elődjön"""
+    resp = requests.get(f"http://api.geonames.org/{endpoint}", params=params, timeout=5)
+    resp.raise_for_status()
+    data = resp.json()
+    if "status" in data:
+        raise RuntimeError(f"GeoNames hiba: {data['status'].get('message')}")
+    return data
+
+
+def geonames_search(city_name, country_code):
     """
-    Adott városnév + országkód alapján lekéri a legközelebbi >= 15000 lakosú várost.
-    Visszaadja: (városnév, irányítószám) – ha nincs találat, az eredetit adja vissza.
+    GeoNames searchJSON első találata: [lat, lng] vagy None (negatív találat is cache-elődik).
+    Hálózati / HTTP hibánál kivételt dob (ilyenkor nincs cache-elés).
     """
-    logger.info(f"[GeoNames] Keresés: város='{city_name}', ország='{country_code}'")
+    def fetch():
+        params = {
+            "q": city_name,
+            "country": country_code or None,
+            "maxRows": 1,
+            "username": GEONAMES_USERNAME,
+            "type": "json"
+        }
+        data = _geonames_get("searchJSON", params)
+        if not data.get("geonames"):
+            return None
+        g = data["geonames"][0]
+        return [float(g["lat"]), float(g["lng"])]
 
-    params = {
-        "q": city_name,
-        "country": country_code,
-        "maxRows": 1,
-        "username": GEONAMES_USERNAME
-    }
+    return geocache.cached("geonames_search", query_key(country_code, city_name), fetch)
 
-    try:
-        search = requests.get("http://api.geonames.org/searchJSON", params=params, timeout=5).json()
-    except Exception as e:
-        logger.error(f"[GeoNames] Hiba a keresésnél: {e}")
-        return city_name, None  # fallback
-
-    if not search.get("geonames"):
-        logger.warning(f"[GeoNames] Nincs találat az eredeti városra: {city_name}")
-        return city_name, None
-
-    lat = float(search['geonames'][0]['lat'])
-    lng = float(search['geonames'][0]['lng'])
-    logger.debug(f"[GeoNames] Eredeti város koordinátái: lat={lat}, lng={lng}")
-
-    # Keressük a legközelebbi nagy várost
-    nearby_params = {
-        "lat": lat,
-        "lng": lng,
-        "cities": "cities15000",  # csak 15.000+ fő
-        "maxRows": 1,
-        "username": GEONAMES_USERNAME
-    }
 
-    try:
-        nearby = requests.get("http://api.geonames.org/findNearbyPlaceNameJSON", params=nearby_params, timeout=5).json()
-    except Exception as e:
-        logger.error(f"[GeoNames] Hiba a közeli nagyváros keresésnél: {e}")
-        return city_name, None
+def nominatim_search(country, city, postcode, timeout=5):
+    """
+    Nominatim első találata a "postcode, city, country" szövegre: [lat, lon] vagy None.
+    Hálózati hibánál és nem 200-as válasznál (pl. 429, 5xx) kivételt dob, így az nem cache-elődik;
+    negatív találat csak az üres válasz.
+    """
+    q = ', '.join([x for x in [postcode, city, country] if x])
+    if not q:
+        return None
 
-    if nearby.get("geonames"):
-        major = nearby['geonames'][0]
-        major_city = major['name']
+    def fetch():
+        res = requests.get(
+            'https://nominatim.openstreetmap.org/search',
+            params={'q': q, 'format': 'json', 'limit': 1},
+            headers={'User-Agent': 'GVM-app'},
+            timeout=timeout
+        )
+        res.raise_for_status()
+        if res.status_code != 200:
+            raise requests.HTTPError(f"Nominatim válasz: {res.status_code}", response=res)
+        j = res.json()
+        if not j:
+            return None
+        return [float(j[0]['lat']), float(j[0]['lon'])]
 
-        # 🔑 fontos: itt külön lekérjük az irányítószámot
-        postcode = get_postcode(major_city, country_code)
+    return geocache.cached("nominatim", query_key(postcode, city, country), fetch)
 
-        logger.info(f"[GeoNames] Bújtatott város: {major_city} (eredeti: {city_name}), postcode={postcode}")
-        return major_city, postcode
 
-    logger.warning(f"[GeoNames] Nincs nagyváros találat, visszaadjuk az eredetit: {city_name}")
-    return city_name, None
+# Rejtett helyszínek bújtatása (get_nearby_major_city)
+def get_nearby_major_city(city_name, country_code):
+    """
+    Adott városnév + országkód alapján a legközelebbi >= 15000 lakosú város, helyben számolva
+    (major_city.py: offline geokódoló + City index + CityZipcode, cache-elve; nincs GeoNames hívás).
+    Visszaadja: (városnév, irányítószám) – ha nincs találat, az eredetit adja vissza.
+    """
+    from major_city import major_city_masker
+    major_city, postcode = major_city_masker.mask(city_name, country_code)
+    logger.info(f"[Bújtatás] {city_name} ({country_code}) -> {major_city}, postcode={postcode}")
+    return major_city, postcode
 
 
 def get_postcode(city_name, country_code):
@@ -242,17 +258,21 @@ def get_postcode(city_name, country_code):
         if db_city.zipcode:
             return db_city.zipcode
 
-    # --- 2️⃣ GeoNames API fallback ---
-    params = {
-        "placename": city_name,
-        "country": country_code,
-        "maxRows": 1,
-        "username": GEONAMES_USERNAME
-    }
+    # --- 2️⃣ GeoNames API fallback (geocache) ---
+    def fetch():
+        params = {
+            "placename": city_name,
+            "country": country_code,
+            "maxRows": 1,
+            "username": GEONAMES_USERNAME
+        }
+        result = _geonames_get("postalCodeSearchJSON", params)
+        return result["postalCodes"][0]["postalCode"] if result.get("postalCodes") else None
+
     try:
-        result = requests.get("http://api.geonames.org/postalCodeSearchJSON", params=params, timeout=5).json()
-        if result.get("postalCodes"):
-            return result["postalCodes"][0]["postalCode"]
+        postcode = geocache.cached("geonames_postcode", query_key(country_code, city_name), fetch)
+        if postcode:
+            return postcode
     except Exception as e:
         logger.error(f"[GeoNames] Hiba a postalCode lekérésnél: {e}")
 
@@ -320,82 +340,25 @@ def parse_float(value):
         return None
 
 
-def lookup_coords_local(country, city):
+def lookup_coords_local(country, city, postcode=None):
     """
-    Keres az offline City táblában a város és az ország alapján.
+    Keres az offline geokódolóban (geocoder.py: City + AlterName + CityZipcode, memóriából)
+    a város, az ország és opcionálisan az irányítószám alapján.
     Visszaad: (lat, lng) vagy (None, None)
     """
     if not city:
         current_app.logger.debug("lookup_coords_local: nincs city -> None")
         return None, None
 
-    q = City.query
-
-    city_norm = unidecode(city.strip().lower())  # ékezetmentesít
-    country_norm = (country or '').strip().upper()
-
-    print(f"[DEBUG] Normalized city: '{city}' -> '{city_norm}'")
-
-    current_app.logger.debug("lookup_coords_local input -> country=%r city=%r", country_norm, city_norm)
-
-    # 1) pontos egyezés country-val
-    if country_norm:
-        res = (
-            q.filter(func.lower(City.city_name) == city_norm.lower(),
-                     func.lower(City.country_code) == country_norm.lower())
-             .order_by(City.population.desc())
-             .first()
-        )
-        if res:
-            current_app.logger.debug("lookup_coords_local match (country+city exact): %s, %s, pop=%s",
-                                     res.latitude, res.longitude, res.population)
-            return float(res.latitude), float(res.longitude)
-        else:
-            current_app.logger.debug("lookup_coords_local no match (country+city exact)")
-
-    # 2) pontos egyezés country nélkül
-    res = (
-        q.filter(func.lower(City.city_name) == city_norm.lower())
-         .order_by(City.population.desc())
-         .first()
-    )
-    if res:
-        current_app.logger.debug("lookup_coords_local match (city exact): %s, %s, pop=%s",
-                                 res.latitude, res.longitude, res.population)
-        return float(res.latitude), float(res.longitude)
-    else:
-        current_app.logger.debug("lookup_coords_local no match (city exact)")
-
-    # 3) startswith keresés country-val
-    if country_norm:
-        res = (
-            q.filter(func.lower(City.city_name).like(city_norm.lower() + '%'),
-                     func.lower(City.country_code) == country_norm.lower())
-             .order_by(City.population.desc())
-             .first()
-        )
-        if res:
-            current_app.logger.debug("lookup_coords_local match (country+startswith): %s, %s, pop=%s",
-                                     res.latitude, res.longitude, res.population)
-            return float(res.latitude), float(res.longitude)
-        else:
-            current_app.logger.debug("lookup_coords_local no match (country+startswith)")
+    from geocoder import geocoder
+    hit = geocoder.lookup(country, city, postcode)
+    if hit is None:
+        current_app.logger.debug("lookup_coords_local: semmi találat -> None (%r, %r)", country, city)
+        return None, None
 
-    # 4) startswith country nélkül
-    res = (
-        q.filter(func.lower(City.city_name).like(city_norm.lower() + '%'))
-         .order_by(City.population.desc())
-         .first()
-    )
-    if res:
-        current_app.logger.debug("lookup_coords_local match (startswith): %s, %s, pop=%s",
-                                 res.latitude, res.longitude, res.population)
-        return float(res.latitude), float(res.longitude)
-    else:
-        current_app.logger.debug("lookup_coords_local no match (startswith)")
-
-    current_app.logger.debug("lookup_coords_local: semmi találat -> None")
-    return None, None
+    current_app.logger.debug("lookup_coords_local match (%s): %s, %s, pop=%s",
+                             hit.tier, hit.latitude, hit.longitude, hit.population)
+    return hit.latitude, hit.longitude
 
 
 def lookup_coords_api(country, city):
@@ -409,24 +372,11 @@ def lookup_coords_api(country, city):
     city = city.strip()
     country = (country or '').strip()
 
-    url = "http://api.geonames.org/searchJSON"
-    params = {
-        "q": city,
-        "country": country if country else None,
-        "maxRows": 1,
-        "username": GEONAMES_USERNAME,
-        "type": "json"
-    }
-
     try:
-        resp = requests.get(url, params=params, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-
-        if "geonames" in data and len(data["geonames"]) > 0:
-            g = data["geonames"][0]
-            lat = float(g.get("lat"))
-            lng = float(g.get("lng"))
+        coords = geonames_search(city, country)
+
+        if coords:
+            lat, lng = coords
             current_app.logger.debug(
                 "lookup_coords_api: found %s, %s -> %s, %s", city, country, lat, lng
             )
@@ -460,22 +410,10 @@ def spawn_background_geocode(loc_id, country, city, postcode):
     """
     def worker():
         try:
-            q = ', '.join([x for x in [postcode, city, country] if x])
-            if not q:
-                return
-            res = requests.get(
-                'https://nominatim.openstreetmap.org/search',
-                params={'q': q, 'format': 'json', 'limit': 1},
-                headers={'User-Agent': 'GVM-app'},
-                timeout=6
-            )
-            if res.status_code != 200:
-                return
-            j = res.json()
-            if not j:
+            coords = nominatim_search(country, city, postcode, timeout=6)
+            if not coords:
                 return
-            lat = float(j[0]['lat'])
-            lon = float(j[0]['lon'])
+            lat, lon = coords
             # Re-open session to update (SQLAlchemy session-safety)
             sess_loc = CargoLocation.query.get(loc_id)
             if not sess_loc:
@@ -506,7 +444,7 @@ def get_location_coords(country, city, postcode, lat_raw=None, lng_raw=None):
     3) Külső geokódoló API (lookup_coords_api)
     """
     # 1) próbáljuk a lokális DB-t
-    lat, lng = lookup_coords_local(country, city)
+    lat, lng = lookup_coords_local(country, city, postcode)
 
     # 2) ha nincs, próbáljuk a formból
     try:
@@ -610,122 +548,18 @@ def haversine(lat1, lon1, lat2, lon2):
 
 
 def get_country_code_from_coords(lat, lon):
-    geojson_path = 'static/geojson/countries'
-    for fname in os.listdir(geojson_path):
-        if not fname.endswith('.geojson'): continue
-        country_code = fname.split('.')[0]
-        with open(os.path.join(geojson_path, fname), encoding='utf-8') as f:
-            gj = geojson.load(f)
-            for feature in gj['features']:
-                geom = feature.get('geometry')
-                if geom and geom['type'] == 'Polygon':
-                    coords = [pt for ring in geom['coordinates'] for pt in ring]
-                    lats = [pt[1] for pt in coords]
-                    lons = [pt[0] for pt in coords]
-                    if min(lats)<=lat<=max(lats) and min(lons)<=lon<=max(lons):
-                        return country_code
-                elif geom and geom['type'] == 'MultiPolygon':
-                    for poly in geom['coordinates']:
-                        coords = [pt for ring in poly for pt in ring]
-                        lats = [pt[1] for pt in coords]
-                        lons = [pt[0] for pt in coords]
-                        if min(lats)<=lat<=max(lats) and min(lons)<=lon<=max(lons):
-                            return country_code
-    return None
+    """
+    Országkód a koordinátához, pont a poligonban teszttel (country_index.py: a
+    static/geojson/countries poligonjai egyszer betöltve, STRtree-ben). Nincs találat: None
+    """
+    from country_index import country_index
+    return country_index.country_code(lat, lon)
 
 
 def add_nearby_cities_for_vehicle(vehicle: Vehicle):
-    print(f"\n[DEBUG] Vehicle ID={vehicle.vehicle_id}")
-
-    for ref_type in ["origin", "destination"]:
-        diff = getattr(vehicle, f"{ref_type}_diff")
-        if not diff or diff <= 0:
-            print(f"[DEBUG] {ref_type}: nincs diff")
-            continue
-
-        ref_country = getattr(vehicle, f"{ref_type}_country")
-        ref_postcode = getattr(vehicle, f"{ref_type}_postcode")
-        ref_city_name = getattr(vehicle, f"{ref_type}_city")
-
-        if not (ref_country and ref_postcode and ref_city_name):
-            print(f"[DEBUG] {ref_type}: hiányos adatok")
-            continue
-
-        # Referencia város a City táblából
-        ref_city = City.query.filter_by(
-            country_code=ref_country,
-            city_name=ref_city_name,
-            zipcode=ref_postcode
-        ).first()
-
-        if not ref_city or ref_city.latitude is None or ref_city.longitude is None:
-            print(f"[DEBUG] {ref_type}: nem található koordináta a City táblában {ref_city_name} ({ref_postcode})")
-            continue
-
-        ref_lat = ref_city.latitude
-        ref_lon = ref_city.longitude
-        print(f"[DEBUG] {ref_type}: diff={diff}, ref_city={ref_city_name}, lat={ref_lat}, lon={ref_lon}")
-
-        # Bounding box
-        lat_min = ref_lat - diff / 110
-        lat_max = ref_lat + diff / 110
-        lon_min = ref_lon - diff / (111 * math.cos(math.radians(ref_lat)))
-        lon_max = ref_lon + diff / (111 * math.cos(math.radians(ref_lat)))
-
-        nearby_cities = City.query.filter(
-            City.country_code == ref_country,
-            City.latitude.between(lat_min, lat_max),
-            City.longitude.between(lon_min, lon_max)
-        ).all()
-
-        print(f"[DEBUG] {ref_type}: {len(nearby_cities)} város a bounding boxban")
-
-        inserted_count = 0
-        for c in nearby_cities:
-            if c.latitude is None or c.longitude is None:
-                continue
-
-            dist = haversine(ref_lat, ref_lon, c.latitude, c.longitude)
-            if dist > diff:
-                print(f"[DEBUG]   {c.city_name} ({c.zipcode}) túl messze: {dist:.2f} km > {diff}")
-                continue
-
-            # Ellenőrizzük, hogy van-e már bent
-            exists = NearbyCity.query.filter_by(
-                reference_country=ref_country,
-                reference_postcode=ref_postcode,
-                reference_city=ref_city_name,
-                city_name=c.city_name
-            ).order_by(NearbyCity.radius_km.asc()).first()
-
-            if exists:
-                if exists.radius_km <= diff:
-                    print(f"[DEBUG]   {c.city_name} ({c.zipcode}) már benne van kisebb/equal radius-szal: {exists.radius_km} km → SKIP")
-                    continue
-                else:
-                    print(f"[DEBUG]   {c.city_name} ({c.zipcode}) létezik nagyobb radius-szal ({exists.radius_km} km), most hozzáadjuk {diff}-tel")
-
-            else:
-                print(f"[DEBUG]   {c.city_name} ({c.zipcode}) új → beszúrva diff={diff}, dist={dist:.2f} km")
-
-            nearby = NearbyCity(
-                country_code=c.country_code,
-                zipcode=c.zipcode,
-                city_name=c.city_name,
-                lat=c.latitude,
-                lon=c.longitude,
-                reference_country=ref_country,
-                reference_postcode=ref_postcode,
-                reference_city=ref_city_name,
-                radius_km=diff
-            )
-            db.session.add(nearby)
-            inserted_count += 1
-
-        db.session.commit()
-        print(f"[DEBUG] {ref_type}: összesen {inserted_count} új város beszúrva")
-
-    print(f"[LOG] NearbyCity-k feltöltve Vehicle ID={vehicle.vehicle_id}")
+    """A jármű origin / destination referenciáinak szomszédai a közös sugár cache-be (radius_cache.py)"""
+    from radius_cache import add_for_vehicle
+    add_for_vehicle(vehicle)
 
 
 def fill_missing_city(location_data):